@@ -0,0 +1,54 @@
+"""
+Микробенчмарк условий if/when/waitFor: разбор jsonPath на каждый вызов
+(как было) против скомпилированного предиката из pseudoflow.util.conditions.
+
+    python -m benchmarks.bench_conditions [iterations]
+"""
+import sys
+import timeit
+
+from jsonpath_ng import parse as jp_parse
+
+from pseudoflow.util.conditions import compile_condition
+
+OBJ = {
+    "metadata": {"name": "web", "namespace": "default", "labels": {"app": "web"}},
+    "status": {
+        "replicas": 3,
+        "availableReplicas": 3,
+        "conditions": [
+            {"type": "Progressing", "status": "True"},
+            {"type": "Available", "status": "True"},
+        ],
+    },
+}
+
+CASES = [
+    ("status.availableReplicas", "equals", "3"),
+    ("$.status.conditions[*].type", "equals", "Available"),
+    ("status.replicas", "greaterThan", "2"),
+    ("metadata.labels.app", "contains", "we"),
+]
+
+
+def uncached(json_path, op, value):
+    matches = [m.value for m in jp_parse(json_path).find(OBJ)]
+    if op == "equals":
+        return any(str(m) == str(value) for m in matches)
+    if op == "contains":
+        return any(str(value) in str(m) for m in matches)
+    return any(float(m) > float(value) for m in matches)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for json_path, op, value in CASES:
+        old = timeit.timeit(lambda: uncached(json_path, op, value), number=n)
+        new = timeit.timeit(lambda: compile_condition(json_path, op, value)(OBJ), number=n)
+        assert uncached(json_path, op, value) == compile_condition(json_path, op, value)(OBJ)
+        print(f"{json_path:32} {op:12} parse+eval {old / n * 1e6:9.1f} us  compiled {new / n * 1e6:7.2f} us"
+              f"  x{old / new:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Бенчмарк движка на fake API (pseudoflow.testing.FakeKubeApi) без кластера:
+крупные loop/loopNodes/apply/parallel и глубокий рендеринг шаблонов.
+Для каждого сценария — время, число вызовов API, пиковый RSS и пик выделенной
+памяти (tracemalloc, отдельным прогоном, чтобы не искажать время).
+
+    python -m benchmarks.bench_engine [scenario ...] [--latency MS] [--async-client]
+    python -m benchmarks.bench_engine --save baseline.json
+    python -m benchmarks.bench_engine --compare baseline.json [--tolerance 0.25]
+
+Каждый сценарий по умолчанию идёт в отдельном процессе (чистый RSS); --in-process — в этом.
+--compare завершается с кодом 1, если время или число вызовов API выросли больше допуска.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+# спаны и /metrics бенчмарку не нужны; чекпоинт оставлен — это тоже вызовы API
+os.environ.setdefault("PSEUDOFLOW_METRICS_PORT", "0")
+os.environ.setdefault("PSEUDOFLOW_TRACE_FILE", "")
+
+from pseudoflow.engine.runner import FlowEngine  # noqa: E402
+from pseudoflow.kube.informer import stop_node_informers  # noqa: E402
+from pseudoflow.testing import FakeKubeApi  # noqa: E402
+
+NAMESPACE = "default"
+
+Spec = Dict[str, Any]
+
+
+def loop_1000(api: FakeKubeApi) -> Spec:
+    return {
+        "vars": {"prefix": "item"},
+        "steps": [{
+            "type": "loop",
+            "forEach": [f"v{i}" for i in range(1000)],
+            "steps": [
+                {"type": "template", "var": "name", "template": "${prefix}-${item}"},
+                {"type": "eval", "var": "upper", "expression": "str('${name}').upper()"},
+            ],
+        }],
+    }
+
+
+def loop_nodes_500(api: FakeKubeApi) -> Spec:
+    api.add_nodes(500, {"role": "worker"})
+    return {
+        "steps": [{
+            "type": "loopNodes",
+            "selector": {"role": "worker"},
+            "parallelism": 16,
+            "steps": [{
+                "type": "setLabel",
+                "target": {"kind": "Node", "name": "${node}"},
+                "labels": {"pseudoflow.io/bench": "done"},
+            }],
+        }],
+    }
+
+
+def apply_40(api: FakeKubeApi) -> Spec:
+    docs = []
+    for i in range(14):
+        docs.append({"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": f"cm-{i}"},
+                     "data": {"index": str(i), "payload": "x" * 512}})
+    for i in range(13):
+        docs.append({"apiVersion": "v1", "kind": "Service", "metadata": {"name": f"svc-{i}"},
+                     "spec": {"selector": {"app": f"app-{i}"}, "ports": [{"port": 80}]}})
+    for i in range(13):
+        docs.append({
+            "apiVersion": "apps/v1", "kind": "Deployment", "metadata": {"name": f"app-{i}"},
+            "spec": {
+                "replicas": 2,
+                "selector": {"matchLabels": {"app": f"app-{i}"}},
+                "template": {
+                    "metadata": {"labels": {"app": f"app-{i}"}},
+                    "spec": {"containers": [{"name": "app", "image": "nginx:${tag}"}]},
+                },
+            },
+        })
+    manifests = "\n---\n".join(json.dumps(d) for d in docs)
+    return {"vars": {"tag": "1.27"}, "steps": [{"type": "apply", "manifests": manifests}]}
+
+
+def nested_parallel(api: FakeKubeApi) -> Spec:
+    api.create({"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "ready", "namespace": NAMESPACE}})
+    wait = {"type": "waitFor", "resource": {"kind": "ConfigMap", "name": "ready"}, "condition": "Exist",
+            "timeoutSeconds": 30}
+    inner = {"type": "parallel", "steps": [[dict(wait), {"type": "log", "message": "ok"}] for _ in range(8)]}
+    return {"steps": [{"type": "parallel", "steps": [[inner] for _ in range(8)]}]}
+
+
+def deep_template(api: FakeKubeApi) -> Spec:
+    variables = {f"v{i}": f"value-{i}" for i in range(300)}
+    body = "\n".join(f"line {i}: ${{v{i}}} ${{v{(i * 7) % 300}}} ${{item}}" for i in range(300))
+    return {
+        "vars": variables,
+        "steps": [{
+            "type": "loop",
+            "forEach": [str(i) for i in range(200)],
+            "steps": [{"type": "template", "var": "rendered", "template": body}],
+        }],
+    }
+
+
+SCENARIOS: Dict[str, Callable[[FakeKubeApi], Spec]] = {
+    "loop_1000": loop_1000,
+    "loop_nodes_500": loop_nodes_500,
+    "apply_40": apply_40,
+    "nested_parallel": nested_parallel,
+    "deep_template": deep_template,
+}
+
+
+def _run_once(name: str, latency: float, async_client: bool) -> Tuple[float, int]:
+    with FakeKubeApi(latency=latency) as api:
+        spec = SCENARIOS[name](api)
+        api.create({
+            "apiVersion": "ops.example.com/v1alpha1", "kind": "PseudoFlow",
+            "metadata": {"name": name.replace("_", "-"), "namespace": NAMESPACE}, "spec": spec,
+        })
+        apis = api.apis(async_client=async_client)
+        api.reset_calls()
+
+        async def run():
+            try:
+                await FlowEngine(apis, NAMESPACE).run_flow(name.replace("_", "-"), NAMESPACE, spec, generation=1)
+            finally:
+                if "aio" in apis:
+                    await apis["aio"].close()
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        wall, calls = time.perf_counter() - started, api.calls_total
+        stop_node_informers()
+        return wall, calls
+
+
+def run_scenario(name: str, latency: float, async_client: bool, alloc: bool) -> Dict[str, Any]:
+    wall, calls = _run_once(name, latency, async_client)
+    result = {
+        "scenario": name,
+        "wall_s": round(wall, 4),
+        "api_calls": calls,
+        # ru_maxrss — КиБ в Linux, байты в macOS; включает сам fake API (тот же процесс)
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+    }
+    if alloc:
+        tracemalloc.start()
+        _run_once(name, latency, async_client)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["alloc_peak_mb"] = round(peak / (1024 * 1024), 2)
+    return result
+
+
+def _subprocess(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    cmd = [sys.executable, "-m", "benchmarks.bench_engine", "--run", name, "--latency", str(args.latency)]
+    if args.async_client:
+        cmd.append("--async-client")
+    if args.no_alloc:
+        cmd.append("--no-alloc")
+    out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["scenario"])
+        if base is None:
+            continue
+        if r["api_calls"] > base["api_calls"]:
+            regressions.append(f"{r['scenario']}: api_calls {base['api_calls']} -> {r['api_calls']}")
+        if r["wall_s"] > base["wall_s"] * (1 + tolerance):
+            regressions.append(f"{r['scenario']}: wall_s {base['wall_s']} -> {r['wall_s']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PseudoFlow engine benchmarks on an in-process fake API")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake API latency per call, ms")
+    parser.add_argument("--async-client", action="store_true", help="use pseudoflow.kube.aio (apis['aio'])")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--in-process", action="store_true", help="run scenarios in this process")
+    parser.add_argument("--save", help="write results as JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed wall time growth (fraction)")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.run:
+        # дочерний процесс: одна строка JSON
+        print(json.dumps(run_scenario(args.run, args.latency / 1000, args.async_client, not args.no_alloc)))
+        return
+
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = []
+    for name in args.scenarios or list(SCENARIOS):
+        if args.in_process:
+            r = run_scenario(name, args.latency / 1000, args.async_client, not args.no_alloc)
+        else:
+            r = _subprocess(name, args)
+        results.append(r)
+        alloc = f"  alloc_peak {r['alloc_peak_mb']:7.2f} MB" if "alloc_peak_mb" in r else ""
+        print(f"{name:16} wall {r['wall_s']:8.3f} s  api_calls {r['api_calls']:6}"
+              f"  peak_rss {r['peak_rss_mb']:7.1f} MB{alloc}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        regressions = _compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+cmd.agent package
+"""
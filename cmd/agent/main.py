@@ -0,0 +1,28 @@
+import argparse
+import logging
+import os
+
+from pseudoflow.agent.server import AGENT_PORT, serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PseudoFlow node agent")
+    parser.add_argument("--host", default=os.getenv("PSEUDOFLOW_AGENT_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=AGENT_PORT)
+    parser.add_argument(
+        "--log-level",
+        default=os.getenv("LOG_LEVEL", "INFO"),
+        help="Logging level (DEBUG, INFO, WARNING, ERROR)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+    )
+    logging.getLogger("pseudoflow.agent").info("Starting PseudoFlow agent on %s:%s", args.host, args.port)
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
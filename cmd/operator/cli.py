@@ -7,17 +7,23 @@ def main():
     parser = argparse.ArgumentParser(description="PseudoFlow Operator")
     parser.add_argument(
         "--log-level",
-        default=os.getenv("LOG_LEVEL", "INFO"),
-        help="Logging level (DEBUG, INFO, WARNING, ERROR)",
+        default=None,
+        help="Logging level (DEBUG, INFO, WARNING, ERROR); default LOG_LEVEL or INFO (WARNING for run)",
     )
     parser.add_argument(
         "--debug",
         action="store_true",
         help="Enable debug logging (overrides --log-level to DEBUG)",
     )
+    subparsers = parser.add_subparsers(dest="command")
+    from .run import add_parser as add_run_parser
+
+    add_run_parser(subparsers)
     args = parser.parse_args()
 
-    level_name = "DEBUG" if args.debug else args.log_level.upper()
+    # без подкоманды — оператор, как раньше
+    default_level = "WARNING" if args.command == "run" else "INFO"
+    level_name = "DEBUG" if args.debug else (args.log_level or os.getenv("LOG_LEVEL", default_level)).upper()
     os.environ["LOG_LEVEL"] = level_name
     if args.debug:
         os.environ["DEBUG"] = "true"
@@ -27,6 +33,12 @@ def main():
         level=level,
         format="%(asctime)s %(levelname)s [%(name)s] %(message)s",
     )
+
+    if args.command == "run":
+        from .run import run
+
+        raise SystemExit(run(args))
+
     logging.getLogger(__name__).info(
         "Starting PseudoFlow operator with level %s", level_name
     )
@@ -4,9 +4,16 @@ import os
 
 import kopf
 
+from pseudoflow.agent import check_backend, close_agents
+from pseudoflow.engine.checkpoint import patch_flow_status
 from pseudoflow.engine.runner import FlowEngine
+from pseudoflow.engine.scheduler import get_scheduler
 from pseudoflow.kube.crd import ensure_crd_installed
 from pseudoflow.kube.client import get_k8s_api_clients
+from pseudoflow.kube.executors import executor_stats, shutdown_executors
+from pseudoflow.kube.informer import get_node_informer, stop_node_informers
+from pseudoflow.kube.runner_pool import close_runner_pools
+from pseudoflow.util.metrics import start_http_server, stop_http_server
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
@@ -22,15 +29,48 @@ async def _startup(settings: kopf.OperatorSettings, **_):
     settings.networking.request_timeout = 30
     settings.networking.connect_timeout = 5
 
+    # PSEUDOFLOW_NODE_BACKEND=agent без токена или сертификатов — ошибка сразу, а не на первом execNode
+    check_backend()
+
     logger.info("Ensuring PseudoFlow CRD is installed")
     # FIX: Убран лишний параметр 'args'
     await asyncio.get_event_loop().run_in_executor(None, ensure_crd_installed)
     logger.info("CRD check complete")
 
+    # Общий кэш нод для select_nodes/loopNodes/execNode
+    get_node_informer(get_k8s_api_clients())
+
+    # /metrics для Prometheus (PSEUDOFLOW_METRICS_PORT, 0 — выключено)
+    start_http_server()
+
+
+@kopf.on.cleanup()
+async def _cleanup(**_):
+    stop_node_informers()
+    stop_http_server()
+    aio_client = get_k8s_api_clients().get("aio")
+    if aio_client is not None:
+        await aio_client.close()
+    await close_agents()
+    await asyncio.get_event_loop().run_in_executor(None, close_runner_pools)
+    shutdown_executors()
+
+
+@kopf.on.probe(id="executors")
+async def _executors_probe(**_):
+    # queued/active/wait_seconds_* по классам нагрузки (wait/exec/api)
+    return executor_stats()
+
+
+@kopf.on.probe(id="scheduler")
+async def _scheduler_probe(**_):
+    # active/queued потоков, очередь по namespace
+    return get_scheduler().stats()
+
 
 @kopf.on.create("ops.example.com", "v1alpha1", "pseudoflows")
 @kopf.on.update("ops.example.com", "v1alpha1", "pseudoflows")
-async def reconcile(spec, _status, meta, _body, patch, **_): # FIX: Неиспользуемые переменные переименованы в _status, _body
+async def reconcile(spec, status, meta, _body, patch, **_): # FIX: Неиспользуемая переменная переименована в _body
     ns = meta.get("namespace")
     name = meta.get("name")
     gen = meta.get("generation")
@@ -45,12 +85,26 @@ async def reconcile(spec, _status, meta, _body, patch, **_): # FIX: Неиспо
 
     apis = get_k8s_api_clients()
     engine = FlowEngine(apis, operator_namespace=ns or "default")
+    priority = int((spec.get("options") or {}).get("priority") or 0)
+
+    async def on_queued():
+        # kopf пишет patch только после выхода из обработчика — Queued виден сразу лишь прямым PATCH
+        await patch_flow_status(apis, name, ns, {
+            "observedGeneration": gen,
+            "phase": "Queued",
+            "message": f"waiting for a free flow slot (priority={priority})",
+        })
 
     try:
-        result = await engine.run_flow(name=name, namespace=ns, spec=spec)
+        async with get_scheduler().slot(f"{ns}/{name}", ns, priority, on_queued) as queued:
+            if queued:
+                await patch_flow_status(apis, name, ns, {"phase": "Running", "message": "started"})
+            # status.checkpoint от прерванного запуска той же generation — продолжение с места остановки
+            result = await engine.run_flow(name=name, namespace=ns, spec=spec, generation=gen, status=status)
         logger.info("Flow %s/%s succeeded: %s", ns, name, result.summary)
         patch.status["phase"] = "Succeeded"
         patch.status["message"] = f"ok: {result.summary}"
+        patch.status["checkpoint"] = None
         patch.status["conditions"] = [
             {
                 "type": "Ready",
@@ -63,6 +117,7 @@ async def reconcile(spec, _status, meta, _body, patch, **_): # FIX: Неиспо
         logger.exception("Flow %s/%s failed", ns, name)
         patch.status["phase"] = "Failed"
         patch.status["message"] = str(e)
+        patch.status["checkpoint"] = None
         patch.status["conditions"] = [
             {
                 "type": "Degraded",
@@ -0,0 +1,242 @@
+"""
+pseudoflow-operator run FLOW.yaml — локальный запуск потока без оператора с профилем по шагам.
+
+По умолчанию поток идёт на in-process fake API (pseudoflow.testing.FakeKubeApi),
+с --kubeconfig — на настоящий кластер. Профиль собирается из спанов трассировки:
+для каждого шага (step.path) — число запусков, суммарное и максимальное время,
+вызовы API, созданные поды и объём отрендеренных параметров; время и счётчики
+управляющих шагов включают вложенные шаги.
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger("pseudoflow.run")
+
+FLOW_KIND = "PseudoFlow"
+
+
+def load_flow(path: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Первый (или с metadata.name == name) документ PseudoFlow из YAML-файла."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            docs = [d for d in yaml.safe_load_all(f) if isinstance(d, dict) and d.get("kind") == FLOW_KIND]
+    except (OSError, yaml.YAMLError) as e:
+        raise SystemExit(f"{path}: {e}")
+    for doc in docs:
+        if name is None or (doc.get("metadata") or {}).get("name") == name:
+            return doc
+    raise SystemExit(f"{path}: no {FLOW_KIND}" + (f" named '{name}'" if name else ""))
+
+
+def parse_vars(items: List[str]) -> Dict[str, str]:
+    out = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--var expects key=value, got '{item}'")
+        out[key] = value
+    return out
+
+
+def _seed_fake(api, args) -> None:
+    if args.nodes:
+        labels = parse_vars(args.node_label)
+        if args.nodes.isdigit():
+            api.add_nodes(int(args.nodes), labels)
+        else:
+            for node in args.nodes.split(","):
+                api.create({
+                    "apiVersion": "v1", "kind": "Node",
+                    "metadata": {"name": node, "labels": {"kubernetes.io/hostname": node, **labels}},
+                })
+    for path in args.seed:
+        with open(path, encoding="utf-8") as f:
+            for doc in yaml.safe_load_all(f):
+                if isinstance(doc, dict) and doc.get("kind"):
+                    api.create(doc)
+
+
+def step_profile(spans: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Строки профиля по шагам и итог потока. Ключ строки — цепочка step.path предков,
+    так что шаги includeFlow не сливаются с одноимёнными шагами родителя.
+    """
+    by_id = {s["id"]: s for s in spans}
+    children: Dict[str, List[Dict[str, Any]]] = {}
+    for s in spans:
+        if s["parent"]:
+            children.setdefault(s["parent"], []).append(s)
+
+    def pods(s: Dict[str, Any]) -> int:
+        n = sum(1 for _, name in s["events"] if name == "pod.created")
+        return n + sum(pods(c) for c in children.get(s["id"], ()))
+
+    def step_key(s: Dict[str, Any]) -> Tuple[str, ...]:
+        key = []
+        p: Optional[Dict[str, Any]] = s
+        while p is not None:
+            if p["name"].startswith("step ") and "step.path" in p["attributes"]:
+                key.append(p["attributes"]["step.path"])
+            p = by_id.get(p["parent"]) if p["parent"] else None
+        return tuple(reversed(key))
+
+    steps = [s for s in sorted(spans, key=lambda s: s["start"])
+             if s["name"].startswith("step ") and "step.path" in s["attributes"]]
+    keys = {s["id"]: step_key(s) for s in steps}
+    rows: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for s in steps:
+        attrs = s["attributes"]
+        key = keys[s["id"]]
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                "key": key, "path": key[-1], "type": attrs.get("step.type"), "id": attrs.get("step.id"),
+                "runs": 0, "wall": 0.0, "max": 0.0, "api_calls": 0, "pods": 0, "bytes": 0, "errors": 0,
+            }
+        seconds = (s["end"] - s["start"]) / 1e9
+        row["runs"] += 1
+        row["wall"] += seconds
+        row["max"] = max(row["max"], seconds)
+        row["api_calls"] += attrs.get("k8s.api_calls", 0)
+        row["pods"] += pods(s)
+        row["errors"] += 1 if s["error"] else 0
+    # объём рендеринга управляющего шага включает вложенные шаги, как время и вызовы API
+    for s in steps:
+        key = keys[s["id"]]
+        for i in range(1, len(key) + 1):
+            rows[key[:i]]["bytes"] += s["attributes"].get("step.rendered_bytes", 0)
+
+    flow = next((s for s in spans if s["name"].startswith("flow ")), None)
+    total = {
+        "wall": (flow["end"] - flow["start"]) / 1e9 if flow else 0.0,
+        "api_calls": flow["attributes"].get("k8s.api_calls", 0) if flow else 0,
+        "pods": pods(flow) if flow else 0,
+        "error": flow["error"] if flow else None,
+    }
+    return sorted(rows.values(), key=lambda r: _path_order(r["key"])), total
+
+
+def _path_order(key: Tuple[str, ...]) -> List[Any]:
+    # steps[10] после steps[9]: числа в пути сравниваются как числа
+    out: List[Any] = []
+    for path in key:
+        token = ""
+        for ch in path + ".":
+            if ch.isdigit():
+                token += ch
+                continue
+            if token:
+                out.append((0, int(token)))
+                token = ""
+            out.append((1, ch))
+    return out
+
+
+def format_profile(rows: List[Dict[str, Any]], total: Dict[str, Any]) -> str:
+    header = ("STEP", "TYPE", "RUNS", "WALL_S", "MAX_S", "API", "PODS", "BYTES")
+    lines = []
+    for r in rows:
+        label = "  " * (len(r["key"]) - 1) + r["path"].rsplit(".", 1)[-1] + (f" ({r['id']})" if r["id"] else "")
+        if r["errors"]:
+            label += f" !{r['errors']}"
+        lines.append((label, r["type"] or "", str(r["runs"]), f"{r['wall']:.3f}", f"{r['max']:.3f}",
+                      str(r["api_calls"]), str(r["pods"]), str(r["bytes"])))
+    lines.append(("total", "flow", "1", f"{total['wall']:.3f}", f"{total['wall']:.3f}",
+                  str(total["api_calls"]), str(total["pods"]), ""))
+    widths = [max(len(row[i]) for row in [header] + lines) for i in range(len(header))]
+    out = []
+    for row in [header] + lines:
+        out.append("  ".join(v.ljust(w) if i < 2 else v.rjust(w) for i, (v, w) in enumerate(zip(row, widths))))
+    return "\n".join(out)
+
+
+async def _run(apis, flow: Dict[str, Any], namespace: str) -> None:
+    from pseudoflow.engine.runner import FlowEngine
+
+    name = (flow.get("metadata") or {}).get("name") or "local"
+    try:
+        result = await FlowEngine(apis, operator_namespace=namespace).run_flow(name, namespace, flow.get("spec") or {})
+        logger.info("Flow %s/%s finished: %s", namespace, name, result.summary)
+    finally:
+        aio = apis.get("aio")
+        if aio is not None:
+            await aio.close()
+
+
+def run(args) -> int:
+    # профиль строится по спанам; без --trace они пишутся во временный файл
+    from pseudoflow.util import tracing
+    from pseudoflow.kube.informer import stop_node_informers
+
+    flow = load_flow(args.file, args.name)
+    spec = flow.setdefault("spec", {})
+    spec["vars"] = {**(spec.get("vars") or {}), **parse_vars(args.var)}
+    namespace = args.namespace or (flow.get("metadata") or {}).get("namespace") or "default"
+
+    trace_path = args.trace
+    if trace_path is None:
+        fd, trace_path = tempfile.mkstemp(prefix="pseudoflow-run-", suffix=".jsonl")
+        os.close(fd)
+    elif os.path.exists(trace_path):
+        os.remove(trace_path)
+    tracing.configure(trace_path)
+
+    fake = None
+    failed: Optional[BaseException] = None
+    try:
+        if args.kubeconfig:
+            from pseudoflow.kube.client import get_k8s_api_clients
+
+            os.environ["KUBECONFIG"] = args.kubeconfig
+            apis = get_k8s_api_clients()
+        else:
+            from pseudoflow.kube.aio import ASYNC_CLIENT_ENABLED
+            from pseudoflow.testing import FakeKubeApi
+
+            fake = FakeKubeApi(latency=args.latency / 1000, pod_start_seconds=args.pod_seconds,
+                               pod_run_seconds=args.pod_seconds).start()
+            _seed_fake(fake, args)
+            apis = fake.apis(async_client=ASYNC_CLIENT_ENABLED)
+        try:
+            asyncio.run(_run(apis, flow, namespace))
+        except Exception as e:
+            failed = e
+    finally:
+        tracing.configure(None)
+        stop_node_informers()
+        if fake is not None:
+            fake.stop()
+
+    with open(trace_path, encoding="utf-8") as f:
+        spans = tracing.read_spans(f)
+    if args.trace is None:
+        os.remove(trace_path)
+    rows, total = step_profile(spans)
+    print(format_profile(rows, total))
+    if failed is not None:
+        print(f"flow failed: {failed}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def add_parser(subparsers) -> None:
+    p = subparsers.add_parser("run", help="Run a PseudoFlow file locally and print a per-step timing profile")
+    p.add_argument("file", help="YAML with a PseudoFlow document (e.g. examples/01-simple-apply.yaml)")
+    p.add_argument("--name", help="PseudoFlow metadata.name if the file has several")
+    p.add_argument("--namespace", help="flow namespace (default: metadata.namespace or 'default')")
+    p.add_argument("--var", action="append", default=[], metavar="KEY=VALUE", help="override spec.vars")
+    p.add_argument("--kubeconfig", help="run against this cluster instead of the in-process fake API")
+    p.add_argument("--latency", type=float, default=0.0, help="fake API latency per call, ms")
+    p.add_argument("--pod-seconds", type=float, default=0.05,
+                   help="fake pods stay Pending and Running this long each")
+    p.add_argument("--nodes", help="fake nodes: a count (node-0..N-1) or comma-separated names")
+    p.add_argument("--node-label", action="append", default=[], metavar="KEY=VALUE", help="label for fake nodes")
+    p.add_argument("--seed", action="append", default=[], metavar="FILE",
+                   help="YAML manifests to create in the fake API before the run")
+    p.add_argument("--trace", metavar="FILE", help="keep the OTLP JSON-lines spans in FILE")
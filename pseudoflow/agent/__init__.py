@@ -0,0 +1,7 @@
+"""
+Node agent for PseudoFlow: long-lived per-node process executing
+execNode/configFile/patchFile/script commands instead of a pod per command.
+"""
+from .backend import NODE_BACKEND, check_backend, close_agents, host_root, run_on_node
+
+__all__ = ["NODE_BACKEND", "check_backend", "close_agents", "host_root", "run_on_node"]
@@ -0,0 +1,85 @@
+import os
+import ssl
+from typing import Dict, List, Optional, Union
+
+from pseudoflow.kube import aio
+from pseudoflow.util import tracing
+from pseudoflow.util.capture import OutputCapture
+
+from .client import AgentClient, LocalAgent
+from .server import AGENT_TOKEN, ALLOW_PLAINTEXT, ssl_context, tls_configured
+
+# pod — под на каждую команду (по умолчанию), agent — DaemonSet pseudoflow-agent,
+# local — команды выполняются в процессе оператора (для запуска без кластера)
+NODE_BACKEND = os.getenv("PSEUDOFLOW_NODE_BACKEND", "pod").lower()
+# Куда смонтирован корень ФС ноды для configFile/patchFile; для local — произвольный каталог
+LOCAL_HOST_ROOT = os.getenv("PSEUDOFLOW_AGENT_HOST_ROOT", "/host")
+
+_agents: Dict[str, Union[AgentClient, LocalAgent]] = {}
+
+
+def host_root() -> str:
+    return LOCAL_HOST_ROOT if NODE_BACKEND == "local" else "/host"
+
+
+def check_backend() -> None:
+    """Проверка настроек при старте оператора: токен и mTLS агента нужны только бэкенду agent."""
+    if NODE_BACKEND != "agent":
+        return
+    if not AGENT_TOKEN:
+        raise RuntimeError("PSEUDOFLOW_AGENT_TOKEN is required for PSEUDOFLOW_NODE_BACKEND=agent")
+    if tls_configured():
+        # битые или несмонтированные файлы — ошибка сейчас, а не на первом execNode
+        ssl_context(ssl.Purpose.SERVER_AUTH)
+    elif not ALLOW_PLAINTEXT:
+        raise RuntimeError(
+            "PSEUDOFLOW_AGENT_TLS_CERT, PSEUDOFLOW_AGENT_TLS_KEY and PSEUDOFLOW_AGENT_TLS_CA "
+            "are required for PSEUDOFLOW_NODE_BACKEND=agent"
+        )
+
+
+def _agent(apis):
+    agent = _agents.get(NODE_BACKEND)
+    if agent is None:
+        agent = LocalAgent() if NODE_BACKEND == "local" else AgentClient(apis)
+        _agents[NODE_BACKEND] = agent
+    return agent
+
+
+async def run_on_node(
+        apis,
+        namespace: str,
+        command: str,
+        node: Optional[str] = None,
+        privileged: bool = True,
+        host_paths: Optional[List[Dict[str, str]]] = None,
+        timeout: int = 600,
+        capture: Optional[OutputCapture] = None,
+) -> str:
+    """
+    Выполняет команду на ноде `node` выбранным бэкендом.
+    Без ноды, привилегий и host_paths (script) — всегда непривилегированный под
+    (или пул исполнителей): агент и local выполняют команды от root на ноде/в операторе.
+    Для pod-бэкенда host_paths монтируются в под; агент уже видит корень ноды в /host.
+    Вывод стримится в capture (maxOutputBytes/spillToFile/outputFormat шага).
+    """
+    unprivileged = node is None and not privileged and not host_paths
+    backend = "pod" if unprivileged else NODE_BACKEND
+    with tracing.span("node.run", node=node, backend=backend):
+        if backend in ("agent", "local"):
+            return await _agent(apis).run(node, command, timeout, capture)
+        if backend != "pod":
+            raise ValueError(f"unknown PSEUDOFLOW_NODE_BACKEND '{NODE_BACKEND}' (pod|agent|local)")
+
+        if unprivileged:
+            return await aio.run_in_runner(apis, namespace, command, timeout, capture)
+        node_selector = {"kubernetes.io/hostname": node} if node else None
+        return await aio.run_pod_and_get_logs(
+            apis, namespace, command, node_selector, privileged, host_paths, timeout, capture,
+        )
+
+
+async def close_agents() -> None:
+    for agent in _agents.values():
+        await agent.close()
+    _agents.clear()
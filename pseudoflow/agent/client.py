@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import ssl
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+
+from pseudoflow.kube import rest
+from pseudoflow.kube.client import apis_for_workload
+from pseudoflow.kube.executors import WORKLOAD_API, get_executor
+from pseudoflow.util.capture import OutputCapture
+
+from .server import (
+    AGENT_PORT, AGENT_TOKEN, ALLOW_PLAINTEXT, TLS_SERVER_NAME, run_command, ssl_context, tls_configured,
+)
+
+logger = logging.getLogger("pseudoflow.agent")
+
+AGENT_NAMESPACE = os.getenv("PSEUDOFLOW_AGENT_NAMESPACE", "kube-system")
+AGENT_SELECTOR = os.getenv("PSEUDOFLOW_AGENT_SELECTOR", "app=pseudoflow-agent")
+# Как долго доверять списку агентов (node -> hostIP) без повторного LIST
+ADDRESS_TTL = 30.0
+
+
+class AgentCommandError(RuntimeError):
+    def __init__(self, node: str, exit_code: Optional[int], output: str, message: str):
+        self.node = node
+        self.exit_code = exit_code
+        self.output = output
+        super().__init__(f"{message} on node {node}. Logs: {output}")
+
+
+async def _collect(node: str, events: AsyncIterator[Dict[str, Any]], capture: Optional[OutputCapture] = None) -> str:
+    """Вывод команды по мере прихода событий — в capture, без накопления всего потока."""
+    out = capture if capture is not None else OutputCapture()
+    try:
+        async for event in events:
+            if "output" in event:
+                out.write(event["output"])
+            elif "error" in event:
+                out.close()
+                raise AgentCommandError(node, None, out.text(), event["error"])
+            elif "exitCode" in event:
+                out.close()
+                # как в режиме пода: ненулевой код не ошибка шага, он остаётся в capture.exit_code
+                out.exit_code = event["exitCode"]
+                if out.exit_code:
+                    logger.warning("Command on node %s exited with code %s", node, out.exit_code)
+                return out.value()
+    finally:
+        out.close()
+    raise AgentCommandError(node, None, out.text(), "Agent closed the stream without exit code")
+
+
+async def _ndjson(content) -> AsyncIterator[Dict[str, Any]]:
+    async for line in content:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _list_agents(apis) -> Dict[str, str]:
+    info = rest.resolve(apis, "Pod", "v1")
+    lst = rest.list_objects(apis, info, AGENT_NAMESPACE, label_selector=AGENT_SELECTOR)
+    out = {}
+    for pod in lst.get("items") or []:
+        status = pod.get("status") or {}
+        node = (pod.get("spec") or {}).get("nodeName")
+        if node and status.get("phase") == "Running" and status.get("hostIP"):
+            out[node] = status["hostIP"]
+    return out
+
+
+class AgentClient:
+    """
+    Клиент агентов DaemonSet: команда уходит POST /v1/exec на hostIP ноды
+    по mTLS (PSEUDOFLOW_AGENT_TLS_*), ответ — NDJSON с выводом и кодом выхода.
+    """
+
+    def __init__(self, apis, port: int = AGENT_PORT, token: str = AGENT_TOKEN,
+                 ssl_ctx: Optional[ssl.SSLContext] = None, plaintext: bool = ALLOW_PLAINTEXT,
+                 server_name: str = TLS_SERVER_NAME):
+        self._apis = apis
+        self._port = port
+        self._token = token
+        self._ssl = ssl_ctx
+        self._plaintext = plaintext
+        self._server_name = server_name
+        self._addresses: Dict[str, str] = {}
+        self._listed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _refresh(self) -> None:
+        apis = apis_for_workload(self._apis, WORKLOAD_API)
+        self._addresses = await get_executor(WORKLOAD_API).run(_list_agents, apis)
+        self._listed_at = time.monotonic()
+
+    async def _address(self, node: Optional[str]) -> Tuple[str, str]:
+        async with self._lock:
+            fresh = time.monotonic() - self._listed_at < ADDRESS_TTL
+            if not fresh or (node is not None and node not in self._addresses):
+                await self._refresh()
+        if not self._addresses:
+            raise RuntimeError(f"no running pseudoflow-agent pods ({AGENT_NAMESPACE}, {AGENT_SELECTOR})")
+        if node is None:
+            node = sorted(self._addresses)[0]
+        addr = self._addresses.get(node)
+        if addr is None:
+            raise RuntimeError(f"no running pseudoflow-agent on node {node}")
+        return node, addr
+
+    def _ssl_context(self) -> Optional[ssl.SSLContext]:
+        if self._ssl is None and tls_configured():
+            self._ssl = ssl_context(ssl.Purpose.SERVER_AUTH)
+        if self._ssl is None and not self._plaintext:
+            raise RuntimeError(
+                "PSEUDOFLOW_AGENT_TLS_CERT, PSEUDOFLOW_AGENT_TLS_KEY and PSEUDOFLOW_AGENT_TLS_CA "
+                "are required for PSEUDOFLOW_NODE_BACKEND=agent"
+            )
+        return self._ssl
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession()
+            self._loop = loop
+        return self._session
+
+    async def run(self, node: Optional[str], command: str, timeout: float,
+                  capture: Optional[OutputCapture] = None) -> str:
+        if not self._token:
+            raise RuntimeError("PSEUDOFLOW_AGENT_TOKEN is required for PSEUDOFLOW_NODE_BACKEND=agent")
+        ssl_ctx = self._ssl_context()
+        node, addr = await self._address(node)
+        tls = {"ssl": ssl_ctx, "server_hostname": self._server_name} if ssl_ctx is not None else {}
+        async with self._get_session().post(
+                f"{'https' if ssl_ctx is not None else 'http'}://{addr}:{self._port}/v1/exec",
+                json={"command": command, "timeout": timeout},
+                headers={"Authorization": f"Bearer {self._token}"},
+                timeout=aiohttp.ClientTimeout(total=timeout + 10),
+                **tls,
+        ) as resp:
+            if resp.status >= 400:
+                raise RuntimeError(f"agent on node {node} returned {resp.status}: {await resp.text()}")
+            return await _collect(node, _ndjson(resp.content), capture)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class LocalAgent:
+    """Локальная замена агента: команды выполняются в процессе оператора, node игнорируется."""
+
+    async def run(self, node: Optional[str], command: str, timeout: float,
+                  capture: Optional[OutputCapture] = None) -> str:
+        return await _collect(node or "local", run_command(command, timeout), capture)
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,132 @@
+import asyncio
+import codecs
+import hmac
+import json
+import logging
+import os
+import signal
+import ssl
+from typing import Any, AsyncIterator, Dict, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger("pseudoflow.agent")
+
+AGENT_PORT = int(os.getenv("PSEUDOFLOW_AGENT_PORT", "9765"))
+AGENT_TOKEN = os.getenv("PSEUDOFLOW_AGENT_TOKEN", "")
+MAX_CONCURRENT = int(os.getenv("PSEUDOFLOW_AGENT_MAX_CONCURRENT", "16"))
+READ_CHUNK = 64 * 1024
+# mTLS: свой сертификат и ключ (у агента — серверный, у оператора — клиентский) и общий CA
+TLS_CERT = os.getenv("PSEUDOFLOW_AGENT_TLS_CERT", "")
+TLS_KEY = os.getenv("PSEUDOFLOW_AGENT_TLS_KEY", "")
+TLS_CA = os.getenv("PSEUDOFLOW_AGENT_TLS_CA", "")
+# оператор ходит на hostIP, а проверяет это имя из SAN сертификата агента
+TLS_SERVER_NAME = os.getenv("PSEUDOFLOW_AGENT_TLS_SERVER_NAME", "pseudoflow-agent")
+# только для отладки: команды и токен идут открытым текстом
+ALLOW_PLAINTEXT = os.getenv("PSEUDOFLOW_AGENT_ALLOW_PLAINTEXT", "false").lower() == "true"
+
+
+def tls_configured() -> bool:
+    return bool(TLS_CERT and TLS_KEY and TLS_CA)
+
+
+def ssl_context(purpose: ssl.Purpose, cert: str = TLS_CERT, key: str = TLS_KEY, ca: str = TLS_CA) -> ssl.SSLContext:
+    """
+    Контекст mTLS: CLIENT_AUTH — для агента (клиентский сертификат обязателен),
+    SERVER_AUTH — для оператора. Обе стороны проверяют сертификат другой по CA `ca`.
+    """
+    ctx = ssl.create_default_context(purpose, cafile=ca)
+    ctx.load_cert_chain(cert, key)
+    if purpose is ssl.Purpose.CLIENT_AUTH:
+        ctx.verify_mode = ssl.CERT_REQUIRED
+    return ctx
+
+
+async def run_command(command: str, timeout: float) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Выполняет `/bin/sh -lc command`, отдаёт {"output": str} по мере вывода
+    (stdout+stderr) и в конце {"exitCode": int} либо {"error": str}.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    proc = await asyncio.create_subprocess_exec(
+        "/bin/sh", "-lc", command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True,
+    )
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        while True:
+            chunk = await asyncio.wait_for(proc.stdout.read(READ_CHUNK), max(0.0, end - loop.time()))
+            if not chunk:
+                break
+            yield {"output": decoder.decode(chunk)}
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield {"output": tail}
+        code = await asyncio.wait_for(proc.wait(), max(0.0, end - loop.time()))
+        yield {"exitCode": code}
+    except asyncio.TimeoutError:
+        yield {"error": f"command timed out after {timeout}s"}
+    finally:
+        if proc.returncode is None:
+            # вся группа процессов: у sh -lc могут быть дочерние
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+
+def build_app(token: str = AGENT_TOKEN, max_concurrent: int = MAX_CONCURRENT) -> web.Application:
+    if not token:
+        raise ValueError("agent token is required")
+    sem = asyncio.Semaphore(max_concurrent)
+
+    async def exec_handler(request: web.Request) -> web.StreamResponse:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {token}"):
+            raise web.HTTPUnauthorized()
+        payload = await request.json()
+        command = payload.get("command")
+        if not command:
+            raise web.HTTPBadRequest(text="command required")
+        timeout = float(payload.get("timeout") or 600)
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        async with sem:
+            async for event in run_command(command, timeout):
+                await resp.write(json.dumps(event).encode() + b"\n")
+        await resp.write_eof()
+        return resp
+
+    async def healthz(_request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    app = web.Application()
+    app.router.add_post("/v1/exec", exec_handler)
+    app.router.add_get("/healthz", healthz)
+    return app
+
+
+def serve(host: str = "0.0.0.0", port: int = AGENT_PORT, token: Optional[str] = None) -> None:
+    if token is None:
+        token = AGENT_TOKEN
+    if not token:
+        # агент — root-шелл на hostNetwork: без токена не стартуем
+        raise SystemExit("PSEUDOFLOW_AGENT_TOKEN is required")
+    ssl_ctx = None
+    if tls_configured():
+        ssl_ctx = ssl_context(ssl.Purpose.CLIENT_AUTH)
+    elif ALLOW_PLAINTEXT:
+        logger.warning("Serving without TLS (PSEUDOFLOW_AGENT_ALLOW_PLAINTEXT=true): commands and token are sent in clear text")
+    else:
+        raise SystemExit(
+            "PSEUDOFLOW_AGENT_TLS_CERT, PSEUDOFLOW_AGENT_TLS_KEY and PSEUDOFLOW_AGENT_TLS_CA are required "
+            "(or PSEUDOFLOW_AGENT_ALLOW_PLAINTEXT=true)"
+        )
+    # клиент оборвал запрос (отмена/таймаут потока) — обработчик отменяется и убивает группу процессов
+    web.run_app(build_app(token), host=host, port=port, ssl_context=ssl_ctx, print=None, handler_cancellation=True)
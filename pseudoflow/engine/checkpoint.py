@@ -0,0 +1,246 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from kubernetes.client import ApiException
+
+from pseudoflow.kube import rest
+from pseudoflow.kube.client import apis_for_workload
+from pseudoflow.kube.discovery import ResourceInfo
+from pseudoflow.kube.executors import WORKLOAD_API, get_executor
+
+logger = logging.getLogger("pseudoflow.engine.checkpoint")
+
+# Сохранять ли прогресс потока в status.checkpoint
+CHECKPOINT_ENABLED = os.getenv("PSEUDOFLOW_CHECKPOINT", "true").lower() == "true"
+# Не чаще одной записи в status за столько секунд (0 — после каждого шага)
+CHECKPOINT_INTERVAL = float(os.getenv("PSEUDOFLOW_CHECKPOINT_INTERVAL", "5"))
+# Предел размера сохраняемых переменных; сверх него чекпоинт перестаёт продвигаться
+CHECKPOINT_MAX_BYTES = int(os.getenv("PSEUDOFLOW_CHECKPOINT_MAX_BYTES", "262144"))
+
+_PATH_RE = re.compile(r"^steps\[(\d+)\]$")
+_MISSING = object()
+
+FLOW_RESOURCE = ResourceInfo("ops.example.com/v1alpha1", "PseudoFlow", "pseudoflows", True)
+
+
+async def patch_flow_status(apis, name: str, namespace: Optional[str], status: Dict[str, Any]) -> bool:
+    """
+    Merge-patch status PseudoFlow в обход kopf (kopf пишет patch только после выхода из обработчика).
+    Пишется в subresource /status: patch основного ресурса поднимал бы metadata.generation,
+    и чекпоинт (и кэш плана) никогда бы не совпадали с generation после рестарта.
+    Ошибки логируются, а не поднимаются.
+    """
+    try:
+        await get_executor(WORKLOAD_API).run(functools.partial(
+            rest.patch_object, apis_for_workload(apis, WORKLOAD_API), FLOW_RESOURCE, name, {"status": status},
+            namespace, subresource="status",
+        ))
+        return True
+    except ApiException as e:
+        logger.warning("Failed to patch status of %s/%s: %s", namespace, name, e.status)
+    except Exception as e:
+        logger.warning("Failed to patch status of %s/%s: %s", namespace, name, e)
+    return False
+
+
+class Checkpoint:
+    """
+    Прогресс верхнеуровневых шагов потока в status.checkpoint:
+    {generation, steps: [{path, type, status}], current, vars}.
+    vars — переменные, изменённые шагами (exec/eval/template/...) относительно spec.vars.
+    Шаг, прерванный на середине, после рестарта выполняется заново целиком;
+    для DAG (dependsOn) steps перечисляются в порядке завершения.
+    Запись — не чаще раза в interval секунд; в PATCH уходят только переменные,
+    изменённые после предыдущей записи (merge patch сохраняет остальные).
+    """
+
+    def __init__(
+            self,
+            apis,
+            name: str,
+            namespace: Optional[str],
+            generation: int,
+            interval: float = CHECKPOINT_INTERVAL,
+            max_bytes: int = CHECKPOINT_MAX_BYTES,
+    ):
+        self._apis = apis_for_workload(apis, WORKLOAD_API)
+        self.name = name
+        self.namespace = namespace
+        self.generation = generation
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.steps: List[Dict[str, Any]] = []
+        self.vars: Dict[str, str] = {}
+        self.current: Optional[Dict[str, Any]] = None
+        self._initial: Dict[str, str] = {}
+        self._frozen = False
+        self._dirty = False
+        self._written_at = 0.0
+        self._pending: Optional[asyncio.Task] = None
+        self._sleeping = False
+        # переменные в status: что там лежит и что изменилось с последней записи
+        self._written_vars: Set[str] = set()
+        self._unwritten: Set[str] = set()
+        # размер каждой сохраняемой переменной в JSON: dumps только для изменившихся
+        self._sizes: Dict[str, int] = {}
+        self._size = 0
+
+    def resume(self, status: Optional[Dict[str, Any]], step_types: List[str], vars_map: Dict[str, str]) -> Set[int]:
+        """Индексы уже выполненных шагов; восстанавливает сохранённые переменные в vars_map."""
+        self._initial = dict(vars_map)
+        cp = (status or {}).get("checkpoint") or {}
+        if not cp or cp.get("generation") != self.generation:
+            # переменные чекпоинта другой generation обнуляются первой записью
+            self._written_vars = set(cp.get("vars") or {})
+            return set()
+        records = []
+        for rec in cp.get("steps") or []:
+            m = _PATH_RE.match(str(rec.get("path", "")))
+            index = int(m.group(1)) if m else -1
+            if not 0 <= index < len(step_types) or rec.get("status") != "Succeeded" \
+                    or rec.get("type") != step_types[index]:
+                break
+            records.append((index, rec))
+        if not records:
+            self._written_vars = set(cp.get("vars") or {})
+            return set()
+        self.steps = [rec for _, rec in records]
+        self.vars = dict(cp.get("vars") or {})
+        self._written_vars = set(self.vars)
+        for k, v in self.vars.items():
+            self._resize(k, v)
+        vars_map.update(self.vars)
+        logger.info("Flow %s/%s resumes with %s of %s steps done (generation %s)",
+                    self.namespace, self.name, len(records), len(step_types), self.generation)
+        return {index for index, _ in records}
+
+    def step_started(self, index: int, step_type: str) -> None:
+        if not self._frozen:
+            self.current = {"path": f"steps[{index}]", "type": step_type}
+
+    async def step_done(self, index: int, step_type: str, vars_map: Dict[str, str]) -> None:
+        if self._frozen:
+            return
+        changed = self._changes(vars_map)
+        size = self._size + sum(self._entry_size(k, v) - self._sizes.get(k, 0)
+                                for k, v in changed.items() if v is not _MISSING)
+        size -= sum(self._sizes.get(k, 0) for k, v in changed.items() if v is _MISSING)
+        if size > self.max_bytes:
+            # дальше чекпоинт не двигается: после рестарта шаги с этого места выполнятся заново
+            logger.warning("Flow %s/%s: captured vars exceed %s bytes, checkpoint stays at step %s",
+                           self.namespace, self.name, self.max_bytes, len(self.steps))
+            self._frozen = True
+            self.current = None
+            self._dirty = True
+            await self.flush()
+            return
+        for k, v in changed.items():
+            if v is _MISSING:
+                self.vars.pop(k, None)
+            else:
+                self.vars[k] = v
+            self._resize(k, v)
+            self._unwritten.add(k)
+        self.steps.append({"path": f"steps[{index}]", "type": step_type, "status": "Succeeded"})
+        self.current = None
+        self._dirty = True
+        await self.flush()
+
+    def _changes(self, vars_map: Dict[str, str]) -> Dict[str, Any]:
+        """Переменные, чьё сохраняемое значение изменилось; _MISSING — больше не сохраняется."""
+        changed: Dict[str, Any] = {}
+        seen = 0
+        for k, v in vars_map.items():
+            prev = self.vars.get(k, _MISSING)
+            if prev is v:
+                seen += 1
+                continue
+            initial = self._initial.get(k, _MISSING)
+            if initial is v or initial == v:
+                if prev is not _MISSING:
+                    changed[k] = _MISSING
+                continue
+            if prev is not _MISSING:
+                seen += 1
+                if prev == v:
+                    continue
+            changed[k] = v
+        if seen + sum(1 for v in changed.values() if v is _MISSING) < len(self.vars):
+            # переменная удалена из scope
+            for k in self.vars:
+                if k not in vars_map:
+                    changed[k] = _MISSING
+        return changed
+
+    @staticmethod
+    def _entry_size(k: str, v: Any) -> int:
+        # "k": v, — как в json.dumps всего словаря
+        return len(json.dumps(k)) + len(json.dumps(v)) + 4
+
+    def _resize(self, k: str, v: Any) -> None:
+        self._size -= self._sizes.pop(k, 0)
+        if v is not _MISSING:
+            self._sizes[k] = self._entry_size(k, v)
+            self._size += self._sizes[k]
+
+    def body(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "steps": list(self.steps),
+            "current": self.current,
+            "vars": dict(self.vars),
+        }
+
+    async def flush(self, force: bool = False) -> None:
+        if not self._dirty:
+            return
+        wait = self.interval - (time.monotonic() - self._written_at)
+        if not force and wait > 0:
+            # запись отложена; последний снимок уйдёт по таймеру
+            if self._pending is None:
+                self._sleeping = True
+                self._pending = asyncio.ensure_future(self._deferred(wait))
+            return
+        self._dirty = False
+        self._written_at = time.monotonic()
+        body = self.body()
+        # только изменённое с прошлой записи; merge patch не удаляет ключи сам — исчезнувшие обнуляются
+        stale = self._unwritten | (self._written_vars - self.vars.keys())
+        body["vars"] = {k: self.vars.get(k) for k in stale}
+        self._written_vars = set(self.vars)
+        self._unwritten = set()
+        await self._write(body)
+
+    async def _deferred(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._sleeping = False
+        try:
+            await self.flush(force=True)
+        finally:
+            self._pending = None
+
+    async def _write(self, checkpoint: Dict[str, Any]) -> None:
+        # чекпоинт — не повод валить поток: ошибки записи только логируются
+        await patch_flow_status(self._apis, self.name, self.namespace, {"checkpoint": checkpoint})
+
+    async def close(self, flush: bool = False) -> None:
+        """
+        Поток завершён: отложенная запись отменяется — итоговый status пишет reconcile,
+        поздний PATCH не должен его перетереть. flush=True (поток прерван, например остановкой
+        оператора) — последний снимок записывается сразу, чтобы продолжить с него после рестарта.
+        """
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            if self._sleeping:
+                pending.cancel()
+                self._sleeping = False
+            else:
+                await asyncio.gather(pending, return_exceptions=True)
+        if flush:
+            await self.flush(force=True)
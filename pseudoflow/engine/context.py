@@ -1,5 +1,75 @@
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, Mapping, MutableMapping, Optional
+
+_DELETED = object()
+
+
+class Scope(MutableMapping):
+    """
+    Слой переменных поверх родительского: чтение идёт по цепочке вверх,
+    запись и удаление — только в свой слой, родитель не меняется и не копируется.
+    Дочерний scope создаётся за O(1) независимо от размера родителя.
+    """
+
+    __slots__ = ("_local", "_parent")
+
+    def __init__(self, values: Optional[Mapping[str, Any]] = None, parent: Optional[Mapping[str, Any]] = None):
+        self._local: Dict[str, Any] = dict(values or {})
+        self._parent = parent
+
+    def child(self, values: Optional[Mapping[str, Any]] = None) -> "Scope":
+        return Scope(values, self)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._local:
+            value = self._local[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        if self._parent is None:
+            raise KeyError(key)
+        return self._parent[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._local:
+            return self._local[key] is not _DELETED
+        return self._parent is not None and key in self._parent
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._local[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if self._parent is not None and key in self._parent:
+            self._local[key] = _DELETED
+        else:
+            del self._local[key]
+
+    def __iter__(self) -> Iterator[str]:
+        if self._parent is not None:
+            for key in self._parent:
+                if key not in self._local:
+                    yield key
+        for key, value in self._local.items():
+            if value is not _DELETED:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def own(self, key: str) -> bool:
+        """Переменная записана в этом слое (а не унаследована)."""
+        return key in self._local and self._local[key] is not _DELETED
+
+    def export(self, names: Iterable[str], target: MutableMapping[str, Any]) -> None:
+        """Переносит в target переменные из names, записанные в этом слое."""
+        for name in names:
+            if self.own(name):
+                target[name] = self._local[name]
+
+    def __repr__(self) -> str:
+        return f"Scope({dict(self)!r})"
 
 
 @dataclass
@@ -7,4 +77,4 @@ class FlowContext:
     apis: Dict[str, Any]
     operator_ns: str
     namespace: Optional[str]
-    vars: Dict[str, str] = field(default_factory=dict)
+    vars: MutableMapping[str, Any] = field(default_factory=Scope)
@@ -1,6 +1,7 @@
 from typing import Dict, Callable, Awaitable
 
 from .context import FlowContext
+from pseudoflow.util import tracing
 from pseudoflow.steps import (
     log as step_log,
     sleep as step_sleep,
@@ -50,4 +51,5 @@ async def execute_step(step_type: str, step: dict, ctx: FlowContext) -> None:
     handler = _HANDLERS.get(step_type)
     if not handler:
         raise ValueError(f"unsupported step.type '{step_type}'")
-    await handler(step, ctx)
\ No newline at end of file
+    with tracing.span(f"handler {step_type}", **{"code.function": f"{handler.__module__}.handle"}):
+        await handler(step, ctx)
@@ -0,0 +1,212 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+
+from pseudoflow.util.conditions import OPS
+from pseudoflow.util.templating import Template, compile_str
+
+# Сколько скомпилированных планов (flow+generation) держать в памяти
+PLAN_CACHE_SIZE = 128
+
+# Поля со вложенными шагами по типам управляющих шагов; parallel.steps — список групп
+CHILD_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "retry": ("steps",),
+    "onError": ("steps",),
+    "when": ("steps",),
+    "loop": ("steps",),
+    "loopNodes": ("steps",),
+    "if": ("then", "else"),
+    "parallel": ("steps",),
+}
+
+
+# Где у шага лежит op условия: if/when — в condition, waitFor — в самом шаге
+CONDITION_FIELDS: Dict[str, Optional[str]] = {
+    "if": "condition",
+    "when": "condition",
+    "waitFor": None,
+}
+
+
+class _Seq:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = tuple(items)
+
+
+class _Map:
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = tuple(items)
+
+
+def compile_value(obj: Any) -> Any:
+    """Строки разбиваются на сегменты один раз; dict/list становятся неизменяемыми узлами."""
+    if isinstance(obj, str):
+        return compile_str(obj)
+    if isinstance(obj, list):
+        return _Seq(compile_value(x) for x in obj)
+    if isinstance(obj, dict):
+        return _Map((k, compile_value(v)) for k, v in obj.items())
+    return obj
+
+
+def render_value(node: Any, vars_map: Dict[str, str]) -> Any:
+    """Свежие dict/list на каждый вызов: обработчик шага может менять их без копирования плана."""
+    t = type(node)
+    if t is Template:
+        return node.render(vars_map)
+    if t is _Map:
+        return {k: render_value(v, vars_map) for k, v in node.items}
+    if t is _Seq:
+        return [render_value(v, vars_map) for v in node.items]
+    return node
+
+
+@dataclass(frozen=True)
+class PlanStep:
+    type: str
+    fields: _Map
+    children: Mapping[str, Tuple[Any, ...]]
+    id: Optional[str] = None
+    # индексы шагов того же списка, после которых можно стартовать
+    deps: Tuple[int, ...] = ()
+    # dependsOn задан явно — список исполняется как DAG
+    explicit: bool = False
+    # положение в spec: steps[2].steps[0], для parallel — steps[1].steps[0][3]
+    path: str = ""
+
+    def render(self, vars_map: Dict[str, str]) -> Dict[str, Any]:
+        """Параметры шага без вложенных шагов, с подставленными переменными."""
+        return render_value(self.fields, vars_map)
+
+    def child(self, field: str) -> Tuple[Any, ...]:
+        return self.children.get(field, ())
+
+
+Plan = Tuple[PlanStep, ...]
+
+
+def compile_steps(steps: Optional[List[Dict[str, Any]]], prefix: str = "steps") -> Plan:
+    return _link([compile_step(s, f"{prefix}[{i}]") for i, s in enumerate(steps or [])],
+                 [s.get("dependsOn") for s in steps or []])
+
+
+def is_dag(plan: Plan) -> bool:
+    return any(s.explicit for s in plan)
+
+
+def step_label(plan: Plan, index: int) -> str:
+    return plan[index].id or f"steps[{index}]"
+
+
+def _link(compiled: List[PlanStep], depends: List[Any]) -> Plan:
+    """
+    Связывает шаги списка: dependsOn — id шагов этого же списка,
+    без dependsOn шаг идёт после предыдущего. Циклы — ошибка компиляции.
+    """
+    ids: Dict[str, int] = {}
+    for i, s in enumerate(compiled):
+        if s.id is not None:
+            if s.id in ids:
+                raise ValueError(f"duplicate step id '{s.id}'")
+            ids[s.id] = i
+
+    linked = []
+    for i, (s, after) in enumerate(zip(compiled, depends)):
+        if after is None:
+            deps: Tuple[int, ...] = (i - 1,) if i else ()
+        else:
+            if isinstance(after, str):
+                after = [after]
+            unknown = [a for a in after if a not in ids]
+            if unknown:
+                raise ValueError(f"step '{s.id or f'steps[{i}]'}' dependsOn unknown id(s): {', '.join(map(str, unknown))}")
+            deps = tuple(sorted({ids[a] for a in after}))
+        linked.append(replace(s, deps=deps, explicit=after is not None))
+
+    cycle = _find_cycle(linked)
+    if cycle:
+        raise ValueError(f"dependency cycle between steps: {' -> '.join(cycle)}")
+    return tuple(linked)
+
+
+def _find_cycle(steps: List[PlanStep]) -> List[str]:
+    # Kahn: что не удалось упорядочить — лежит на цикле или зависит от него
+    pending = {i: set(s.deps) for i, s in enumerate(steps)}
+    while True:
+        ready = [i for i, deps in pending.items() if not deps]
+        if not ready:
+            break
+        for i in ready:
+            del pending[i]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    if not pending:
+        return []
+    # путь по зависимостям до первого повтора
+    i = min(pending)
+    seen: List[int] = []
+    while i not in seen:
+        seen.append(i)
+        i = min(pending[i])
+    cycle = seen[seen.index(i):] + [i]
+    return [step_label(steps, j) for j in reversed(cycle)]
+
+
+def _check_op(stype: str, step: Dict[str, Any], path: str) -> None:
+    # неизвестный op — ошибка компиляции с путём шага, а не тихое False на каждой проверке;
+    # op с ${var} проверяется при исполнении
+    field = CONDITION_FIELDS[stype]
+    cond = step.get(field) if field else step
+    op = cond.get("op") if isinstance(cond, dict) else None
+    if isinstance(op, str) and "${" not in op and op not in OPS:
+        raise ValueError(f"{path}: {stype} op '{op}' is not supported ({'|'.join(OPS)})")
+
+
+def compile_step(step: Dict[str, Any], path: str = "") -> PlanStep:
+    stype = step.get("type")
+    if not stype:
+        raise ValueError("step.type is required")
+    if stype in CONDITION_FIELDS:
+        _check_op(stype, step, path)
+    nested = CHILD_FIELDS.get(stype, ())
+    children = {}
+    for field in nested:
+        if stype == "parallel":
+            children[field] = tuple(compile_steps(group, f"{path}.{field}[{g}]")
+                                    for g, group in enumerate(step.get(field) or []))
+        else:
+            children[field] = compile_steps(step.get(field), f"{path}.{field}")
+    fields = _Map((k, compile_value(v)) for k, v in step.items() if k not in nested and k != "dependsOn")
+    sid = step.get("id")
+    return PlanStep(type=stype, fields=fields, children=MappingProxyType(children),
+                    id=str(sid) if sid is not None else None, path=path)
+
+
+_plans: "OrderedDict[Hashable, Plan]" = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def get_plan(key: Optional[Hashable], steps: Optional[List[Dict[str, Any]]]) -> Plan:
+    """
+    План по ключу (namespace, name, generation): spec неизменен в пределах generation,
+    поэтому компиляция выполняется один раз. key=None — без кэша.
+    """
+    if key is None:
+        return compile_steps(steps)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+    plan = compile_steps(steps)
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
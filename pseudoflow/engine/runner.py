@@ -1,42 +1,73 @@
 import asyncio
-import copy
+import json
 import logging
+import os
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from jsonpath_ng import parse as jp_parse
-from kubernetes import client
-
-from .context import FlowContext
+from .checkpoint import CHECKPOINT_ENABLED, Checkpoint
+from .context import FlowContext, Scope
 from .dispatcher import execute_step
-from pseudoflow.kube import select_nodes
-from pseudoflow.util.templating import render_str
+from .plan import CHILD_FIELDS, Plan, PlanStep, get_plan, is_dag, step_label
+from pseudoflow.kube import aio
+from pseudoflow.util import metrics, tracing
+from pseudoflow.util.conditions import compile_condition
+from pseudoflow.util.fanout import fan_out
 
 logger = logging.getLogger("pseudoflow.engine")
 
+# Сколько шагов DAG (dependsOn) одного потока исполнять одновременно; options.maxParallelSteps переопределяет
+MAX_PARALLEL_STEPS = int(os.getenv("PSEUDOFLOW_MAX_PARALLEL_STEPS", "8"))
+# Параметры шага, описывающие его цель; попадают в атрибут step.target спана
+TARGET_FIELDS = ("resource", "target", "name", "namespace", "kind", "selector", "node", "nodeSelector",
+                 "path", "file", "url", "command", "var")
+
 
 class RunResult:
     def __init__(self):
         self.steps_ok = 0
         self.steps_fail = 0
+        self.steps_resumed = 0
+        # (метки шагов, секунды) самой длинной цепочки зависимостей DAG
+        self.critical_path: Optional[Tuple[List[str], float]] = None
         self.start = time.time()
 
     @property
     def summary(self) -> str:
         dur = time.time() - self.start
-        return f"steps_ok={self.steps_ok} steps_fail={self.steps_fail} duration_sec={round(dur, 2)}"
+        out = f"steps_ok={self.steps_ok} steps_fail={self.steps_fail} duration_sec={round(dur, 2)}"
+        if self.steps_resumed:
+            out += f" steps_resumed={self.steps_resumed}"
+        if self.critical_path:
+            labels, seconds = self.critical_path
+            out += f" critical_path={'>'.join(labels)}({round(seconds, 2)}s)"
+        return out
 
 
 class FlowEngine:
     def __init__(self, apis, operator_namespace: str):
         self.apis = apis
         self.operator_ns = operator_namespace
+        self._step_slots: Optional[asyncio.Semaphore] = None
+        # метка flow в метриках шагов; includeFlow считается шагами родителя
+        self._flow = ""
 
-    async def run_flow(self, name: str, namespace: Optional[str], spec: Dict[str, Any]) -> RunResult:
-        vars_map: Dict[str, str] = spec.get("vars", {}) or {}
-        steps = spec.get("steps", []) or []
+    async def run_flow(
+            self,
+            name: str,
+            namespace: Optional[str],
+            spec: Dict[str, Any],
+            generation: Optional[int] = None,
+            status: Optional[Dict[str, Any]] = None,
+    ) -> RunResult:
+        vars_map = Scope(spec.get("vars", {}) or {})
+        # план компилируется раз на generation: строки заранее разбиты на литералы и ${var}
+        plan = get_plan((namespace, name, generation) if generation is not None else None, spec.get("steps"))
         options = spec.get("options", {}) or {}
         timeout = options.get("timeoutSeconds", 0)
+        # общий на поток лимит одновременно исполняемых шагов DAG (dependsOn)
+        self._step_slots = asyncio.Semaphore(max(1, int(options.get("maxParallelSteps") or MAX_PARALLEL_STEPS)))
+        self._flow = f"{namespace}/{name}" if namespace else str(name)
 
         ctx = FlowContext(
             apis=self.apis,
@@ -45,47 +76,199 @@ class FlowEngine:
             vars=vars_map,
         )
 
-        if timeout:
-            return await asyncio.wait_for(self._run_steps(steps, ctx), timeout=timeout)
-        return await self._run_steps(steps, ctx)
+        # чекпоинт пишется только для верхнего уровня; generation не совпал — поток с начала
+        checkpoint = None
+        done: Set[int] = set()
+        if CHECKPOINT_ENABLED and name and generation is not None:
+            checkpoint = Checkpoint(self.apis, name, namespace, generation)
+            done = checkpoint.resume(status, [p.type for p in plan], ctx.vars)
+
+        outcome = "Failed"
+        metrics.ACTIVE_FLOWS.inc()
+        try:
+            with tracing.span(f"flow {self._flow}", flow=self._flow, generation=generation,
+                              **{"flow.steps": len(plan), "flow.resumed": len(done)}):
+                run = self._run_steps(plan, ctx, checkpoint=checkpoint, done=done)
+                if timeout:
+                    # по таймауту отмена доходит до шагов: потоки executor освобождаются, поды удаляются
+                    try:
+                        result = await asyncio.wait_for(run, timeout=timeout)
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(f"flow timed out after {timeout}s") from None
+                else:
+                    result = await run
+            outcome = "Succeeded"
+            return result
+        except asyncio.CancelledError:
+            outcome = "Aborted"
+            raise
+        finally:
+            metrics.ACTIVE_FLOWS.dec()
+            metrics.RUNS_TOTAL.inc(flow=self._flow, status=outcome)
+            if checkpoint is not None:
+                # прерванный поток (остановка оператора) продолжится с последнего шага, а не с прошлой записи
+                await checkpoint.close(flush=outcome == "Aborted")
+
+    async def _run_steps(
+            self,
+            steps: Plan,
+            ctx: FlowContext,
+            checkpoint: Optional[Checkpoint] = None,
+            done: Optional[Set[int]] = None,
+    ) -> RunResult:
+        done = done or set()
+        if is_dag(steps):
+            return await self._run_dag(steps, ctx, checkpoint, done)
 
-    async def _run_steps(self, steps: List[Dict[str, Any]], ctx: FlowContext) -> RunResult:
         result = RunResult()
+        result.steps_resumed = len(done)
         prev_failed = False
         last_error: Optional[Exception] = None
 
-        for step in steps:
+        for index, step in enumerate(steps):
+            if index in done:
+                continue
             try:
+                if checkpoint is not None:
+                    checkpoint.step_started(index, step.type)
                 await self._run_step(step, ctx, prev_failed, last_error)
                 prev_failed = False
                 last_error = None
                 result.steps_ok += 1
+                if checkpoint is not None:
+                    await checkpoint.step_done(index, step.type, ctx.vars)
             except Exception as e:
                 prev_failed = True
                 last_error = e
                 result.steps_fail += 1
                 logger.error("Step failed: %s", e)
-                raise
+                # ошибку обрабатывает только следующий за шагом onError, после него поток продолжается
+                nxt = index + 1
+                if nxt >= len(steps) or nxt in done or steps[nxt].type != "onError":
+                    raise
+        return result
+
+    async def _run_dag(self, steps: Plan, ctx: FlowContext, checkpoint: Optional[Checkpoint], done: Set[int]) -> RunResult:
+        """
+        Шаги со зависимостями (id/dependsOn): шаг стартует, как только завершились все его dependsOn.
+        Листовые шаги занимают слот общего лимита потока, управляющие (loop/parallel/...) — нет,
+        иначе вложенные шаги могли бы ждать слота, занятого родителем.
+        Ошибка шага без зависящего от него onError отменяет уже запущенные шаги.
+        Если такой onError есть, он получает ошибку, остальные зависимые шаги пропускаются
+        и передают её дальше; поток падает, если хоть одну ошибку не обработал onError.
+        """
+        result = RunResult()
+        result.steps_resumed = len(done)
+        finished = set(done)
+        remaining = [i for i in range(len(steps)) if i not in done]
+        durations: Dict[int, float] = {}
+        running: Dict[asyncio.Task, int] = {}
+        # упавшие шаги и шаги, пропущенные из-за упавших зависимостей
+        failed: Dict[int, Exception] = {}
+        handled: Set[int] = set()
+        guarded = _guarded(steps)
+
+        async def run_node(index: int, error: Optional[Exception]) -> None:
+            step = steps[index]
+            leaf = step.type not in CHILD_FIELDS and step.type != "includeFlow"
+            if leaf and self._step_slots is not None:
+                await self._step_slots.acquire()
+            started = time.monotonic()
+            try:
+                if checkpoint is not None:
+                    checkpoint.step_started(index, step.type)
+                await self._run_step(step, ctx, error is not None, error)
+            finally:
+                durations[index] = time.monotonic() - started
+                if leaf and self._step_slots is not None:
+                    self._step_slots.release()
+
+        def start_ready() -> None:
+            progressed = True
+            while progressed:
+                progressed = False
+                for index in [i for i in remaining if all(d in finished or d in failed for d in steps[i].deps)]:
+                    remaining.remove(index)
+                    progressed = True
+                    errors = [failed[d] for d in steps[index].deps if d in failed]
+                    if errors and steps[index].type != "onError":
+                        logger.warning("Step %s skipped: a dependency failed", step_label(steps, index))
+                        failed[index] = errors[0]
+                        continue
+                    running[asyncio.create_task(run_node(index, errors[0] if errors else None))] = index
+
+        try:
+            while True:
+                start_ready()
+                if not running:
+                    break
+                completed, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in completed:
+                    index = running.pop(task)
+                    if task.exception() is not None:
+                        result.steps_fail += 1
+                        logger.error("Step %s failed: %s", step_label(steps, index), task.exception())
+                        if index not in guarded:
+                            raise task.exception()
+                        failed[index] = task.exception()
+                        continue
+                    finished.add(index)
+                    result.steps_ok += 1
+                    if steps[index].type == "onError":
+                        # обработана и ошибка, из-за которой пропущены зависимости onError
+                        stack = [d for d in steps[index].deps if d in failed]
+                        while stack:
+                            d = stack.pop()
+                            if d not in handled:
+                                handled.add(d)
+                                stack.extend(x for x in steps[d].deps if x in failed)
+                    if checkpoint is not None:
+                        await checkpoint.step_done(index, steps[index].type, ctx.vars)
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        unhandled = sorted(i for i in failed if i not in handled)
+        if unhandled:
+            raise failed[unhandled[0]]
+        result.critical_path = _critical_path(steps, durations)
         return result
 
     async def _run_step(
             self,
+            node: PlanStep,
+            ctx: FlowContext,
+            prev_failed: bool,
+            last_error: Optional[Exception],
+    ):
+        started = time.monotonic()
+        # рендерятся только параметры самого шага; вложенные шаги — перед своим запуском
+        step = node.render(ctx.vars)
+        try:
+            with tracing.span(f"step {node.type}", **{"step.type": node.type, "step.id": node.id,
+                                                       "step.path": node.path or None,
+                                                       "step.target": _target(step),
+                                                       "step.rendered_bytes": _rendered_bytes(step)}):
+                await self._dispatch_step(node, step, ctx, prev_failed, last_error)
+        finally:
+            metrics.STEP_DURATION.observe(time.monotonic() - started, flow=self._flow, step_type=node.type)
+
+    async def _dispatch_step(
+            self,
+            node: PlanStep,
             step: Dict[str, Any],
             ctx: FlowContext,
             prev_failed: bool,
             last_error: Optional[Exception],
     ):
-        stype = step.get("type")
-        if not stype:
-            raise ValueError("step.type is required")
-
-        step = _deep_render(copy.deepcopy(step), ctx.vars)
+        stype = node.type
 
         # retry
         if stype == "retry":
             attempts = int(step.get("attempts", 3))
             backoff = int(step.get("backoffSeconds", 2))
-            substeps = step.get("steps", [])
+            substeps = node.child("steps")
             err: Optional[Exception] = None
             for i in range(attempts):
                 try:
@@ -102,7 +285,7 @@ class FlowEngine:
             if not prev_failed or last_error is None:
                 logger.debug("onError skipped: no previous error")
                 return
-            substeps = step.get("steps", [])
+            substeps = node.child("steps")
             ctx.vars["__last_error__"] = str(last_error)
             await self._run_steps(substeps, ctx)
             return
@@ -110,72 +293,53 @@ class FlowEngine:
         # if
         if stype == "if":
             cond = step.get("condition", {})
-            if _eval_condition(ctx.apis, cond, ctx.namespace):
-                await self._run_steps(step.get("then", []), ctx)
+            if await _eval_condition(ctx.apis, cond, ctx.namespace):
+                await self._run_steps(node.child("then"), ctx)
             else:
-                await self._run_steps(step.get("else", []), ctx)
+                await self._run_steps(node.child("else"), ctx)
             return
 
         # when
         if stype == "when":
             cond = step.get("condition", {})
-            if _eval_condition(ctx.apis, cond, ctx.namespace):
-                await self._run_steps(step.get("steps", []), ctx)
+            if await _eval_condition(ctx.apis, cond, ctx.namespace):
+                await self._run_steps(node.child("steps"), ctx)
             return
 
         # loop
         if stype == "loop":
-            items = _parse_iterable(step.get("forEach"))
-            substeps = step.get("steps", [])
-            for it in items:
-                local_vars = dict(ctx.vars)
-                local_vars["item"] = str(it)
-                local_ctx = FlowContext(
-                    apis=ctx.apis,
-                    operator_ns=ctx.operator_ns,
-                    namespace=ctx.namespace,
-                    vars=local_vars,
-                )
-                await self._run_steps(_render_steps(substeps, local_ctx.vars), local_ctx)
+            items = [str(it) for it in _parse_iterable(step.get("forEach"))]
+            await self._run_iterations(step, node.child("steps"), ctx, "item", items)
             return
 
         # loopNodes
         if stype == "loopNodes":
-            nodes = select_nodes(ctx.apis, step.get("selector", {}))
-            substeps = step.get("steps", [])
-            for node in nodes:
-                local_vars = dict(ctx.vars)
-                local_vars["node"] = node
-                local_ctx = FlowContext(
-                    apis=ctx.apis,
-                    operator_ns=ctx.operator_ns,
-                    namespace=ctx.namespace,
-                    vars=local_vars,
-                )
-                await self._run_steps(_render_steps(substeps, local_ctx.vars), local_ctx)
+            nodes = await aio.select_nodes(ctx.apis, step.get("selector", {}))
+            await self._run_iterations(step, node.child("steps"), ctx, "node", nodes)
             return
 
         # parallel
         if stype == "parallel":
-            groups = step.get("steps", [])
+            groups = node.child("steps")
             wait_all = bool(step.get("waitForAll", True))
+            export = _export_names(step)
+            branch_vars = [Scope(parent=ctx.vars) for _ in groups]
             coros = [
-                self._run_steps(
-                    _render_steps(group, ctx.vars),
+                _traced_steps("branch", {"parallel.branch": i}, self._run_steps(
+                    group,
                     FlowContext(
                         apis=ctx.apis,
                         operator_ns=ctx.operator_ns,
                         namespace=ctx.namespace,
-                        vars=dict(ctx.vars),
+                        vars=local_vars,
                     ),
-                )
-                for group in groups
+                ))
+                for i, (group, local_vars) in enumerate(zip(groups, branch_vars))
             ]
-            if wait_all:
-                await asyncio.gather(*coros)
-            else:
-                # FIX: Используем asyncio.wait с return_when=asyncio.FIRST_EXCEPTION
-                await asyncio.wait(coros, return_when=asyncio.FIRST_EXCEPTION)
+            await _run_branches(coros, wait_all)
+            # при совпадении имён побеждает ветка, объявленная позже
+            for local_vars in branch_vars:
+                local_vars.export(export, ctx.vars)
             return
 
         # includeFlow
@@ -185,39 +349,188 @@ class FlowEngine:
             inherit = bool(step.get("inheritVars", False))
             if not name:
                 raise ValueError("includeFlow.name required")
-            obj = ctx.apis["custom"].get_namespaced_custom_object(
-                group="ops.example.com",
-                version="v1alpha1",
-                namespace=ns,
-                plural="pseudoflows",
-                name=name,
-            )
-            sub_vars = dict(ctx.vars) if inherit else {}
+            obj = await aio.get_object(ctx.apis, "PseudoFlow", name, ns, "ops.example.com/v1alpha1")
+            if obj is None:
+                raise ValueError(f"includeFlow: PseudoFlow {ns}/{name} not found")
+            sub_vars = Scope(parent=ctx.vars) if inherit else Scope()
             sub_ctx = FlowContext(
                 apis=ctx.apis,
                 operator_ns=ctx.operator_ns,
                 namespace=ns,
                 vars=sub_vars,
             )
-            await self._run_steps(obj.get("spec", {}).get("steps", []), sub_ctx)
+            generation = (obj.get("metadata") or {}).get("generation")
+            plan = get_plan((ns, name, generation) if generation is not None else None,
+                            obj.get("spec", {}).get("steps"))
+            await self._run_steps(plan, sub_ctx)
+            sub_vars.export(_export_names(step), ctx.vars)
             return
 
         # default: delegate to step handler
         await execute_step(stype, step, ctx)
 
+    async def _run_iterations(self, step: Dict[str, Any], substeps: Plan, ctx: FlowContext, var: str, items):
+        """
+        Итерации loop/loopNodes, каждая в своём scope с var=item.
+        parallelism: 1 (по умолчанию) — по очереди, exportVars после каждой итерации;
+        иначе — не более N одновременно, exportVars после всех итераций в их порядке.
+        failurePolicy: failFast — остановиться на первой ошибке, collect — дойти до конца и собрать ошибки.
+        collectVars: переменные итераций → JSON-список в порядке items (null для упавших).
+        """
+        parallelism = max(1, int(step.get("parallelism") or 1))
+        policy = step.get("failurePolicy", "failFast")
+        if policy not in ("failFast", "collect"):
+            raise ValueError(f"{step.get('type')}.failurePolicy must be failFast or collect")
+        export = _export_names(step)
+        collect = _names(step.get("collectVars"))
+        scopes = [Scope({var: item}, ctx.vars) for item in items]
+
+        def iteration_ctx(i: int) -> FlowContext:
+            return FlowContext(
+                apis=ctx.apis,
+                operator_ns=ctx.operator_ns,
+                namespace=ctx.namespace,
+                vars=scopes[i],
+            )
+
+        def store_collected() -> None:
+            for name in collect:
+                ctx.vars[name] = json.dumps([sc[name] if sc.own(name) else None for sc in scopes])
+
+        try:
+            if parallelism == 1 and policy == "failFast":
+                for i in range(len(items)):
+                    await _traced_steps("iteration", {var: items[i], "loop.index": i},
+                                        self._run_steps(substeps, iteration_ctx(i)))
+                    scopes[i].export(export, ctx.vars)
+                return
 
-def _render_steps(steps, vars_map):
-    return [_deep_render(copy.deepcopy(s), vars_map) for s in steps]
+            keys = [f"{i}:{item}" if var == "item" else item for i, item in enumerate(items)]
+            index = {k: i for i, k in enumerate(keys)}
 
+            async def run_one(key: str) -> None:
+                i = index[key]
+                await _traced_steps("iteration", {var: items[i], "loop.index": i},
+                                    self._run_steps(substeps, iteration_ctx(i)))
 
-def _deep_render(obj, vars_map):
-    if isinstance(obj, str):
-        return render_str(obj, vars_map)
-    if isinstance(obj, list):
-        return [_deep_render(x, vars_map) for x in obj]
-    if isinstance(obj, dict):
-        return {k: _deep_render(v, vars_map) for k, v in obj.items()}
-    return obj
+            try:
+                await fan_out(keys, run_one, parallelism, fail_fast=policy == "failFast", tolerate=0)
+            finally:
+                for sc in scopes:
+                    sc.export(export, ctx.vars)
+        finally:
+            store_collected()
+
+
+def _target(step: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not tracing.enabled():
+        return None
+    target = {k: step[k] for k in TARGET_FIELDS if k in step}
+    return target or None
+
+
+def _rendered_bytes(step: Dict[str, Any]) -> Optional[int]:
+    """Объём строк в отрендеренных параметрах шага (только при включённой трассировке)."""
+    if not tracing.enabled():
+        return None
+    return _string_bytes(step)
+
+
+def _string_bytes(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return sum(_string_bytes(v) for v in value.values())
+    if isinstance(value, list):
+        return sum(_string_bytes(v) for v in value)
+    return 0
+
+
+async def _traced_steps(name: str, attributes: Dict[str, Any], run) -> RunResult:
+    # спан итерации/ветки создаётся внутри своей задачи: вложенные шаги становятся его детьми
+    with tracing.span(name, **attributes):
+        return await run
+
+
+async def _run_branches(coros, wait_all: bool) -> None:
+    """
+    Ветки parallel. waitForAll: true — дождаться всех, затем поднять первую ошибку;
+    false — первая ошибка отменяет остальные ветки. Отмена самого шага отменяет все ветки.
+    """
+    tasks = [asyncio.create_task(c) for c in coros]
+    try:
+        if wait_all:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                raise errors[0]
+        elif tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _guarded(steps: Plan) -> Set[int]:
+    """Шаги, ошибку которых может получить onError: он зависит от них напрямую или через другие шаги."""
+    guarded: Set[int] = set()
+    stack = [i for i, s in enumerate(steps) if s.type == "onError"]
+    while stack:
+        for d in steps[stack.pop()].deps:
+            if d not in guarded:
+                guarded.add(d)
+                stack.append(d)
+    return guarded
+
+
+def _critical_path(steps: Plan, durations: Dict[int, float]) -> Tuple[List[str], float]:
+    # самая длинная по времени цепочка зависимостей; шаги из чекпоинта считаются мгновенными
+    finish: Dict[int, float] = {}
+    prev: Dict[int, Optional[int]] = {}
+    order = _topological(steps)
+    for i in order:
+        best = max(steps[i].deps, key=lambda d: finish[d], default=None)
+        prev[i] = best
+        finish[i] = durations.get(i, 0.0) + (finish[best] if best is not None else 0.0)
+    if not finish:
+        return [], 0.0
+    last: Optional[int] = max(finish, key=finish.get)
+    total = finish[last]
+    path = []
+    while last is not None:
+        path.append(step_label(steps, last))
+        last = prev[last]
+    return path[::-1], total
+
+
+def _topological(steps: Plan) -> List[int]:
+    order: List[int] = []
+    placed: Set[int] = set()
+    while len(order) < len(steps):
+        for i, step in enumerate(steps):
+            if i not in placed and all(d in placed for d in step.deps):
+                order.append(i)
+                placed.add(i)
+    return order
+
+
+def _export_names(step: Dict[str, Any]):
+    # переменные, которые дочерний scope (итерация, ветка, включённый поток) возвращает родителю
+    return _names(step.get("exportVars"))
+
+
+def _names(value) -> List[str]:
+    # список имён переменных: YAML-список или строка через пробел/запятую
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [n for n in value.replace(",", " ").split() if n]
+    return list(value)
 
 
 def _parse_iterable(expr):
@@ -232,16 +545,21 @@ def _parse_iterable(expr):
     raise ValueError("loop.forEach must be list or string")
 
 
-def _eval_condition(apis, condition: Dict[str, Any], default_ns: Optional[str]) -> bool:
+async def _eval_condition(apis, condition: Dict[str, Any], default_ns: Optional[str]) -> bool:
     res = condition.get("resource")
     if not res:
         return False
     json_path = condition.get("jsonPath")  # FIX: PEP8 jsonPath -> json_path
     op = condition.get("op", "equals")
     value = condition.get("value", "")
+    try:
+        predicate = compile_condition(json_path, op, value)
+    except ValueError as e:
+        # литеральный op проверен при компиляции плана; сюда доходит op из ${var}
+        logger.warning("Condition is false: %s", e)
+        return False
 
-    # Парсинг GVK
-    gv = res.get("apiVersion", "v1")
+    gv = res.get("apiVersion")
     kind = res.get("kind")
     name = res.get("name")
     ns = res.get("namespace", default_ns)
@@ -249,95 +567,12 @@ def _eval_condition(apis, condition: Dict[str, Any], default_ns: Optional[str])
     if not kind or not name:
         return False
 
-    core = apis["core"]
-    apps = apis["apps"]
-    custom = apis["custom"]
-
-    obj = None
     try:
-        # Пытаемся определить метод загрузки на основе GVK
-        if "/" in gv:
-            group, version = gv.split("/", 1)
-        else:
-            group, version = "", gv
-
-        # 1. Core Resources (v1)
-        if group == "" and version == "v1":
-            if kind == "ConfigMap":
-                obj = core.read_namespaced_config_map(name, ns)
-            elif kind == "Service":
-                obj = core.read_namespaced_service(name, ns)
-            elif kind == "Pod":
-                obj = core.read_namespaced_pod(name, ns)
-            elif kind == "Secret":
-                obj = core.read_namespaced_secret(name, ns)
-            elif kind == "Node":
-                obj = core.read_node(name)
-            else:
-                pass
-
-        # 2. Apps Resources (apps/v1)
-        elif group == "apps" and version == "v1":
-            if kind == "Deployment":
-                obj = apps.read_namespaced_deployment(name, ns)
-            elif kind == "DaemonSet":
-                obj = apps.read_namespaced_daemon_set(name, ns)
-            elif kind == "StatefulSet":
-                obj = apps.read_namespaced_stateful_set(name, ns)
-            else:
-                pass
-
-        # 3. Custom Resources (CRDs) и остальные
-        if obj is None:
-            # Превращаем kind в plural (простая эвристика)
-            plural = kind.lower() + "s"
-            try:
-                obj_dict = custom.get_namespaced_custom_object(
-                    group=group,
-                    version=version,
-                    namespace=ns,
-                    plural=plural,
-                    name=name
-                )
-                data = obj_dict
-            except client.exceptions.ApiException:
-                return False
-
+        # discovery и GET — через aio-клиент или api executor, не на event loop
+        data = await aio.get_object(apis, kind, name, ns, gv)
     except Exception:
         return False
-
-    # Унификация данных (модель -> dict)
-    if obj and not isinstance(obj, dict):
-        try:
-            data = obj.to_dict()
-        except AttributeError:
-            data = obj
-    elif obj:
-        data = obj
-    elif 'data' not in locals():
-        return False
-
-    matches = [m.value for m in jp_parse(json_path).find(data)] if json_path else [data]
-
-    def cmp(m):
-        m_str = str(m)
-        val_str = str(value)
-        if op == "equals":
-            return m_str == val_str
-        if op == "notEquals":
-            return m_str != val_str
-        if op == "contains":
-            return val_str in m_str
-
-        try:
-            m_float = float(m)
-            val_float = float(value)
-            if op == "greaterThan":
-                return m_float > val_float
-            if op == "lessThan":
-                return m_float < val_float
-        except (ValueError, TypeError):
-            pass
+    if data is None:
         return False
 
-    return any(cmp(m) for m in matches)
\ No newline at end of file
+    return predicate(data)
@@ -0,0 +1,195 @@
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+from pseudoflow.util import metrics
+
+logger = logging.getLogger("pseudoflow.engine.scheduler")
+
+# Сколько потоков оператор исполняет одновременно (0 — без ограничения)
+MAX_ACTIVE_FLOWS = int(os.getenv("PSEUDOFLOW_MAX_ACTIVE_FLOWS", "0"))
+# Веса namespace при делении слотов: "team-a=3,team-b=1"; по умолчанию вес 1
+NAMESPACE_WEIGHTS = os.getenv("PSEUDOFLOW_NAMESPACE_WEIGHTS", "")
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for item in text.replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        ns, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid namespace weight '{item}', expected ns=weight")
+        weight = float(value)
+        if weight <= 0:
+            raise ValueError(f"Namespace weight must be positive: '{item}'")
+        weights[ns.strip()] = weight
+    return weights
+
+
+class _Waiter:
+    __slots__ = ("key", "namespace", "priority", "seq", "future", "since")
+
+    def __init__(self, key: str, namespace: str, priority: int, seq: int, future: asyncio.Future):
+        self.key = key
+        self.namespace = namespace
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.since = time.monotonic()
+
+
+class FlowScheduler:
+    """
+    Допуск потоков к исполнению: не более max_active одновременно.
+    Очередь — строгий приоритет (spec.options.priority, больше — раньше), внутри приоритета
+    слоты делятся между namespace пропорционально весам (start-time fair queueing),
+    внутри namespace — FIFO. Массовое создание потоков в одном namespace
+    не задерживает остальные дольше их доли.
+    """
+
+    def __init__(self, max_active: int = MAX_ACTIVE_FLOWS, weights: Optional[Dict[str, float]] = None):
+        self.max_active = max_active
+        self.weights = dict(weights or {})
+        self._active: Dict[str, float] = {}
+        # priority -> namespace -> очередь ожидающих
+        self._queues: Dict[int, Dict[str, Deque[_Waiter]]] = {}
+        # виртуальное время: namespace, получивший слот, сдвигается на 1/weight
+        self._vtime: Dict[str, float] = {}
+        self._clock = 0.0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.wait_seconds_max = 0.0
+
+    def weight(self, namespace: str) -> float:
+        return self.weights.get(namespace, 1.0)
+
+    @asynccontextmanager
+    async def slot(
+            self,
+            key: str,
+            namespace: Optional[str],
+            priority: int = 0,
+            on_queued: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> AsyncIterator[bool]:
+        """
+        Удерживает слот на время блока; значение — стоял ли поток в очереди.
+        on_queued вызывается один раз, если слот не выдан сразу.
+        Отмена в очереди снимает поток с неё, не занимая слот.
+        """
+        queued = await self._acquire(key, namespace or "", priority, on_queued)
+        try:
+            yield queued
+        finally:
+            self._release(key)
+
+    async def _acquire(self, key: str, namespace: str, priority: int,
+                       on_queued: Optional[Callable[[], Awaitable[Any]]]) -> bool:
+        with self._lock:
+            if not self._queues and (self.max_active <= 0 or len(self._active) < self.max_active):
+                self._grant(key, namespace, 0.0)
+                return False
+            waiter = _Waiter(key, namespace, priority, next(self._seq), asyncio.get_running_loop().create_future())
+            self._queues.setdefault(priority, {}).setdefault(namespace, deque()).append(waiter)
+            metrics.QUEUED_FLOWS.inc()
+            logger.info("Flow %s queued (priority=%s, active=%s/%s, queued=%s)",
+                        key, priority, len(self._active), self.max_active, self._queued())
+        try:
+            if on_queued is not None and not waiter.future.done():
+                await on_queued()
+            await waiter.future
+        except BaseException:
+            with self._lock:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # слот уже выдан — освобождаем его следующему
+                    granted = True
+                else:
+                    granted = False
+                    waiter.future.cancel()
+                    self._remove(waiter)
+            if granted:
+                self._release(key)
+            raise
+        return True
+
+    def _grant(self, key: str, namespace: str, waited: float) -> None:
+        self._active[key] = time.monotonic()
+        start = max(self._vtime.get(namespace, 0.0), self._clock)
+        self._clock = start
+        self._vtime[namespace] = start + 1.0 / self.weight(namespace)
+        self.admitted += 1
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            self._active.pop(key, None)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._queues and (self.max_active <= 0 or len(self._active) < self.max_active):
+            priority = max(self._queues)
+            by_ns = self._queues[priority]
+            # namespace с наименьшим виртуальным временем старта; при равенстве — кто раньше встал
+            namespace = min(by_ns, key=lambda ns: (max(self._vtime.get(ns, 0.0), self._clock), by_ns[ns][0].seq))
+            waiter = by_ns[namespace].popleft()
+            metrics.QUEUED_FLOWS.dec()
+            if not by_ns[namespace]:
+                del by_ns[namespace]
+                if not by_ns:
+                    del self._queues[priority]
+            if waiter.future.done():
+                # задача ожидающего уже отменена — её except сам уберёт хвосты
+                continue
+            self._grant(waiter.key, waiter.namespace, time.monotonic() - waiter.since)
+            waiter.future.set_result(True)
+            logger.info("Flow %s admitted after %.2fs in queue", waiter.key, time.monotonic() - waiter.since)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        by_ns = self._queues.get(waiter.priority, {})
+        queue = by_ns.get(waiter.namespace)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        metrics.QUEUED_FLOWS.dec()
+        if not queue:
+            del by_ns[waiter.namespace]
+            if not by_ns:
+                del self._queues[waiter.priority]
+
+    def _queued(self) -> int:
+        return sum(len(q) for by_ns in self._queues.values() for q in by_ns.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_namespace: Dict[str, int] = {}
+            for by_ns in self._queues.values():
+                for ns, q in by_ns.items():
+                    by_namespace[ns] = by_namespace.get(ns, 0) + len(q)
+            return {
+                "max_active": self.max_active,
+                "active": len(self._active),
+                "queued": sum(by_namespace.values()),
+                "queued_by_namespace": by_namespace,
+                "admitted": self.admitted,
+                "wait_seconds_max": round(self.wait_seconds_max, 4),
+            }
+
+
+_scheduler: Optional[FlowScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FlowScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FlowScheduler(MAX_ACTIVE_FLOWS, parse_weights(NAMESPACE_WEIGHTS))
+        return _scheduler
@@ -9,6 +9,7 @@ from .resources import (
 )
 from .wait import wait_for_resource_condition
 from .exec import run_pod_and_get_logs
+from .aio import AsyncKubeClient
 
 __all__ = [
     "get_k8s_api_clients",
@@ -20,4 +21,5 @@ __all__ = [
     "select_nodes",
     "wait_for_resource_condition",
     "run_pod_and_get_logs",
+    "AsyncKubeClient",
 ]
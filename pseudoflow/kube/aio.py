@@ -0,0 +1,708 @@
+"""
+Async-native слой Kubernetes I/O на aiohttp.
+
+Функции модуля повторяют API pseudoflow.kube (apply_manifest_docs, delete_target,
+patch_labels, list_resources_by_selector, wait_for_resource_condition,
+run_pod_and_get_logs), но являются корутинами. Если в `apis` есть ключ "aio"
+(AsyncKubeClient), запросы идут напрямую через общий пул соединений aiohttp,
+без потоков. Иначе вызывается синхронная реализация в executor своего
+класса нагрузки (см. executors.py).
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import ssl
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from kubernetes import client
+from kubernetes.client import ApiException
+
+from pseudoflow.util import metrics, tracing
+from pseudoflow.util.capture import OutputCapture
+from pseudoflow.util.fanout import fan_out
+
+from . import exec as kexec
+from . import resources as kres
+from . import rest
+from . import runner_pool
+from . import wait as kwait
+from .client import apis_for_workload, observe_request
+from .executors import WORKLOAD_API, WORKLOAD_EXEC, WORKLOAD_WAIT, get_executor
+from .discovery import ResourceInfo, UnknownKindError, resource_path
+from .informer import get_node_informer
+from .selectors import selector_to_str
+
+logger = logging.getLogger("pseudoflow.kube.aio")
+
+ASYNC_CLIENT_ENABLED = os.getenv("PSEUDOFLOW_ASYNC_CLIENT", "false").lower() == "true"
+POOL_SIZE = int(os.getenv("PSEUDOFLOW_ASYNC_POOL_SIZE", "100"))
+
+
+class AsyncKubeClient:
+    """
+    Минимальный REST-клиент Kubernetes API поверх одного aiohttp.ClientSession.
+    Сессия создаётся лениво в текущем event loop; host может указывать
+    на локальный fake API server (http://127.0.0.1:<port>).
+    """
+
+    def __init__(
+            self,
+            host: str,
+            ssl_context: Any = None,
+            auth: Optional[Callable[[], Dict[str, str]]] = None,
+            pool_size: int = POOL_SIZE,
+    ):
+        self.host = host.rstrip("/")
+        self.pool_size = pool_size
+        self._ssl = ssl_context
+        self._auth = auth or (lambda: {})
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_configuration(cls, configuration: client.Configuration, pool_size: int = POOL_SIZE) -> "AsyncKubeClient":
+        ssl_ctx: Any = None
+        if configuration.host.startswith("https"):
+            if not configuration.verify_ssl:
+                ssl_ctx = False
+            else:
+                ssl_ctx = ssl.create_default_context(cafile=configuration.ssl_ca_cert)
+                if configuration.cert_file:
+                    ssl_ctx.load_cert_chain(configuration.cert_file, configuration.key_file)
+
+        def auth() -> Dict[str, str]:
+            headers = {}
+            for setting in configuration.auth_settings().values():
+                if setting.get("in") == "header" and setting.get("value"):
+                    headers[setting["key"]] = setting["value"]
+            return headers
+
+        return cls(configuration.host, ssl_context=ssl_ctx, auth=auth, pool_size=pool_size)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                ssl=self._ssl if self._ssl is not None else True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._loop = loop
+        return self._session
+
+    def _headers(self, content_type: Optional[str] = None, accept: str = "application/json") -> Dict[str, str]:
+        headers = {"Accept": accept, **self._auth()}
+        if content_type:
+            headers["Content-Type"] = content_type
+        return headers
+
+    async def request(
+            self,
+            method: str,
+            path: str,
+            params: Optional[Dict[str, Any]] = None,
+            body: Any = None,
+            content_type: str = "application/json",
+            timeout: Optional[float] = None,
+            accept: str = "application/json",
+    ) -> Any:
+        session = self._get_session()
+        data = None
+        if body is not None:
+            data = body if isinstance(body, (str, bytes)) else json.dumps(body)
+        started = time.monotonic()
+        error = None
+        try:
+            async with session.request(
+                    method,
+                    self.host + path,
+                    params=_query(params),
+                    data=data,
+                    headers=self._headers(content_type if body is not None else None, accept),
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as resp:
+                text = await resp.text()
+                if resp.status >= 400:
+                    error = str(resp.status)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            observe_request(method, path, started, error)
+        if resp.status >= 400:
+            raise _api_exception(resp.status, resp.reason, text)
+        return json.loads(text) if text else None
+
+    async def watch(
+            self,
+            path: str,
+            params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Стрим событий watch (dict с type/object). ERROR-события поднимаются как ApiException."""
+        session = self._get_session()
+        query = dict(params or {})
+        query["watch"] = "true"
+        started = time.monotonic()
+        async with session.get(
+                self.host + path,
+                params=_query(query),
+                headers=self._headers(),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=timeout),
+        ) as resp:
+            # для watch/stream — время до заголовков ответа, как у синхронного клиента
+            observe_request("GET", path + "?watch=true", started)
+            if resp.status >= 400:
+                raise _api_exception(resp.status, resp.reason, await resp.text())
+            buf = b""
+            async for chunk in resp.content.iter_any():
+                buf += chunk
+                while b"\n" in buf:
+                    line, buf = buf.split(b"\n", 1)
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event.get("type") == "ERROR":
+                        obj = event.get("object") or {}
+                        raise ApiException(status=obj.get("code"), reason=obj.get("message"))
+                    yield event
+
+    async def stream(
+            self,
+            path: str,
+            params: Optional[Dict[str, Any]] = None,
+            timeout: Optional[float] = None,
+    ) -> AsyncIterator[bytes]:
+        """Сырой поток тела ответа (например, логи пода с follow=true)."""
+        session = self._get_session()
+        started = time.monotonic()
+        async with session.get(
+                self.host + path,
+                params=_query(params),
+                headers=self._headers(),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=timeout),
+        ) as resp:
+            observe_request("GET", path, started)
+            if resp.status >= 400:
+                raise _api_exception(resp.status, resp.reason, await resp.text())
+            async for chunk in resp.content.iter_any():
+                yield chunk
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def _query(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    if not params:
+        return None
+    out = {}
+    for k, v in params.items():
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            v = "true" if v else "false"
+        out[k] = str(v)
+    return out
+
+
+def _api_exception(status: int, reason: Optional[str], body: str) -> ApiException:
+    e = ApiException(status=status, reason=reason)
+    e.body = body
+    return e
+
+
+async def _in_executor(workload: str, fn, apis, *args):
+    return await get_executor(workload).run(fn, apis_for_workload(apis, workload), *args)
+
+
+async def _in_executor_cancellable(workload: str, fn, apis, *args):
+    # fn принимает cancel=: отмена корутины освобождает поток и удаляет под, не дожидаясь таймаута
+    return await get_executor(workload).run_cancellable(fn, apis_for_workload(apis, workload), *args)
+
+
+def _client(apis) -> Optional[AsyncKubeClient]:
+    return apis.get("aio")
+
+
+async def _resolve(apis, kind: str, api_version: Optional[str] = None) -> ResourceInfo:
+    mapper = rest.get_rest_mapper(apis)
+    info = mapper.lookup(kind, api_version)
+    if info is None:
+        # промах или устаревший кэш — discovery через синхронный клиент
+        info = await get_executor(WORKLOAD_API).run(mapper.resolve, kind, api_version)
+    return info
+
+
+_serializer: Optional[client.ApiClient] = None
+
+
+def _to_json(model) -> Dict[str, Any]:
+    global _serializer
+    if _serializer is None:
+        _serializer = client.ApiClient()
+    return _serializer.sanitize_for_serialization(model)
+
+
+# --- pseudoflow.kube API ---
+
+
+@tracing.traced("kube.apply_manifest_docs")
+async def apply_manifest_docs(
+        apis,
+        docs,
+        default_namespace=None,
+        max_concurrency: Optional[int] = None,
+        skip_unchanged: Optional[bool] = None,
+):
+    # без async-клиента волны тоже разбираются здесь, а каждый вызов API уходит
+    # в общий api executor: вложенные пулы потоков обходили бы его размер и пул соединений
+    kc = _client(apis)
+    sem = asyncio.Semaphore(max(1, max_concurrency or kres.APPLY_CONCURRENCY))
+    skip = kres.SKIP_UNCHANGED if skip_unchanged is None else skip_unchanged
+
+    async def prepare(doc):
+        if kc is None:
+            return await _in_executor(WORKLOAD_API, kres.prepare_apply, apis, doc, default_namespace)
+        info = await _resolve_for_apply(apis, doc)
+        body = kres.prepare_apply_body(doc, info.namespaced, default_namespace)
+        return doc, info, body, kres.stamp_content_hash(body)
+
+    async def apply_one(item) -> Optional[str]:
+        doc, info, body, _ = item
+        meta = body["metadata"]
+        async with sem:
+            try:
+                if kc is None:
+                    await _in_executor(WORKLOAD_API, kres.server_side_apply, apis, info, body)
+                else:
+                    await kc.request(
+                        "PATCH",
+                        info.path(meta.get("namespace"), meta.get("name")),
+                        params={"fieldManager": kres.FIELD_MANAGER, "force": True},
+                        body=body,
+                        content_type=rest.APPLY_PATCH,
+                    )
+            except Exception as e:
+                return f"{kres.doc_ref(doc)}: {e}"
+        return None
+
+    for wave in kres.apply_waves(docs):
+        errors: List[str] = []
+        prepared = []
+        for doc, result in zip(wave, await asyncio.gather(*(prepare(d) for d in wave), return_exceptions=True)):
+            if isinstance(result, Exception):
+                errors.append(f"{kres.doc_ref(doc)}: {result}")
+            else:
+                prepared.append(result)
+
+        if skip and prepared:
+            keys = [kres.apply_key(info, body) for _, info, body, _ in prepared]
+            if kc is None:
+                live = await _in_executor(WORKLOAD_API, kres.live_state, apis, keys)
+            else:
+                live = await _live_state(kc, keys)
+            prepared = kres.changed_docs(prepared, live)
+
+        results = await asyncio.gather(*(apply_one(item) for item in prepared))
+        kres.raise_apply_errors(errors + [r for r in results if r])
+
+
+async def _live_state(kc: AsyncKubeClient, keys) -> Dict[tuple, Dict[str, Any]]:
+    async def read(info: ResourceInfo, ns: Optional[str], names: List[str]) -> Dict[tuple, Dict[str, Any]]:
+        try:
+            if len(names) == 1:
+                obj = await _get_or_none(kc, info.path(ns, names[0]), accept=rest.METADATA_ACCEPT)
+                objs = [obj] if obj else []
+            else:
+                lst = await kc.request("GET", info.path(ns), accept=rest.METADATA_LIST_ACCEPT)
+                objs = lst.get("items") or []
+        except Exception as e:
+            logger.debug("live read of %s in %s failed: %s", info.plural, ns, e)
+            return {}
+        return kres.live_state_from(info, ns, objs)
+
+    groups = kres.group_for_live_read(keys)
+    out: Dict[tuple, Dict[str, Any]] = {}
+    for part in await asyncio.gather(*(read(info, ns, names) for (info, ns), names in groups.items())):
+        out.update(part)
+    return out
+
+
+async def _resolve_for_apply(apis, doc: Dict[str, Any]) -> ResourceInfo:
+    mapper = rest.get_rest_mapper(apis)
+    for attempt in range(5):
+        try:
+            return await _resolve(apis, doc["kind"], doc.get("apiVersion", "v1"))
+        except UnknownKindError:
+            # kind мог появиться только что (CRD из предыдущей волны) — обновляем discovery
+            if attempt == 4:
+                raise
+            mapper.invalidate()
+            await asyncio.sleep(attempt + 1)
+
+
+@tracing.traced("kube.get_object")
+async def get_object(
+        apis,
+        kind: str,
+        name: str,
+        ns: Optional[str] = None,
+        api_version: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor(WORKLOAD_API, kres.get_object, apis, kind, name, ns, api_version)
+
+    info = await _resolve(apis, kind, api_version)
+    return await _get_or_none(kc, info.path(ns, name))
+
+
+@tracing.traced("kube.delete_target")
+async def delete_target(apis, target: Dict[str, Any], default_namespace=None):
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor(WORKLOAD_API, kres.delete_target, apis, target, default_namespace)
+
+    info = await _resolve(apis, target["kind"], target.get("apiVersion"))
+    await kc.request("DELETE", info.path(target.get("namespace", default_namespace), target["name"]))
+
+
+@tracing.traced("kube.patch_labels")
+async def patch_labels(
+        apis,
+        kind: str,
+        ns: str | None,
+        name: str,
+        add: Dict[str, str],
+        remove_keys: List[str],
+        api_version: Optional[str] = None,
+):
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor(
+            WORKLOAD_API, kres.patch_labels, apis, kind, ns, name, add, remove_keys, api_version,
+        )
+
+    info = await _resolve(apis, kind, api_version)
+    await kc.request(
+        "PATCH",
+        info.path(ns, name),
+        body=kres.label_patch_body(add, remove_keys),
+        content_type=rest.MERGE_PATCH,
+    )
+
+
+@tracing.traced("kube.list_resources_by_selector")
+async def list_resources_by_selector(
+        apis,
+        kind: str,
+        ns: str | None,
+        selector: str,
+        api_version: Optional[str] = None,
+) -> List[str]:
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor(
+            WORKLOAD_API, kres.list_resources_by_selector, apis, kind, ns, selector, api_version,
+        )
+
+    if kind == "Node" and api_version in (None, "v1"):
+        informer = get_node_informer(apis)
+        if informer is not None and informer.synced:
+            return informer.select(selector_to_str(selector))
+    info = await _resolve(apis, kind, api_version)
+    lst = await kc.request("GET", info.path(ns), params={"labelSelector": selector_to_str(selector)})
+    return [i["metadata"]["name"] for i in lst.get("items") or []]
+
+
+async def select_nodes(apis, selector) -> List[str]:
+    """Имена нод по селектору: из informer, пока он не синхронизирован — LIST, не блокируя цикл."""
+    return await list_resources_by_selector(apis, "Node", None, selector)
+
+
+@tracing.traced("kube.get_resource_labels")
+async def get_resource_labels(
+        apis,
+        kind: str,
+        ns: str | None,
+        api_version: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        selector=None,
+) -> Dict[str, Dict[str, str]]:
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor(
+            WORKLOAD_API, kres.get_resource_labels, apis, kind, ns, api_version, names, selector,
+        )
+
+    if kind == "Node" and api_version in (None, "v1"):
+        informer = get_node_informer(apis)
+        if informer is not None and informer.synced:
+            if selector is not None:
+                names = informer.select(selector_to_str(selector))
+            found = {n: informer.get_labels(n) for n in names or []}
+            return {n: labels for n, labels in found.items() if labels is not None}
+
+    if selector is None and not names:
+        return {}
+    info = await _resolve(apis, kind, api_version)
+    if selector is None and names is not None and len(names) == 1:
+        obj = await _get_or_none(kc, info.path(ns, names[0]))
+        return {names[0]: (obj.get("metadata") or {}).get("labels") or {}} if obj else {}
+    params = {"labelSelector": selector_to_str(selector)} if selector is not None else None
+    lst = await kc.request("GET", info.path(ns), params=params)
+    return kres.labels_by_name(lst, None if selector is not None else names)
+
+
+@tracing.traced("kube.patch_labels_bulk")
+async def patch_labels_bulk(
+        apis,
+        kind: str,
+        ns: str | None,
+        patches: Dict[str, Tuple[Dict[str, str], List[str]]],
+        current: Dict[str, Dict[str, str]],
+        api_version: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Параллельный patch_labels для {name: (add, remove_keys)}, не более max_concurrency
+    одновременно. Объекты, чьи метки в `current` уже совпадают, пропускаются.
+    Ошибки собираются по всем объектам и поднимаются одним FanOutError.
+    """
+    todo = {
+        name: patch for name, patch in patches.items()
+        if kres.label_patch_needed(current.get(name), *patch)
+    }
+
+    async def patch_one(name: str) -> None:
+        add, remove_keys = todo[name]
+        await patch_labels(apis, kind, ns, name, add, remove_keys, api_version)
+
+    limit = max(1, int(max_concurrency or kres.LABEL_CONCURRENCY))
+    await fan_out(list(todo), patch_one, limit, fail_fast=False, tolerate=0)
+    return {"patched": len(todo), "unchanged": len(patches) - len(todo)}
+
+
+@tracing.traced("kube.wait_for_resource_condition")
+async def wait_for_resource_condition(
+        apis,
+        res: Dict[str, Any],
+        condition: str,
+        timeout: int,
+        interval: int,
+        default_namespace: Optional[str] = None,
+        jsonpath: Optional[str] = None,
+        op: Optional[str] = None,
+        value: Optional[str] = None,
+        mode: str = "watch",
+):
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor_cancellable(
+            WORKLOAD_WAIT,
+            kwait.wait_for_resource_condition,
+            apis, res, condition, timeout, interval, default_namespace, jsonpath, op, value, mode,
+        )
+
+    end = time.time() + timeout
+    kind = res["kind"]
+    name = res["name"]
+    ns = res.get("namespace", default_namespace)
+
+    async def resolve_info() -> Optional[ResourceInfo]:
+        try:
+            return await _resolve(apis, kind, res.get("apiVersion"))
+        except UnknownKindError:
+            return None
+
+    info = await resolve_info()
+    gv = info.api_version if info else res.get("apiVersion", "v1")
+    predicate = kwait.build_predicate(condition, gv, kind, jsonpath, op, value)
+
+    if mode == "watch" and info is not None:
+        try:
+            if await _watch_until(kc, info.path(ns), name, predicate, end):
+                return
+            raise TimeoutError(f"waitFor {condition} timed out")
+        except ApiException as e:
+            if e.status not in kwait.WATCH_UNSUPPORTED_CODES:
+                raise
+            logger.info("watch on %s %s/%s unavailable (%s), falling back to polling", kind, ns, name, e.status)
+
+    delay = max(1, interval)
+    max_delay = max(delay, kwait.MAX_POLL_INTERVAL)
+    while time.time() < end:
+        if info is None:
+            info = await resolve_info()
+        obj = await _get_or_none(kc, info.path(ns, name)) if info is not None else None
+        if predicate(obj):
+            return
+        await asyncio.sleep(max(0.0, min(delay, end - time.time())))
+        delay = min(delay * 2, max_delay)
+    raise TimeoutError(f"waitFor {condition} timed out")
+
+
+async def _get_or_none(kc: AsyncKubeClient, path: str, accept: str = "application/json") -> Optional[Dict[str, Any]]:
+    try:
+        return await kc.request("GET", path, accept=accept)
+    except ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+async def _watch_until(kc: AsyncKubeClient, list_path: str, name: str, predicate, end: float) -> bool:
+    params = {"fieldSelector": f"metadata.name={name}"}
+    while time.time() < end:
+        lst = await kc.request("GET", list_path, params=params)
+        items = lst.get("items") or []
+        if predicate(items[0] if items else None):
+            return True
+
+        remaining = max(1, int(end - time.time()))
+        watch_params = dict(
+            params,
+            resourceVersion=(lst.get("metadata") or {}).get("resourceVersion"),
+            timeoutSeconds=remaining,
+        )
+        try:
+            async with aclosing(kc.watch(list_path, watch_params, timeout=remaining + 5)) as events:
+                async for event in events:
+                    etype = event.get("type")
+                    if etype == "BOOKMARK":
+                        continue
+                    obj = None if etype == "DELETED" else event.get("object")
+                    if predicate(obj):
+                        return True
+                    if time.time() >= end:
+                        break
+        except ApiException as e:
+            if e.status == 410:
+                continue
+            raise
+    return False
+
+
+@tracing.traced("kube.run_pod_and_get_logs")
+async def run_pod_and_get_logs(
+        apis,
+        namespace: str,
+        command: str,
+        node_selector: Optional[Dict[str, str]] = None,
+        privileged: bool = False,
+        host_paths: Optional[List[Dict[str, str]]] = None,
+        timeout: int = 600,
+        capture: Optional[OutputCapture] = None,
+) -> str:
+    kc = _client(apis)
+    if kc is None:
+        return await _in_executor_cancellable(
+            WORKLOAD_EXEC,
+            functools.partial(kexec.run_pod_and_get_logs, capture=capture),
+            apis, namespace, command, node_selector, privileged, host_paths, timeout,
+        )
+
+    name = kexec.new_runner_name()
+    body = _to_json(kexec.build_runner_pod(name, command, node_selector, privileged, host_paths))
+    pods_path = resource_path("v1", "pods", namespace)
+    await kc.request("POST", pods_path, body=body)
+    tracing.set_attributes(**{"k8s.pod": name, "k8s.namespace": namespace})
+    tracing.add_event("pod.created")
+
+    end = time.time() + timeout
+    created = time.monotonic()
+    out = capture if capture is not None else OutputCapture()
+    try:
+        phase, _ = await _wait_pod_phase(kc, pods_path, name, ("running", "succeeded", "failed"), end)
+        metrics.POD_START_DURATION.observe(time.monotonic() - created)
+        tracing.add_event("pod.started", phase=phase)
+        remaining = max(1.0, end - time.time())
+        async with aclosing(kc.stream(
+                resource_path("v1", "pods", namespace, name, "log"),
+                params={"follow": True},
+                timeout=remaining,
+        )) as stream:
+            async for chunk in stream:
+                out.write(chunk)
+                if time.time() >= end:
+                    raise TimeoutError(f"Execution pod {name} timed out after {timeout}s")
+        phase, finished = await _wait_pod_phase(kc, pods_path, name, ("succeeded", "failed"), end)
+        tracing.add_event("pod.finished", phase=phase)
+        kexec.record_exit_code(out, finished, name)
+    except Exception as e:
+        logger.warning(f"Error during execution or reading logs: {e}")
+        raise
+    finally:
+        out.close()
+        try:
+            # shield: при отмене потока (таймаут, parallel) под всё равно удаляется
+            await asyncio.shield(kc.request(
+                "DELETE",
+                resource_path("v1", "pods", namespace, name),
+                params={"gracePeriodSeconds": 0},
+            ))
+            tracing.add_event("pod.deleted")
+        except (Exception, asyncio.CancelledError):
+            logger.debug(f"Failed to delete pod {name}/{namespace}, might be already gone.")
+
+    return out.value()
+
+
+@tracing.traced("kube.run_in_runner")
+async def run_in_runner(apis, namespace: str, command: str, timeout: int = 600,
+                        capture: Optional[OutputCapture] = None) -> str:
+    """exec/script без привязки к ноде: тёплый под пула (PSEUDOFLOW_RUNNER_POOL_SIZE) или новый под."""
+    if runner_pool.POOL_SIZE <= 0:
+        return await run_pod_and_get_logs(apis, namespace, command, None, False, None, timeout, capture)
+    return await _in_executor_cancellable(
+        WORKLOAD_EXEC, functools.partial(runner_pool.run_in_runner, capture=capture), apis, namespace, command, timeout,
+    )
+
+
+async def _wait_pod_phase(
+        kc: AsyncKubeClient, pods_path: str, name: str, phases, end: float,
+) -> Tuple[str, Dict[str, Any]]:
+    params = {"fieldSelector": f"metadata.name={name}"}
+
+    def phase_of(p: Dict[str, Any]) -> str:
+        return ((p.get("status") or {}).get("phase") or "").lower()
+
+    while time.time() < end:
+        lst = await kc.request("GET", pods_path, params=params)
+        items = lst.get("items") or []
+        if not items:
+            raise RuntimeError("Execution pod was unexpectedly deleted.")
+        phase = phase_of(items[0])
+        if phase in phases:
+            return phase, items[0]
+
+        remaining = max(1, int(end - time.time()))
+        watch_params = dict(
+            params,
+            resourceVersion=(lst.get("metadata") or {}).get("resourceVersion"),
+            timeoutSeconds=remaining,
+        )
+        try:
+            async with aclosing(kc.watch(pods_path, watch_params, timeout=remaining + 5)) as events:
+                async for event in events:
+                    etype = event.get("type")
+                    if etype == "BOOKMARK":
+                        continue
+                    if etype == "DELETED":
+                        raise RuntimeError("Execution pod was unexpectedly deleted.")
+                    obj = event.get("object") or {}
+                    phase = phase_of(obj)
+                    if phase in phases:
+                        return phase, obj
+        except ApiException as e:
+            if e.status == 410:
+                continue
+            raise
+    raise TimeoutError(f"Execution pod {name} timed out")
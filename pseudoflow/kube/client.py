@@ -1,23 +1,119 @@
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
 
 from kubernetes import client, config
 
-_cached_clients: Dict[str, Any] | None = None
-
-
-def get_k8s_api_clients() -> Dict[str, Any]:
-    global _cached_clients
-    if _cached_clients:
-        return _cached_clients
-    try:
-        config.load_incluster_config()
-    except Exception:
-        config.load_kube_config()
-    _cached_clients = {
-        "core": client.CoreV1Api(),
-        "apps": client.AppsV1Api(),
-        "rbac": client.RbacAuthorizationV1Api(),
-        "custom": client.CustomObjectsApi(),
-        "dyn": client.ApiClient(),
+from pseudoflow.util import metrics, tracing
+
+from .executors import WORKLOAD_API, WORKLOAD_SIZES
+
+_VERBS = {"POST": "create", "PUT": "update", "PATCH": "patch"}
+
+
+def request_labels(method: str, url: str) -> Tuple[str, str]:
+    """(verb, resource) запроса к API в терминах apiserver: get/list/watch/..., pods, pods/log."""
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    if segments[:1] == ["api"]:
+        rest = segments[2:]
+    elif segments[:1] == ["apis"]:
+        rest = segments[3:]
+    else:
+        return method.lower(), segments[0] if segments else ""
+    if len(rest) > 2 and rest[0] == "namespaces":
+        rest = rest[2:]
+    resource = rest[0] if rest else ""
+    if len(rest) > 2:
+        resource += "/" + rest[2]
+    method = method.upper()
+    if method == "GET":
+        if parse_qs(parts.query).get("watch", [""])[0].lower() in ("true", "1"):
+            return "watch", resource
+        return ("get" if len(rest) > 1 else "list"), resource
+    if method == "DELETE":
+        return ("delete" if len(rest) > 1 else "deletecollection"), resource
+    return _VERBS.get(method, method.lower()), resource
+
+
+class InstrumentedApiClient(client.ApiClient):
+    """ApiClient, пишущий латентность каждого вызова в pseudoflow_api_request_duration_seconds."""
+
+    def call_api(self, method, url, *args, **kwargs):
+        started = time.monotonic()
+        error = None
+        try:
+            return super().call_api(method, url, *args, **kwargs)
+        except Exception as e:
+            error = str(getattr(e, "status", "") or e)
+            raise
+        finally:
+            observe_request(method, url, started, error)
+
+
+def observe_request(method: str, url: str, started: float, error: Optional[str] = None) -> None:
+    """Латентность вызова API в метрики и, при включённой трассировке, дочерний спан текущего."""
+    elapsed = time.monotonic() - started
+    verb, resource = request_labels(method, url)
+    metrics.API_REQUEST_DURATION.observe(elapsed, verb=verb, resource=resource)
+    if tracing.enabled():
+        tracing.record(
+            f"k8s {verb} {resource}", time.time_ns() - int(elapsed * 1e9), error, count="k8s.api_calls",
+            **{"http.method": method.upper(), "url.path": urlsplit(url).path},
+        )
+
+
+_cached_clients: Dict[str, Dict[str, Any]] = {}
+_config_loaded = False
+
+
+def get_k8s_api_clients(workload: str = WORKLOAD_API) -> Dict[str, Any]:
+    """
+    Набор API-клиентов для класса нагрузки (wait/exec/api). У каждого класса
+    свой ApiClient, чей urllib3-пул равен размеру executor этого класса,
+    чтобы долгие ожидания не занимали соединения коротких вызовов.
+    """
+    global _config_loaded
+    cached = _cached_clients.get(workload)
+    if cached:
+        return cached
+    if not _config_loaded:
+        try:
+            config.load_incluster_config()
+        except Exception:
+            config.load_kube_config()
+        _config_loaded = True
+
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = WORKLOAD_SIZES.get(workload, configuration.connection_pool_maxsize)
+    api_client = InstrumentedApiClient(configuration)
+    clients: Dict[str, Any] = {
+        "core": client.CoreV1Api(api_client),
+        "apps": client.AppsV1Api(api_client),
+        "rbac": client.RbacAuthorizationV1Api(api_client),
+        "custom": client.CustomObjectsApi(api_client),
+        "dyn": api_client,
+        # общий ключ кластера: один Node informer на все классы нагрузки
+        "cluster": "default",
     }
-    return _cached_clients
+    # локальный импорт: aio сам зависит от этого модуля
+    from .aio import ASYNC_CLIENT_ENABLED, AsyncKubeClient
+
+    if ASYNC_CLIENT_ENABLED:
+        if workload == WORKLOAD_API:
+            clients["aio"] = AsyncKubeClient.from_configuration(client.Configuration.get_default_copy())
+        else:
+            clients["aio"] = get_k8s_api_clients(WORKLOAD_API)["aio"]
+    _cached_clients[workload] = clients
+    return clients
+
+
+def apis_for_workload(apis: Dict[str, Any], workload: str) -> Dict[str, Any]:
+    """
+    Если `apis` получен из get_k8s_api_clients, возвращает набор клиентов
+    для `workload`; иначе (например, fake-клиенты) — `apis` как есть.
+    """
+    for cached in _cached_clients.values():
+        if cached is apis:
+            return get_k8s_api_clients(workload)
+    return apis
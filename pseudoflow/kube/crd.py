@@ -21,6 +21,9 @@ spec:
     - name: v1alpha1
       served: true
       storage: true
+      # status пишется через /status: иначе каждый patch status поднимает metadata.generation
+      subresources:
+        status: {}
       schema:
         openAPIV3Schema:
           type: object
@@ -36,6 +39,7 @@ spec:
                   type: array
                   items:
                     type: object
+                    x-kubernetes-preserve-unknown-fields: true
                     required: ["type"]
                     properties:
                       type:
@@ -71,18 +75,29 @@ spec:
                   properties:
                     timeoutSeconds:
                       type: integer
+                    maxParallelSteps:
+                      type: integer
+                    priority:
+                      type: integer
             status:
               type: object
+              x-kubernetes-preserve-unknown-fields: true
 """
 
 
 def ensure_crd_installed() -> None:
     apis = get_k8s_api_clients()
     api_ext = client.ApiextensionsV1Api()
+    crd = yaml.safe_load(_CRD)
     try:
-        api_ext.read_custom_resource_definition("pseudoflows.ops.example.com")
-        return
+        existing = api_ext.read_custom_resource_definition("pseudoflows.ops.example.com")
     except ApiException as e:
         if e.status != 404:
             raise
-    utils.create_from_yaml(apis["dyn"], yaml_objects=list(yaml.safe_load_all(_CRD)))
+        utils.create_from_yaml(apis["dyn"], yaml_objects=[crd])
+        return
+    # CRD, установленный старой версией, — без subresource status; versions заменяются целиком
+    if any(v.subresources is None or v.subresources.status is None for v in existing.spec.versions):
+        api_ext.patch_custom_resource_definition(
+            "pseudoflows.ops.example.com", {"spec": {"versions": crd["spec"]["versions"]}},
+        )
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger("pseudoflow.kube.discovery")
+
+DISCOVERY_TTL = float(os.getenv("PSEUDOFLOW_DISCOVERY_TTL", "300"))
+# Не чаще одного полного обновления discovery на промах за этот интервал
+MISS_REFRESH_INTERVAL = float(os.getenv("PSEUDOFLOW_DISCOVERY_MISS_REFRESH", "10"))
+
+
+class UnknownKindError(ValueError):
+    pass
+
+
+def resource_path(
+        api_version: str,
+        plural: str,
+        namespace: Optional[str] = None,
+        name: Optional[str] = None,
+        subresource: Optional[str] = None,
+) -> str:
+    base = "/api/v1" if api_version == "v1" else f"/apis/{api_version}"
+    path = base
+    if namespace:
+        path += f"/namespaces/{quote(namespace, safe='')}"
+    path += f"/{plural}"
+    if name:
+        path += f"/{quote(name, safe='')}"
+    if subresource:
+        path += f"/{subresource}"
+    return path
+
+
+@dataclass(frozen=True)
+class ResourceInfo:
+    api_version: str
+    kind: str
+    plural: str
+    namespaced: bool
+
+    def path(
+            self,
+            namespace: Optional[str] = None,
+            name: Optional[str] = None,
+            subresource: Optional[str] = None,
+    ) -> str:
+        ns = (namespace or "default") if self.namespaced else None
+        return resource_path(self.api_version, self.plural, ns, name, subresource)
+
+
+class RestMapper:
+    """
+    Discovery-backed GVK -> (plural, scope) с TTL-кэшем.
+    `fetch(path)` возвращает JSON discovery-документа (/api, /apis, /apis/<g>/<v>).
+    Разрешение — поиск в памяти; discovery перечитывается по истечении TTL
+    или при промахе (не чаще MISS_REFRESH_INTERVAL).
+    """
+
+    def __init__(self, fetch: Callable[[str], Dict[str, Any]], ttl: float = DISCOVERY_TTL):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._by_gvk: Dict[Tuple[str, str], ResourceInfo] = {}
+        self._by_kind: Dict[str, ResourceInfo] = {}
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+
+    def lookup(self, kind: str, api_version: Optional[str] = None) -> Optional[ResourceInfo]:
+        """Только память: None при промахе или устаревшем кэше."""
+        if time.monotonic() - self._loaded_at > self._ttl:
+            return None
+        if api_version:
+            return self._by_gvk.get((api_version, kind))
+        return self._by_kind.get(kind)
+
+    def resolve(self, kind: str, api_version: Optional[str] = None) -> ResourceInfo:
+        info = self.lookup(kind, api_version)
+        if info is not None:
+            return info
+        with self._lock:
+            info = self.lookup(kind, api_version)
+            if info is not None:
+                return info
+            stale = time.monotonic() - self._loaded_at > self._ttl
+            if stale or time.monotonic() - self._refreshed_at > MISS_REFRESH_INTERVAL:
+                self._refresh()
+        if api_version:
+            info = self._by_gvk.get((api_version, kind))
+        else:
+            info = self._by_kind.get(kind)
+        if info is None:
+            raise UnknownKindError(f"unknown resource kind '{api_version + '/' if api_version else ''}{kind}'")
+        return info
+
+    def invalidate(self) -> None:
+        self._loaded_at = 0.0
+
+    def _refresh(self) -> None:
+        self._refreshed_at = time.monotonic()
+        group_versions: List[str] = []
+        preferred: List[str] = []
+        core = self._fetch("/api")
+        for v in core.get("versions") or []:
+            group_versions.append(v)
+            preferred.append(v)
+        groups = self._fetch("/apis")
+        for g in groups.get("groups") or []:
+            for v in g.get("versions") or []:
+                group_versions.append(v["groupVersion"])
+            pv = (g.get("preferredVersion") or {}).get("groupVersion")
+            if pv:
+                preferred.append(pv)
+
+        def fetch_gv(gv: str):
+            path = "/api/" + gv if "/" not in gv else "/apis/" + gv
+            try:
+                return gv, self._fetch(path)
+            except Exception as e:
+                # агрегированные API (metrics-server и т.п.) могут быть недоступны
+                logger.debug("discovery of %s failed: %s", gv, e)
+                return gv, {}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            docs = dict(pool.map(fetch_gv, group_versions))
+
+        by_gvk: Dict[Tuple[str, str], ResourceInfo] = {}
+        by_kind: Dict[str, ResourceInfo] = {}
+        for gv in group_versions:
+            for r in docs.get(gv, {}).get("resources") or []:
+                if "/" in r.get("name", ""):
+                    continue  # subresource
+                info = ResourceInfo(gv, r["kind"], r["name"], bool(r.get("namespaced")))
+                by_gvk[(gv, info.kind)] = info
+        # kind без apiVersion: core, затем preferred-версии групп в порядке сервера
+        for gv in preferred:
+            for r in docs.get(gv, {}).get("resources") or []:
+                if "/" in r.get("name", ""):
+                    continue
+                by_kind.setdefault(r["kind"], by_gvk[(gv, r["kind"])])
+
+        self._by_gvk = by_gvk
+        self._by_kind = by_kind
+        self._loaded_at = time.monotonic()
+        logger.debug("discovery refreshed: %s group versions, %s kinds", len(group_versions), len(by_gvk))
@@ -2,28 +2,38 @@ import time
 import uuid
 import os
 import logging
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from kubernetes import client
 from kubernetes.client import ApiException
 
+from pseudoflow.util import cancel as cancelling
+from pseudoflow.util import metrics, tracing
+from pseudoflow.util.cancel import CancelToken
+from pseudoflow.util.capture import OutputCapture
+
+from . import rest
+from .discovery import ResourceInfo
+
 logger = logging.getLogger("pseudoflow.kube")
 
 # Получаем образ из ENV (для поддержки air-gapped сред) или используем дефолтный
 RUNNER_IMAGE = os.getenv("PSEUDOFLOW_RUNNER_IMAGE", "alpine:3.20")
 
+POD = ResourceInfo("v1", "Pod", "pods", True)
 
-def run_pod_and_get_logs(
-        apis,
-        namespace: str,
+
+def new_runner_name() -> str:
+    return f"pseudoflow-exec-{str(uuid.uuid4())[:8]}"
+
+
+def build_runner_pod(
+        name: str,
         command: str,
         node_selector: Optional[Dict[str, str]] = None,
         privileged: bool = False,
         host_paths: Optional[List[Dict[str, str]]] = None,
-        timeout: int = 600,
-):
-    core = apis["core"]
-    name = f"pseudoflow-exec-{str(uuid.uuid4())[:8]}"
+) -> client.V1Pod:
     volumes = []
     volume_mounts = []
 
@@ -47,7 +57,7 @@ def run_pod_and_get_logs(
                 )
             )
 
-    pod = client.V1Pod(
+    return client.V1Pod(
         metadata=client.V1ObjectMeta(
             name=name,
             labels={
@@ -79,43 +89,73 @@ def run_pod_and_get_logs(
         ),
     )
 
+
+def run_pod_and_get_logs(
+        apis,
+        namespace: str,
+        command: str,
+        node_selector: Optional[Dict[str, str]] = None,
+        privileged: bool = False,
+        host_paths: Optional[List[Dict[str, str]]] = None,
+        timeout: int = 600,
+        cancel: Optional[CancelToken] = None,
+        capture: Optional[OutputCapture] = None,
+) -> str:
+    """
+    cancel: отмена прерывает ожидание и чтение логов, под удаляется сразу.
+    capture: куда стримить логи (по умолчанию — OutputCapture с PSEUDOFLOW_MAX_OUTPUT_BYTES).
+    """
+    core = apis["core"]
+    name = new_runner_name()
+    pod = build_runner_pod(name, command, node_selector, privileged, host_paths)
+
     try:
         core.create_namespaced_pod(namespace=namespace, body=pod)
     except ApiException as e:
         logger.error(f"Failed to create execution pod: {e}")
         raise
+    tracing.set_attributes(**{"k8s.pod": name, "k8s.namespace": namespace})
+    tracing.add_event("pod.created")
 
     end = time.time() + timeout
-
-    logs = ""  # FIX: Инициализация переменной logs
+    created = time.monotonic()
+    out = capture if capture is not None else OutputCapture()
+    phase = ""
 
     try:
-        while time.time() < end:
-            try:
-                p = core.read_namespaced_pod(name=name, namespace=namespace)
-            except ApiException as e:
-                if e.status == 404:
-                    # Под удален до завершения
-                    raise RuntimeError("Execution pod was unexpectedly deleted.")
-                raise
-
-            phase = (p.status.phase or "").lower()
-            if phase in ("succeeded", "failed"):
-                break
-            time.sleep(2)
+        # Ждём старта контейнера по событиям watch, без опроса
+        phase, _ = _wait_pod_phase(apis, name, namespace, ("running", "succeeded", "failed"), end, cancel)
+        metrics.POD_START_DURATION.observe(time.monotonic() - created)
+        tracing.add_event("pod.started", phase=phase)
 
-        # Пытаемся прочитать логи
-        logs = core.read_namespaced_pod_log(
+        # Стримим логи, пока контейнер работает: поток закрывается при выходе контейнера
+        remaining = max(1.0, end - time.time())
+        resp = core.read_namespaced_pod_log(
             name=name,
             namespace=namespace,
-            _return_http_data_only=True,
-            _preload_content=True,
+            follow=True,
+            _preload_content=False,
+            _request_timeout=(10, remaining),
         )
+        unregister = cancelling.on_cancel(cancel, resp.shutdown)
+        try:
+            for chunk in cancelling.guard(cancel, resp.stream(amt=None, decode_content=True)):
+                out.write(chunk)
+                if time.time() >= end:
+                    raise TimeoutError(f"Execution pod {name} timed out after {timeout}s")
+        finally:
+            unregister()
+            resp.release_conn()
+            out.close()
+
+        phase, finished = _wait_pod_phase(apis, name, namespace, ("succeeded", "failed"), end, cancel)
+        tracing.add_event("pod.finished", phase=phase)
+        record_exit_code(out, finished, name)
     except Exception as e:  # FIX: Избегаем голого Exception, но нужно для общих ошибок
         logger.warning(f"Error during execution or reading logs: {e}")
         # Если под завершился неудачей, возвращаем статус
         if phase == "failed":
-            raise RuntimeError(f"Command execution failed. Logs: {logs}")
+            raise RuntimeError(f"Command execution failed. Logs: {out.text()}")
         raise  # Перебрасываем другие ошибки
     finally:
         # Гарантированное удаление пода
@@ -123,7 +163,72 @@ def run_pod_and_get_logs(
             core.delete_namespaced_pod(
                 name=name, namespace=namespace, grace_period_seconds=0
             )
+            tracing.add_event("pod.deleted")
         except Exception:
             logger.debug(f"Failed to delete pod {name}/{namespace}, might be already gone.")
 
-    return logs
\ No newline at end of file
+    return out.value()
+
+
+def _wait_pod_phase(
+        apis, name: str, namespace: str, phases, end: float, cancel: Optional[CancelToken] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Ждёт, пока под перейдёт в одну из фаз `phases` (в нижнем регистре),
+    через list + watch по field selector. Возвращает фазу и объект пода.
+    """
+    field_selector = f"metadata.name={name}"
+    while time.time() < end:
+        cancelling.check(cancel)
+        lst = rest.list_objects(apis, POD, namespace, field_selector=field_selector)
+        items = lst.get("items") or []
+        if not items:
+            raise RuntimeError("Execution pod was unexpectedly deleted.")
+        phase = _phase(items[0])
+        if phase in phases:
+            return phase, items[0]
+
+        remaining = max(1, int(end - time.time()))
+        query = {
+            "fieldSelector": field_selector,
+            "resourceVersion": (lst.get("metadata") or {}).get("resourceVersion"),
+            "timeoutSeconds": remaining,
+        }
+        events = rest.watch_objects(apis, POD, namespace, query, timeout=remaining + 5, cancel=cancel)
+        try:
+            for event in events:
+                etype = event.get("type")
+                if etype == "BOOKMARK":
+                    continue
+                if etype == "DELETED":
+                    raise RuntimeError("Execution pod was unexpectedly deleted.")
+                obj = event.get("object") or {}
+                phase = _phase(obj)
+                if phase in phases:
+                    return phase, obj
+        except ApiException as e:
+            if e.status == 410:
+                continue
+            raise
+        finally:
+            events.close()
+    raise TimeoutError(f"Execution pod {name} timed out")
+
+
+def pod_exit_code(pod: Dict[str, Any]) -> Optional[int]:
+    for status in (pod.get("status") or {}).get("containerStatuses") or []:
+        terminated = (status.get("state") or {}).get("terminated")
+        if terminated and terminated.get("exitCode") is not None:
+            return int(terminated["exitCode"])
+    return None
+
+
+def record_exit_code(out: OutputCapture, pod: Dict[str, Any], name: str) -> None:
+    # как и раньше, ненулевой код — не ошибка шага: вывод возвращается, код — в capture.exit_code
+    out.exit_code = pod_exit_code(pod)
+    if out.exit_code:
+        logger.warning("Command in pod %s exited with code %s", name, out.exit_code)
+
+
+def _phase(pod) -> str:
+    return ((pod.get("status") or {}).get("phase") or "").lower()
@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from pseudoflow.util import metrics
+from pseudoflow.util.cancel import CancelToken
+
+logger = logging.getLogger("pseudoflow.kube.executors")
+
+# Классы нагрузки: долгие ожидания (waitFor), исполнение подов (exec/script/node),
+# короткие вызовы API (apply/delete/labels). У каждого свой пул потоков и свой
+# urllib3-пул соединений того же размера (см. get_k8s_api_clients).
+WORKLOAD_WAIT = "wait"
+WORKLOAD_EXEC = "exec"
+WORKLOAD_API = "api"
+
+WORKLOAD_SIZES: Dict[str, int] = {
+    WORKLOAD_WAIT: int(os.getenv("PSEUDOFLOW_WAIT_WORKERS", "32")),
+    WORKLOAD_EXEC: int(os.getenv("PSEUDOFLOW_EXEC_WORKERS", "16")),
+    WORKLOAD_API: int(os.getenv("PSEUDOFLOW_API_WORKERS", "16")),
+}
+
+# Если задача ждала свободный поток дольше порога — пишем предупреждение о насыщении
+WAIT_WARN_SECONDS = float(os.getenv("PSEUDOFLOW_EXECUTOR_WAIT_WARN_SECONDS", "5"))
+
+
+class WorkloadExecutor:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"pseudoflow-{name}")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _submit(self, fn: Callable[..., Any], args) -> Future:
+        submitted = time.monotonic()
+        # текущий спан трассировки доступен и в потоке executor
+        context = contextvars.copy_context()
+        waiting = [True]
+        with self._lock:
+            self.queued += 1
+        metrics.EXECUTOR_QUEUED.inc(workload=self.name)
+
+        def dequeue() -> bool:
+            # из run() или done-callback отменённой до старта задачи — ровно один раз
+            with self._lock:
+                if not waiting[0]:
+                    return False
+                waiting[0] = False
+                self.queued -= 1
+            metrics.EXECUTOR_QUEUED.dec(workload=self.name)
+            return True
+
+        def run():
+            waited = time.monotonic() - submitted
+            dequeue()
+            with self._lock:
+                self.active += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            metrics.EXECUTOR_WAIT.observe(waited, workload=self.name)
+            if waited >= WAIT_WARN_SECONDS:
+                logger.warning(
+                    "executor '%s' saturated: task waited %.2fs for a thread (queue=%s, workers=%s)",
+                    self.name, waited, self.queued, self.max_workers,
+                )
+            try:
+                return context.run(fn, *args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        future = self._pool.submit(run)
+        # задача, снятая с очереди (отмена корутины, shutdown), до run() не доходит
+        future.add_done_callback(lambda _: dequeue())
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        return await asyncio.wrap_future(self._submit(fn, args))
+
+    async def run_cancellable(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        fn(*args, cancel=token): отмена корутины (таймаут потока, parallel) отменяет token,
+        и поток освобождается на ближайшей проверке, не дожидаясь своего таймаута.
+        Ещё не начатая задача снимается с очереди самим asyncio.
+        """
+        token = CancelToken()
+        try:
+            return await self.run(functools.partial(fn, cancel=token), *args)
+        except asyncio.CancelledError:
+            token.cancel("task cancelled")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "wait_seconds_avg": round(self.wait_seconds_total / started, 4) if started else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 4),
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_executors: Dict[str, WorkloadExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(workload: str) -> WorkloadExecutor:
+    with _executors_lock:
+        ex = _executors.get(workload)
+        if ex is None:
+            if workload not in WORKLOAD_SIZES:
+                raise ValueError(f"unknown workload class '{workload}'")
+            ex = WorkloadExecutor(workload, WORKLOAD_SIZES[workload])
+            _executors[workload] = ex
+        return ex
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    with _executors_lock:
+        return {name: ex.stats() for name, ex in _executors.items()}
+
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        for ex in _executors.values():
+            ex.shutdown()
+        _executors.clear()
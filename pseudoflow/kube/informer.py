@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from kubernetes import watch
+from kubernetes.client import ApiException
+
+from .selectors import match_labels, parse_label_selector
+
+logger = logging.getLogger("pseudoflow.kube.informer")
+
+INFORMER_ENABLED = os.getenv("PSEUDOFLOW_NODE_INFORMER", "true").lower() == "true"
+WATCH_TIMEOUT = 300
+
+
+class NodeInformer:
+    """
+    Список нод, поддерживаемый через list+watch (по resourceVersion),
+    с индексом label -> value -> names для ответа на селекторы из памяти.
+    """
+
+    def __init__(self, core):
+        self._core = core
+        self._lock = threading.RLock()
+        self._labels: Dict[str, Dict[str, str]] = {}
+        self._index: Dict[str, Dict[str, Set[str]]] = {}
+        self._resource_version: Optional[str] = None
+        self._synced = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="node-informer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait_for_sync(self, timeout: float) -> bool:
+        return self._synced.wait(timeout)
+
+    @property
+    def synced(self) -> bool:
+        return self._synced.is_set()
+
+    def get_labels(self, name: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            labels = self._labels.get(name)
+            return dict(labels) if labels is not None else None
+
+    def select(self, selector: str) -> List[str]:
+        reqs = parse_label_selector(selector)
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            for key, op, values in reqs:
+                if op == "=":
+                    candidates = set(self._index.get(key, {}).get(values[0], ()))
+                    break
+                if op in ("in", "exists"):
+                    by_value = self._index.get(key, {})
+                    vals = values if op == "in" else by_value.keys()
+                    candidates = set().union(*(by_value.get(v, ()) for v in vals))
+                    break
+            if candidates is None:
+                candidates = set(self._labels)
+            names = [n for n in candidates if match_labels(reqs, self._labels.get(n))]
+        return sorted(names)
+
+    # --- internals ---
+
+    def _index_add(self, name: str, labels: Dict[str, str]) -> None:
+        for k, v in labels.items():
+            self._index.setdefault(k, {}).setdefault(v, set()).add(name)
+
+    def _index_remove(self, name: str, labels: Dict[str, str]) -> None:
+        for k, v in labels.items():
+            by_value = self._index.get(k)
+            if not by_value:
+                continue
+            names = by_value.get(v)
+            if names:
+                names.discard(name)
+                if not names:
+                    del by_value[v]
+            if not by_value:
+                del self._index[k]
+
+    def _upsert(self, obj: Dict[str, Any]) -> None:
+        meta = obj.get("metadata") or {}
+        name = meta.get("name")
+        if not name:
+            return
+        labels = meta.get("labels") or {}
+        with self._lock:
+            old = self._labels.get(name)
+            if old is not None:
+                self._index_remove(name, old)
+            self._labels[name] = labels
+            self._index_add(name, labels)
+
+    def _delete(self, obj: Dict[str, Any]) -> None:
+        name = (obj.get("metadata") or {}).get("name")
+        with self._lock:
+            old = self._labels.pop(name, None)
+            if old is not None:
+                self._index_remove(name, old)
+
+    def _relist(self) -> None:
+        resp = self._core.list_node(_preload_content=False)
+        data = json.loads(resp.data)
+        labels: Dict[str, Dict[str, str]] = {}
+        index: Dict[str, Dict[str, Set[str]]] = {}
+        for item in data.get("items") or []:
+            meta = item.get("metadata") or {}
+            name = meta.get("name")
+            if not name:
+                continue
+            labels[name] = meta.get("labels") or {}
+            for k, v in labels[name].items():
+                index.setdefault(k, {}).setdefault(v, set()).add(name)
+        with self._lock:
+            self._labels = labels
+            self._index = index
+            self._resource_version = (data.get("metadata") or {}).get("resourceVersion")
+        self._synced.set()
+        logger.debug("Node informer listed %s nodes at rv=%s", len(labels), self._resource_version)
+
+    def _watch(self) -> None:
+        w = watch.Watch()
+        for event in w.stream(
+                self._core.list_node,
+                resource_version=self._resource_version,
+                timeout_seconds=WATCH_TIMEOUT,
+                allow_watch_bookmarks=True,
+                deserialize=False,
+        ):
+            if self._stop.is_set():
+                w.stop()
+                return
+            etype = event.get("type")
+            obj = event.get("object") or {}
+            rv = (obj.get("metadata") or {}).get("resourceVersion")
+            if etype in ("ADDED", "MODIFIED"):
+                self._upsert(obj)
+            elif etype == "DELETED":
+                self._delete(obj)
+            if rv:
+                self._resource_version = rv
+
+    def _run(self) -> None:
+        backoff = 1.0
+        need_list = True
+        while not self._stop.is_set():
+            try:
+                if need_list:
+                    self._relist()
+                    need_list = False
+                self._watch()
+                backoff = 1.0
+            except ApiException as e:
+                if e.status == 410:
+                    # resourceVersion устарел — полный relist
+                    need_list = True
+                    continue
+                logger.warning("Node informer watch failed: %s", e)
+                need_list = True
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            except Exception as e:
+                logger.warning("Node informer error: %s", e)
+                need_list = True
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+_informers: Dict[Any, NodeInformer] = {}
+_informers_lock = threading.Lock()
+
+
+def get_node_informer(apis) -> Optional[NodeInformer]:
+    if not INFORMER_ENABLED:
+        return None
+    core = apis["core"]
+    key = apis.get("cluster", id(core))
+    with _informers_lock:
+        inf = _informers.get(key)
+        if inf is None:
+            inf = NodeInformer(core)
+            _informers[key] = inf
+            inf.start()
+    return inf
+
+
+def stop_node_informers() -> None:
+    with _informers_lock:
+        for inf in _informers.values():
+            inf.stop()
+        _informers.clear()
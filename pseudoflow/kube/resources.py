@@ -1,103 +1,351 @@
-from typing import Any, Dict, List
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from kubernetes import client, utils
+from . import rest
+from .discovery import ResourceInfo, UnknownKindError
+from .informer import get_node_informer
+from .selectors import selector_to_str
 
+logger = logging.getLogger("pseudoflow.kube.resources")
 
-def apply_manifest_docs(apis, docs, default_namespace=None):
-    k8s_client = apis["dyn"]
+FIELD_MANAGER = "pseudoflow-operator"
+APPLY_CONCURRENCY = int(os.getenv("PSEUDOFLOW_APPLY_CONCURRENCY", "8"))
+LABEL_CONCURRENCY = int(os.getenv("PSEUDOFLOW_LABEL_CONCURRENCY", "16"))
+# Пропускать запись объектов, чей хэш содержимого не изменился с прошлого apply
+SKIP_UNCHANGED = os.getenv("PSEUDOFLOW_APPLY_SKIP_UNCHANGED", "true").lower() == "true"
+HASH_ANNOTATION = "pseudoflow.io/last-applied-hash"
+
+# Волны применения: сначала CRD и Namespace, затем RBAC и конфигурация, затем всё остальное
+_APPLY_WAVES = (
+    {"CustomResourceDefinition", "Namespace"},
+    {
+        "ServiceAccount", "Role", "ClusterRole", "RoleBinding", "ClusterRoleBinding",
+        "ConfigMap", "Secret", "PriorityClass", "StorageClass",
+    },
+)
+
+
+def apply_waves(docs) -> List[List[Dict[str, Any]]]:
+    """Разбивает документы на волны по зависимостям, сохраняя порядок внутри волны."""
+    waves: List[List[Dict[str, Any]]] = [[] for _ in range(len(_APPLY_WAVES) + 1)]
     for doc in docs:
         if not doc or not isinstance(doc, dict):
             continue
-        utils.create_from_dict(k8s_client, data=doc, verbose=False)
+        kind = doc.get("kind")
+        idx = next((i for i, kinds in enumerate(_APPLY_WAVES) if kind in kinds), len(_APPLY_WAVES))
+        waves[idx].append(doc)
+    return [w for w in waves if w]
+
+
+def prepare_apply_body(doc: Dict[str, Any], namespaced: bool, default_namespace: Optional[str]) -> Dict[str, Any]:
+    body = copy.deepcopy(doc)
+    meta = body.setdefault("metadata", {})
+    if namespaced:
+        meta["namespace"] = meta.get("namespace") or default_namespace or "default"
+    else:
+        meta.pop("namespace", None)
+    return body
+
+
+def raise_apply_errors(errors: List[str]) -> None:
+    if errors:
+        raise RuntimeError(f"apply failed for {len(errors)} document(s): " + "; ".join(errors))
+
+
+def stamp_content_hash(body: Dict[str, Any]) -> str:
+    """Считает хэш отрендеренного тела (без самой аннотации) и записывает его в аннотацию."""
+    meta = body["metadata"]
+    annotations = dict(meta.get("annotations") or {})
+    annotations.pop(HASH_ANNOTATION, None)
+    meta["annotations"] = annotations
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(canonical.encode()).hexdigest()
+    annotations[HASH_ANNOTATION] = digest
+    return digest
+
+
+def apply_key(info: ResourceInfo, body: Dict[str, Any]) -> Tuple[ResourceInfo, Optional[str], Optional[str]]:
+    meta = body["metadata"]
+    return info, meta.get("namespace"), meta.get("name")
+
+
+def group_for_live_read(keys) -> Dict[Tuple[ResourceInfo, Optional[str]], List[str]]:
+    """(info, namespace) -> имена: одна группа — один GET (одно имя) или один LIST."""
+    groups: Dict[Tuple[ResourceInfo, Optional[str]], List[str]] = {}
+    for info, ns, name in keys:
+        groups.setdefault((info, ns), []).append(name)
+    return groups
+
+
+def live_state_from(info: ResourceInfo, ns: Optional[str], objs) -> Dict[Tuple, Dict[str, Any]]:
+    """apply_key -> metadata живых объектов с аннотацией хэша."""
+    out = {}
+    for obj in objs:
+        meta = obj.get("metadata") or {}
+        if (meta.get("annotations") or {}).get(HASH_ANNOTATION):
+            out[(info, ns, meta.get("name"))] = meta
+    return out
+
+
+def _owns(fields: Dict[str, Any], value: Any) -> bool:
+    """Покрывает ли fieldsV1 все поля value (списки и атомарные структуры — целиком)."""
+    if not isinstance(value, dict) or not fields:
+        return True
+    for key, sub in value.items():
+        if sub is None:
+            continue
+        owned = fields.get(f"f:{key}")
+        if owned is None or not _owns(owned, sub):
+            return False
+    return True
+
+
+def owns_applied_fields(meta: Dict[str, Any], body: Dict[str, Any]) -> bool:
+    """
+    Владеет ли наш apply (managedFields: FIELD_MANAGER, Apply) до сих пор всеми полями тела.
+    Чужая правка поля (Update) или его удаление забирает поле из нашего набора;
+    запись status контроллером (subresource status) и чужие поля набор не меняют.
+    """
+    ours = next((e for e in meta.get("managedFields") or []
+                 if e.get("manager") == FIELD_MANAGER and e.get("operation") == "Apply"
+                 and not e.get("subresource")), None)
+    if ours is None:
+        return False
+    fields = ours.get("fieldsV1") or {}
+    own_meta = fields.get("f:metadata") or {}
+    body_meta = body.get("metadata") or {}
+    for key in ("labels", "annotations"):
+        owned = own_meta.get(f"f:{key}")
+        if body_meta.get(key) and (owned is None or not _owns(owned, body_meta[key])):
+            return False
+    return _owns(fields, {k: v for k, v in body.items() if k not in ("apiVersion", "kind", "metadata")})
+
+
+def changed_docs(prepared, live: Dict[Tuple, Dict[str, Any]]) -> list:
+    """
+    Документы волны, которые нужно применить. Пропускается объект, у которого хэш
+    в аннотации совпадает с телом, а наш field manager всё ещё владеет всеми полями тела.
+    Состояние берётся из самого объекта (managedFields), поэтому переживает рестарт
+    оператора и не сбивается записью status и resourceVersion контроллерами.
+    """
+    todo = []
+    for item in prepared:
+        _, info, body, digest = item
+        meta = live.get(apply_key(info, body))
+        if meta is None or (meta.get("annotations") or {}).get(HASH_ANNOTATION) != digest \
+                or not owns_applied_fields(meta, body):
+            todo.append(item)
+    if len(todo) < len(prepared):
+        logger.info("apply: %s unchanged document(s) skipped", len(prepared) - len(todo))
+    return todo
+
+
+def live_state(apis, keys) -> Dict[Tuple, Dict[str, Any]]:
+    out: Dict[Tuple, Dict[str, Any]] = {}
+    for (info, ns), names in group_for_live_read(keys).items():
+        try:
+            if len(names) == 1:
+                obj = rest.get_object(apis, info, names[0], ns, accept=rest.METADATA_ACCEPT)
+                objs = [obj] if obj else []
+            else:
+                objs = rest.list_objects(apis, info, ns, accept=rest.METADATA_LIST_ACCEPT).get("items") or []
+        except Exception as e:
+            # без текущего состояния просто применяем всё
+            logger.debug("live read of %s in %s failed: %s", info.plural, ns, e)
+            continue
+        out.update(live_state_from(info, ns, objs))
+    return out
+
+
+def _resolve_for_apply(apis, doc: Dict[str, Any]) -> ResourceInfo:
+    mapper = rest.get_rest_mapper(apis)
+    for attempt in range(5):
+        try:
+            return mapper.resolve(doc["kind"], doc.get("apiVersion", "v1"))
+        except UnknownKindError:
+            # kind мог появиться только что (CRD из предыдущей волны) — обновляем discovery
+            if attempt == 4:
+                raise
+            mapper.invalidate()
+            time.sleep(attempt + 1)
+
+
+def prepare_apply(apis, doc: Dict[str, Any], default_namespace: Optional[str]) -> Tuple:
+    """(doc, info, тело с аннотацией хэша, хэш) для применения документа."""
+    info = _resolve_for_apply(apis, doc)
+    body = prepare_apply_body(doc, info.namespaced, default_namespace)
+    return doc, info, body, stamp_content_hash(body)
+
+
+def server_side_apply(apis, info: ResourceInfo, body: Dict[str, Any]) -> Dict[str, Any]:
+    meta = body["metadata"]
+    return rest.patch_object(
+        apis,
+        info,
+        meta.get("name"),
+        body,
+        namespace=meta.get("namespace"),
+        content_type=rest.APPLY_PATCH,
+        query={"fieldManager": FIELD_MANAGER, "force": True},
+    )
+
+
+def doc_ref(doc: Dict[str, Any]) -> str:
+    return f"{doc.get('kind')}/{(doc.get('metadata') or {}).get('name')}"
+
+
+def apply_manifest_docs(
+        apis,
+        docs,
+        default_namespace=None,
+        max_concurrency: Optional[int] = None,
+        skip_unchanged: Optional[bool] = None,
+):
+    """
+    Server-side apply (PATCH application/apply-patch+yaml, fieldManager=pseudoflow-operator)
+    волнами по зависимостям; документы внутри волны применяются по очереди в вызывающем потоке.
+    Параллельно (max_concurrency) применяет pseudoflow.kube.aio.apply_manifest_docs —
+    через общий api executor или async-клиент, без отдельных пулов потоков;
+    здесь max_concurrency принимается для совместимости сигнатуры.
+    Объекты, чей хэш в аннотации pseudoflow.io/last-applied-hash совпадает
+    с отрендеренным телом и чьи поля никто не менял после нашего apply (см. changed_docs),
+    не пишутся (skip_unchanged, по умолчанию SKIP_UNCHANGED).
+    """
+    skip = SKIP_UNCHANGED if skip_unchanged is None else skip_unchanged
+
+    for wave in apply_waves(docs):
+        errors: List[str] = []
+        prepared = []
+        for doc in wave:
+            try:
+                prepared.append(prepare_apply(apis, doc, default_namespace))
+            except Exception as e:
+                errors.append(f"{doc_ref(doc)}: {e}")
+
+        if skip and prepared:
+            live = live_state(apis, [apply_key(info, body) for _, info, body, _ in prepared])
+            prepared = changed_docs(prepared, live)
+
+        for doc, info, body, digest in prepared:
+            try:
+                server_side_apply(apis, info, body)
+            except Exception as e:
+                errors.append(f"{doc_ref(doc)}: {e}")
+        raise_apply_errors(errors)
+
+
+def get_object(
+        apis,
+        kind: str,
+        name: str,
+        ns: Optional[str] = None,
+        api_version: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Объект как JSON ответа API (camelCase); None — объекта нет."""
+    info = rest.resolve(apis, kind, api_version)
+    return rest.get_object(apis, info, name, ns)
 
 
 def delete_target(apis, target: Dict[str, Any], default_namespace=None):
-    gv = target.get("apiVersion", "v1")
-    kind = target["kind"]
-    name = target["name"]
-    ns = target.get("namespace", default_namespace)
+    info = rest.resolve(apis, target["kind"], target.get("apiVersion"))
+    rest.delete_object(apis, info, target["name"], target.get("namespace", default_namespace))
 
-    core = apis["core"]
-    apps = apis["apps"]
-
-    if gv == "v1" and kind == "ConfigMap":
-        core.delete_namespaced_config_map(name, ns)
-        return
-    if gv == "v1" and kind == "Secret":
-        core.delete_namespaced_secret(name, ns)
-        return
-    if gv == "v1" and kind == "Service":
-        core.delete_namespaced_service(name, ns)
-        return
-    if gv == "apps/v1" and kind == "Deployment":
-        apps.delete_namespaced_deployment(name, ns)
-        return
-    if gv == "apps/v1" and kind == "DaemonSet":
-        apps.delete_namespaced_daemon_set(name, ns)
-        return
-    if gv == "apps/v1" and kind == "StatefulSet":
-        apps.delete_namespaced_stateful_set(name, ns)
-        return
-    raise ValueError(f"delete unsupported for {gv}/{kind}")
-
-
-def patch_labels(apis, kind: str, ns: str | None, name: str, add: Dict[str, str], remove_keys: List[str]):
-    core = apis["core"]
-    apps = apis["apps"]
-    body = {"metadata": {"labels": add or {}}}
+
+def label_patch_body(add: Dict[str, str], remove_keys: List[str]) -> Dict[str, Any]:
+    body = {"metadata": {"labels": dict(add or {})}}
     for k in remove_keys or []:
         body["metadata"]["labels"][k] = None
+    return body
+
+
+def label_patch_needed(current: Optional[Dict[str, str]], add: Dict[str, str], remove_keys: List[str]) -> bool:
+    """False, если метки объекта уже совпадают с желаемыми (патч был бы no-op)."""
+    if current is None:
+        return True
+    if any(current.get(k) != v for k, v in (add or {}).items()):
+        return True
+    return any(k in current for k in remove_keys or [])
+
+
+def patch_labels(
+        apis,
+        kind: str,
+        ns: str | None,
+        name: str,
+        add: Dict[str, str],
+        remove_keys: List[str],
+        api_version: Optional[str] = None,
+):
+    info = rest.resolve(apis, kind, api_version)
+    rest.patch_object(apis, info, name, label_patch_body(add, remove_keys), namespace=ns)
 
-    if kind == "Node":
-        client.CoreV1Api().patch_node(name, body)
-        return
-    if kind == "Pod":
-        core.patch_namespaced_pod(name=name, namespace=ns, body=body)
-        return
-    if kind == "Deployment":
-        apps.patch_namespaced_deployment(name=name, namespace=ns, body=body)
-        return
-    if kind == "DaemonSet":
-        apps.patch_namespaced_daemon_set(name=name, namespace=ns, body=body)
-        return
-    if kind == "StatefulSet":
-        apps.patch_namespaced_stateful_set(name=name, namespace=ns, body=body)
-        return
-    if kind == "Service":
-        core.patch_namespaced_service(name=name, namespace=ns, body=body)
-        return
-    raise ValueError(f"patchLabels unsupported kind '{kind}'")
-
-
-def list_resources_by_selector(apis, kind: str, ns: str | None, selector: str) -> List[str]:
-    core = apis["core"]
-    apps = apis["apps"]
-    if kind == "Node":
-        items = core.list_node(label_selector=selector).items
-        return [i.metadata.name for i in items]
-    if kind == "Pod":
-        items = core.list_namespaced_pod(namespace=ns, label_selector=selector).items
-        return [i.metadata.name for i in items]
-    if kind == "Deployment":
-        items = apps.list_namespaced_deployment(namespace=ns, label_selector=selector).items
-        return [i.metadata.name for i in items]
-    if kind == "DaemonSet":
-        items = apps.list_namespaced_daemon_set(namespace=ns, label_selector=selector).items
-        return [i.metadata.name for i in items]
-    if kind == "StatefulSet":
-        items = apps.list_namespaced_stateful_set(namespace=ns, label_selector=selector).items
-        return [i.metadata.name for i in items]
-    if kind == "Service":
-        items = core.list_namespaced_service(namespace=ns, label_selector=selector).items
-        return [i.metadata.name for i in items]
-    raise ValueError(f"selector listing unsupported kind '{kind}'")
+
+def list_resources_by_selector(
+        apis,
+        kind: str,
+        ns: str | None,
+        selector: str,
+        api_version: Optional[str] = None,
+) -> List[str]:
+    if kind == "Node" and api_version in (None, "v1"):
+        return select_nodes(apis, selector)
+    info = rest.resolve(apis, kind, api_version)
+    lst = rest.list_objects(apis, info, ns, label_selector=selector_to_str(selector))
+    return [i["metadata"]["name"] for i in lst.get("items") or []]
+
+
+def get_resource_labels(
+        apis,
+        kind: str,
+        ns: str | None,
+        api_version: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        selector=None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Текущие метки объектов {name: labels} — по селектору или по списку имён
+    (отсутствующие объекты в результат не попадают). Ноды — из informer, если он уже синхронизирован.
+    """
+    if kind == "Node" and api_version in (None, "v1"):
+        informer = get_node_informer(apis)
+        if informer is not None and informer.synced:
+            if selector is not None:
+                names = informer.select(selector_to_str(selector))
+            found = {n: informer.get_labels(n) for n in names or []}
+            return {n: labels for n, labels in found.items() if labels is not None}
+
+    if selector is None and not names:
+        return {}
+    info = rest.resolve(apis, kind, api_version)
+    if selector is None and names is not None and len(names) == 1:
+        obj = rest.get_object(apis, info, names[0], ns)
+        return {names[0]: (obj.get("metadata") or {}).get("labels") or {}} if obj else {}
+    label_selector = selector_to_str(selector) if selector is not None else None
+    lst = rest.list_objects(apis, info, ns, label_selector=label_selector)
+    return labels_by_name(lst, None if selector is not None else names)
+
+
+def labels_by_name(lst: Dict[str, Any], names: Optional[List[str]] = None) -> Dict[str, Dict[str, str]]:
+    wanted = set(names) if names is not None else None
+    out = {}
+    for item in lst.get("items") or []:
+        meta = item.get("metadata") or {}
+        if wanted is None or meta.get("name") in wanted:
+            out[meta.get("name")] = meta.get("labels") or {}
+    return out
 
 
 def select_nodes(apis, selector) -> List[str]:
+    # informer не дожидаемся: холодный или сломанный (RBAC, ошибки API) кэш не должен держать вызов
+    label = selector_to_str(selector)
+    informer = get_node_informer(apis)
+    if informer is not None and informer.synced:
+        return informer.select(label)
     core = apis["core"]
-    if isinstance(selector, str):
-        label = selector
-    else:
-        label = ",".join(f"{k}={v}" for k, v in (selector or {}).items())
     items = core.list_node(label_selector=label).items
     return [i.metadata.name for i in items]
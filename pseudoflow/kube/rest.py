@@ -0,0 +1,191 @@
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from kubernetes import dynamic
+from kubernetes.client import ApiException
+
+from pseudoflow.util import cancel as cancelling
+from pseudoflow.util.cancel import CancelToken
+
+from .discovery import ResourceInfo, RestMapper
+
+MERGE_PATCH = "application/merge-patch+json"
+APPLY_PATCH = "application/apply-patch+yaml"
+# Только metadata объектов (PartialObjectMetadata); серверы без поддержки отдают полный JSON
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadata;g=meta.k8s.io;v=v1,application/json"
+METADATA_LIST_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+
+
+class _NoDiscovery:
+    """DynamicClient используется только как транспорт; GVK разрешает RestMapper."""
+
+    def __init__(self, client, cache_file=None):
+        pass
+
+
+_transports: Dict[int, dynamic.DynamicClient] = {}
+_mappers: Dict[Any, RestMapper] = {}
+_lock = threading.Lock()
+
+
+def _transport(apis) -> dynamic.DynamicClient:
+    api_client = apis["dyn"]
+    with _lock:
+        dc = _transports.get(id(api_client))
+        if dc is None:
+            dc = dynamic.DynamicClient(api_client, discoverer=_NoDiscovery)
+            _transports[id(api_client)] = dc
+        return dc
+
+
+def _query(query: Optional[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    out = []
+    for k, v in (query or {}).items():
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            v = "true" if v else "false"
+        out.append((k, v))
+    return out
+
+
+def request(
+        apis,
+        method: str,
+        path: str,
+        body: Any = None,
+        query: Optional[Dict[str, Any]] = None,
+        content_type: Optional[str] = None,
+        stream: bool = False,
+        timeout: Optional[float] = None,
+        accept: Optional[str] = None,
+) -> Any:
+    """
+    Сырой запрос к API server. Возвращает JSON-ответ как dict,
+    при stream=True — urllib3-ответ без предзагрузки тела.
+    """
+    params: Dict[str, Any] = {"serialize": False, "query_params": _query(query)}
+    if content_type:
+        params["content_type"] = content_type
+    if stream:
+        params["_preload_content"] = False
+    if timeout is not None:
+        params["_request_timeout"] = timeout
+    if accept:
+        params["header_params"] = {"Accept": accept}
+    resp = _transport(apis).request(method, path, body=body, **params)
+    if stream:
+        return resp
+    data = resp.data
+    return json.loads(data) if data else None
+
+
+def get_rest_mapper(apis) -> RestMapper:
+    key = apis.get("cluster", id(apis["dyn"]))
+    with _lock:
+        mapper = _mappers.get(key)
+        if mapper is None:
+            mapper = RestMapper(lambda path: request(apis, "GET", path))
+            _mappers[key] = mapper
+        return mapper
+
+
+def resolve(apis, kind: str, api_version: Optional[str] = None) -> ResourceInfo:
+    return get_rest_mapper(apis).resolve(kind, api_version)
+
+
+def get_object(
+        apis,
+        info: ResourceInfo,
+        name: str,
+        namespace: Optional[str] = None,
+        accept: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    try:
+        return request(apis, "GET", info.path(namespace, name), accept=accept)
+    except ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def list_objects(
+        apis,
+        info: ResourceInfo,
+        namespace: Optional[str] = None,
+        label_selector: Optional[str] = None,
+        field_selector: Optional[str] = None,
+        accept: Optional[str] = None,
+) -> Dict[str, Any]:
+    return request(
+        apis,
+        "GET",
+        info.path(namespace),
+        query={"labelSelector": label_selector, "fieldSelector": field_selector},
+        accept=accept,
+    )
+
+
+def patch_object(
+        apis,
+        info: ResourceInfo,
+        name: str,
+        body: Any,
+        namespace: Optional[str] = None,
+        content_type: str = MERGE_PATCH,
+        query: Optional[Dict[str, Any]] = None,
+        subresource: Optional[str] = None,
+) -> Dict[str, Any]:
+    return request(
+        apis, "PATCH", info.path(namespace, name, subresource), body=body, query=query, content_type=content_type,
+    )
+
+
+def delete_object(
+        apis,
+        info: ResourceInfo,
+        name: str,
+        namespace: Optional[str] = None,
+        query: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    return request(apis, "DELETE", info.path(namespace, name), query=query)
+
+
+def watch_objects(
+        apis,
+        info: ResourceInfo,
+        namespace: Optional[str] = None,
+        query: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[CancelToken] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    События watch (dict с type/object). ERROR-события поднимаются как ApiException.
+    cancel прерывает ожидание следующего события (OperationCancelled).
+    """
+    resp = request(
+        apis,
+        "GET",
+        info.path(namespace),
+        query=dict(query or {}, watch=True),
+        stream=True,
+        timeout=timeout,
+    )
+    unregister = cancelling.on_cancel(cancel, resp.shutdown)
+    try:
+        buf = b""
+        for chunk in cancelling.guard(cancel, resp.stream(amt=None, decode_content=True)):
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "ERROR":
+                    obj = event.get("object") or {}
+                    raise ApiException(status=obj.get("code"), reason=obj.get("message"))
+                yield event
+    finally:
+        unregister()
+        resp.release_conn()
@@ -0,0 +1,330 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from kubernetes import client
+from kubernetes.client import ApiException
+from kubernetes.stream import stream
+
+from pseudoflow.util import cancel as cancelling
+from pseudoflow.util.cancel import CancelToken
+from pseudoflow.util.capture import OutputCapture
+
+from .exec import _wait_pod_phase, build_runner_pod, new_runner_name, run_pod_and_get_logs
+
+logger = logging.getLogger("pseudoflow.kube.runner_pool")
+
+# Число тёплых подов-исполнителей на namespace (0 — пул выключен, под на команду)
+POOL_SIZE = int(os.getenv("PSEUDOFLOW_RUNNER_POOL_SIZE", "0"))
+# После скольких команд под пересоздаётся
+MAX_USES = int(os.getenv("PSEUDOFLOW_RUNNER_POOL_MAX_USES", "50"))
+POD_START_TIMEOUT = 300
+# Пул, все поды которого простаивают столько секунд, закрывается (поды удаляются); 0 — никогда
+IDLE_SECONDS = float(os.getenv("PSEUDOFLOW_RUNNER_POOL_IDLE_SECONDS", "300"))
+# Пауза перед новым созданием пода после ошибки: с 1 с, удваивается до CREATE_BACKOFF_MAX
+CREATE_BACKOFF_MAX = 60.0
+
+POOL_LABEL = "pseudoflow.io/runner-pool"
+IDLE_COMMAND = "trap 'exit 0' TERM; while :; do sleep 3600 & wait; done"
+
+
+class PoolClosed(RuntimeError):
+    pass
+
+
+class _Runner:
+    def __init__(self, name: str):
+        self.name = name
+        self.uses = 0
+
+
+class RunnerPool:
+    """
+    Пул заранее запущенных подов-исполнителей в одном namespace.
+    Команды выполняются через exec subresource; под пересоздаётся
+    после MAX_USES команд или при ошибке exec. Ошибка создания пода (RBAC, квота)
+    откладывает следующие попытки (backoff) и, пока живых подов нет, сразу
+    возвращается ожидающим командам.
+    """
+
+    def __init__(self, apis, namespace: str, size: int = POOL_SIZE, max_uses: int = MAX_USES):
+        self._apis = apis
+        self._core = apis["core"]
+        # stream() подменяет call_api у ApiClient на время запроса — отдельный клиент и lock
+        self._exec_core = client.CoreV1Api(client.ApiClient(apis["dyn"].configuration))
+        self._exec_lock = threading.Lock()
+        self.namespace = namespace
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._cond = threading.Condition()
+        self._idle: List[_Runner] = []
+        self._total = 0
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self.last_used = time.monotonic()
+
+    # --- pods ---
+
+    def _create_pod(self) -> _Runner:
+        name = new_runner_name()
+        pod = build_runner_pod(name, IDLE_COMMAND)
+        pod.metadata.labels[POOL_LABEL] = "true"
+        try:
+            self._core.create_namespaced_pod(namespace=self.namespace, body=pod)
+            phase, _ = _wait_pod_phase(self._apis, name, self.namespace, ("running", "succeeded", "failed"),
+                                    time.time() + POD_START_TIMEOUT)
+            if phase != "running":
+                raise RuntimeError(f"runner pod {name} ended in phase {phase}")
+            return _Runner(name)
+        except Exception as e:
+            logger.warning("Failed to start pool runner pod %s/%s: %s", self.namespace, name, e)
+            self._delete_pod(name)
+            raise
+
+    def _delete_pod(self, name: str) -> None:
+        try:
+            self._core.delete_namespaced_pod(name=name, namespace=self.namespace, grace_period_seconds=0)
+        except Exception:
+            logger.debug(f"Failed to delete pod {name}/{self.namespace}, might be already gone.")
+
+    def _spawn(self) -> None:
+        """Фоновое создание пода: слот уже учтён в _total."""
+
+        def run():
+            runner, error = None, None
+            try:
+                runner = self._create_pod()
+            except Exception as e:
+                error = e
+            with self._cond:
+                discard = runner is None or self._closed
+                if discard:
+                    self._total -= 1
+                else:
+                    self._idle.append(runner)
+                if error is not None:
+                    self._error = error
+                    self._backoff = min(CREATE_BACKOFF_MAX, self._backoff * 2 or 1.0)
+                    self._retry_at = time.monotonic() + self._backoff
+                else:
+                    self._error, self._backoff, self._retry_at = None, 0.0, 0.0
+                # ожидающие команды должны увидеть и под, и ошибку
+                self._cond.notify_all()
+            if runner is not None and discard:
+                self._delete_pod(runner.name)
+
+        threading.Thread(target=run, name="runner-pool-spawn", daemon=True).start()
+
+    def prewarm(self) -> None:
+        with self._cond:
+            if self._closed or time.monotonic() < self._retry_at:
+                return
+            missing = self.size - self._total
+            self._total += missing
+        for _ in range(missing):
+            self._spawn()
+
+    # --- acquire/release ---
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _acquire(self, end: float, cancel: Optional[CancelToken] = None) -> _Runner:
+        unregister = cancelling.on_cancel(cancel, self._wake)
+        try:
+            with self._cond:
+                while True:
+                    cancelling.check(cancel)
+                    if self._closed:
+                        raise PoolClosed(f"runner pool in {self.namespace} is closed")
+                    self.last_used = time.monotonic()
+                    if self._idle:
+                        return self._idle.pop()
+                    wait = end - time.time()
+                    if self._total < self.size:
+                        delay = self._retry_at - time.monotonic()
+                        if delay <= 0:
+                            self._total += 1
+                            self._spawn()
+                        elif self._total == 0:
+                            # живых подов нет и создать пока нельзя: ждать нечего
+                            raise RuntimeError(
+                                f"cannot start runner pods in {self.namespace}: {self._error}"
+                            ) from self._error
+                        else:
+                            wait = min(wait, delay)
+                    if end - time.time() <= 0:
+                        raise TimeoutError(f"no idle runner pod in {self.namespace}")
+                    self._cond.wait(max(0.01, wait))
+        finally:
+            unregister()
+
+    def _release(self, runner: _Runner, healthy: bool) -> None:
+        runner.uses += 1
+        recycle = not healthy or runner.uses >= self.max_uses
+        with self._cond:
+            self.last_used = time.monotonic()
+            if recycle or self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(runner)
+            self._cond.notify()
+        if recycle or self._closed:
+            self._delete_pod(runner.name)
+        if recycle and not self._closed:
+            self.prewarm()
+
+    # --- exec ---
+
+    def _exec(self, runner: _Runner, command: str, end: float, cancel: Optional[CancelToken] = None,
+              capture: Optional[OutputCapture] = None) -> str:
+        with self._exec_lock:
+            resp = stream(
+                self._exec_core.connect_get_namespaced_pod_exec,
+                runner.name,
+                self.namespace,
+                command=["/bin/sh", "-lc", command],
+                stdin=False,
+                stdout=True,
+                stderr=True,
+                tty=False,
+                _preload_content=False,
+            )
+        out = capture if capture is not None else OutputCapture()
+        try:
+            while resp.is_open():
+                # прерванная команда продолжает работать в поде — под пересоздаётся в _release
+                cancelling.check(cancel)
+                if time.time() >= end:
+                    raise TimeoutError(f"Command in runner pod {runner.name} timed out")
+                resp.update(timeout=1)
+                if resp.peek_stdout():
+                    out.write(resp.read_stdout())
+                if resp.peek_stderr():
+                    out.write(resp.read_stderr())
+            code = resp.returncode
+        finally:
+            resp.close()
+            out.close()
+        # как у отдельного пода: ненулевой код не ошибка шага, он остаётся в capture.exit_code
+        out.exit_code = code
+        if code:
+            logger.warning("Command in runner pod %s exited with code %s", runner.name, code)
+        return out.value()
+
+    def run(self, command: str, timeout: int = 600, cancel: Optional[CancelToken] = None,
+            capture: Optional[OutputCapture] = None) -> str:
+        end = time.time() + timeout
+        runner = self._acquire(end, cancel)
+        healthy = False
+        try:
+            output = self._exec(runner, command, end, cancel, capture)
+            healthy = True
+            return output
+        finally:
+            self._release(runner, healthy)
+
+    def retire_if_idle(self, idle_seconds: float) -> Optional[List[str]]:
+        """Закрывает пул без занятых подов, не используемый idle_seconds; возвращает поды к удалению."""
+        with self._cond:
+            if self._closed or self._total != len(self._idle) \
+                    or time.monotonic() - self.last_used < idle_seconds:
+                return None
+            return self._shut()
+
+    def _shut(self) -> List[str]:
+        self._closed = True
+        idle, self._idle = self._idle, []
+        self._total -= len(idle)
+        self._cond.notify_all()
+        return [runner.name for runner in idle]
+
+    def close(self) -> None:
+        with self._cond:
+            names = self._shut()
+        for name in names:
+            self._delete_pod(name)
+
+
+_pools: Dict[tuple, RunnerPool] = {}
+_pools_lock = threading.Lock()
+_reaper: Optional[threading.Thread] = None
+
+
+def get_runner_pool(apis, namespace: str) -> Optional[RunnerPool]:
+    global _reaper
+    if POOL_SIZE <= 0:
+        return None
+    key = (apis.get("cluster", id(apis["core"])), namespace)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            _delete_stale_pods(apis["core"], namespace)
+            pool = RunnerPool(apis, namespace)
+            _pools[key] = pool
+            pool.prewarm()
+            if _reaper is None and IDLE_SECONDS > 0:
+                _reaper = threading.Thread(target=_reap_forever, name="runner-pool-reaper", daemon=True)
+                _reaper.start()
+        return pool
+
+
+def reap_idle_pools(idle_seconds: float) -> int:
+    """
+    Закрывает пулы, не используемые idle_seconds: пул создаётся в каждом namespace,
+    где шли exec/script, и без этого держал бы там POOL_SIZE подов навсегда.
+    """
+    retired = []
+    with _pools_lock:
+        for key, pool in list(_pools.items()):
+            names = pool.retire_if_idle(idle_seconds)
+            if names is not None:
+                del _pools[key]
+                retired.append((pool, names))
+    for pool, names in retired:
+        logger.info("Runner pool in %s idle for %ss, deleting %s pod(s)", pool.namespace, idle_seconds, len(names))
+        for name in names:
+            pool._delete_pod(name)
+    return len(retired)
+
+
+def _reap_forever() -> None:
+    while True:
+        time.sleep(min(IDLE_SECONDS, 30.0))
+        try:
+            reap_idle_pools(IDLE_SECONDS)
+        except Exception as e:
+            logger.warning("Runner pool reaper failed: %s", e)
+
+
+def _delete_stale_pods(core, namespace: str) -> None:
+    # поды пула от предыдущего запуска оператора
+    try:
+        core.delete_collection_namespaced_pod(namespace, label_selector=f"{POOL_LABEL}=true", grace_period_seconds=0)
+    except ApiException as e:
+        logger.debug("Failed to clean up stale runner pods in %s: %s", namespace, e)
+
+
+def run_in_runner(apis, namespace: str, command: str, timeout: int = 600, cancel: Optional[CancelToken] = None,
+                  capture: Optional[OutputCapture] = None) -> str:
+    """Команда в тёплом поде пула, если пул включён, иначе — отдельный под."""
+    pool = get_runner_pool(apis, namespace)
+    if pool is None:
+        return run_pod_and_get_logs(apis, namespace, command, None, False, None, timeout, cancel, capture)
+    try:
+        return pool.run(command, timeout, cancel, capture)
+    except PoolClosed:
+        # пул закрыт как простаивающий между выбором и запуском — берём новый
+        return get_runner_pool(apis, namespace).run(command, timeout, cancel, capture)
+
+
+def close_runner_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
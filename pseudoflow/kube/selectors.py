@@ -0,0 +1,83 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Requirement: (key, op, values), op in: =, !=, in, notin, exists, !exists
+Requirement = Tuple[str, str, Tuple[str, ...]]
+
+_SET_RE = re.compile(r"^\s*(!?)\s*([^\s!=(),]+)\s*(?:(in|notin)\s*\(([^)]*)\))?\s*$")
+
+
+def _split_top_level(selector: str) -> List[str]:
+    parts, depth, cur = [], 0, []
+    for ch in selector:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(cur))
+            cur = []
+            continue
+        cur.append(ch)
+    parts.append("".join(cur))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_label_selector(selector: Optional[str]) -> List[Requirement]:
+    reqs: List[Requirement] = []
+    for part in _split_top_level(selector or ""):
+        if "!=" in part:
+            k, v = part.split("!=", 1)
+            reqs.append((k.strip(), "!=", (v.strip(),)))
+            continue
+        if "==" in part:
+            k, v = part.split("==", 1)
+            reqs.append((k.strip(), "=", (v.strip(),)))
+            continue
+        if "=" in part:
+            k, v = part.split("=", 1)
+            reqs.append((k.strip(), "=", (v.strip(),)))
+            continue
+        m = _SET_RE.match(part)
+        if not m:
+            raise ValueError(f"invalid label selector '{selector}'")
+        neg, key, op, values = m.groups()
+        if op:
+            if neg:
+                raise ValueError(f"invalid label selector '{selector}'")
+            vals = tuple(v.strip() for v in values.split(",") if v.strip())
+            reqs.append((key, op, vals))
+        else:
+            reqs.append((key, "!exists" if neg else "exists", ()))
+    return reqs
+
+
+def selector_to_str(selector) -> str:
+    if isinstance(selector, str):
+        return selector
+    return ",".join(f"{k}={v}" for k, v in (selector or {}).items())
+
+
+def match_labels(reqs: List[Requirement], labels: Optional[Dict[str, str]]) -> bool:
+    labels = labels or {}
+    for key, op, values in reqs:
+        present = key in labels
+        if op == "=":
+            if not present or labels[key] != values[0]:
+                return False
+        elif op == "!=":
+            if present and labels[key] == values[0]:
+                return False
+        elif op == "in":
+            if not present or labels[key] not in values:
+                return False
+        elif op == "notin":
+            if present and labels[key] in values:
+                return False
+        elif op == "exists":
+            if not present:
+                return False
+        elif op == "!exists":
+            if present:
+                return False
+    return True
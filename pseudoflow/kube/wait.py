@@ -1,9 +1,23 @@
+import logging
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
-from jsonpath_ng import parse as jp_parse
 from kubernetes.client import ApiException
 
+from pseudoflow.util import cancel as cancelling
+from pseudoflow.util.cancel import CancelToken
+from pseudoflow.util.conditions import compile_condition
+
+from . import rest
+from .discovery import ResourceInfo, UnknownKindError
+
+logger = logging.getLogger("pseudoflow.kube.wait")
+
+# Максимальный интервал опроса при откате на polling
+MAX_POLL_INTERVAL = 60
+# Коды, при которых watch невозможен и нужно откатиться на polling
+WATCH_UNSUPPORTED_CODES = (403, 405, 501)
+
 
 def wait_for_resource_condition(
         apis,
@@ -15,107 +29,153 @@ def wait_for_resource_condition(
         jsonpath: Optional[str] = None,
         op: Optional[str] = None,
         value: Optional[str] = None,
+        mode: str = "watch",
+        cancel: Optional[CancelToken] = None,
 ):
     end = time.time() + timeout
-    gv = res.get("apiVersion", "v1")
     kind = res["kind"]
     name = res["name"]
     ns = res.get("namespace", default_namespace)
+    mapper = rest.get_rest_mapper(apis)
 
-    core = apis["core"]
-    apps = apis["apps"]
+    def resolve_info() -> Optional[ResourceInfo]:
+        try:
+            return mapper.resolve(kind, res.get("apiVersion"))
+        except UnknownKindError:
+            # CRD ещё не установлен — для ожидания это то же, что «объекта нет»
+            return None
+
+    info = resolve_info()
+    gv = info.api_version if info else res.get("apiVersion", "v1")
+    predicate = build_predicate(condition, gv, kind, jsonpath, op, value)
 
     def get_obj():
-        if gv == "v1" and kind == "Service":
-            return core.read_namespaced_service(name, ns)
-        if gv == "v1" and kind == "ConfigMap":
-            return core.read_namespaced_config_map(name, ns)
-        if gv == "apps/v1" and kind == "Deployment":
-            return apps.read_namespaced_deployment(name, ns)
-        if gv == "apps/v1" and kind == "DaemonSet":
-            return apps.read_namespaced_daemon_set(name, ns)
-        if gv == "apps/v1" and kind == "StatefulSet":
-            return apps.read_namespaced_stateful_set(name, ns)
-        return None
-
-    def exists():
+        nonlocal info
+        if info is None:
+            info = resolve_info()
+            if info is None:
+                return None
+        return rest.get_object(apis, info, name, ns)
+
+    if mode == "watch" and info is not None:
         try:
-            return get_obj() is not None
+            if _watch_until(apis, info, name, ns, predicate, end, cancel):
+                return
+            raise TimeoutError(f"waitFor {condition} timed out")
         except ApiException as e:
-            if e.status == 404:
-                return False
-            raise
+            if e.status not in WATCH_UNSUPPORTED_CODES:
+                raise
+            logger.info("watch on %s %s/%s unavailable (%s), falling back to polling", kind, ns, name, e.status)
 
-    def ready():
-        # FIX: Переименовали obj -> resource_obj чтобы избежать shadowing
-        if gv == "apps/v1" and kind == "Deployment":
-            resource_obj = get_obj()
-            desired = resource_obj.status.replicas or 0
-            avail = resource_obj.status.available_replicas or 0
-            return desired == avail and desired > 0
-        if gv == "apps/v1" and kind == "DaemonSet":
-            resource_obj = get_obj()
-            desired = resource_obj.status.desired_number_scheduled or 0
-            rd = resource_obj.status.number_ready or 0
-            return desired == rd and desired > 0
-        if gv == "apps/v1" and kind == "StatefulSet":
-            resource_obj = get_obj()
-            replicas = resource_obj.status.replicas or 0
-            ready_replicas = resource_obj.status.ready_replicas or 0
-            return replicas == ready_replicas and replicas > 0
-        return False
+    if _poll_until(get_obj, predicate, end, interval, cancel):
+        return
+    raise TimeoutError(f"waitFor {condition} timed out")
 
+
+def build_predicate(
+        condition: str,
+        gv: str,
+        kind: str,
+        jsonpath: Optional[str],
+        op: Optional[str],
+        value: Optional[str],
+) -> Callable[[Any], bool]:
+    """
+    Предикат над объектом ресурса — JSON-ответом API как dict (None — объекта нет).
+    jsonPath в Custom указывается в camelCase, как в манифестах.
+    """
     cond = condition.lower()
     if cond == "exist":
-        while time.time() < end:
-            if exists():
-                return
-            time.sleep(interval)
-        raise TimeoutError("waitFor Exist timed out")
+        return lambda obj: obj is not None
 
     if cond == "deleted":
-        while time.time() < end:
-            if not exists():
-                return
-            time.sleep(interval)
-        raise TimeoutError("waitFor Deleted timed out")
+        return lambda obj: obj is None
 
     if cond in ("ready", "available", "healthy"):
-        while time.time() < end:
-            if ready():
-                return
-            time.sleep(interval)
-        raise TimeoutError(f"waitFor {condition} timed out")
+        def field(status, key: str) -> int:
+            return status.get(key) or 0
+
+        def ready(resource_obj) -> bool:
+            if resource_obj is None:
+                return False
+            status = resource_obj.get("status")
+            if status is None:
+                return False
+            if gv == "apps/v1" and kind == "Deployment":
+                desired = field(status, "replicas")
+                avail = field(status, "availableReplicas")
+                return desired == avail and desired > 0
+            if gv == "apps/v1" and kind == "DaemonSet":
+                desired = field(status, "desiredNumberScheduled")
+                rd = field(status, "numberReady")
+                return desired == rd and desired > 0
+            if gv == "apps/v1" and kind == "StatefulSet":
+                replicas = field(status, "replicas")
+                ready_replicas = field(status, "readyReplicas")
+                return replicas == ready_replicas and replicas > 0
+            return False
+
+        return ready
 
     if cond == "custom":
         if not jsonpath or not op:
             raise ValueError("Custom condition requires jsonPath and op")
-        expr = jp_parse(jsonpath)
-        while time.time() < end:
-            obj = get_obj()
-            if obj is None:
-                time.sleep(interval)
+        return compile_condition(jsonpath, op, value)
+
+    raise ValueError(f"Unsupported waitFor condition '{condition}'")
+
+
+def _watch_until(
+        apis,
+        info: ResourceInfo,
+        name: str,
+        ns: Optional[str],
+        predicate,
+        end: float,
+        cancel: Optional[CancelToken] = None,
+) -> bool:
+    field_selector = f"metadata.name={name}"
+    while time.time() < end:
+        cancelling.check(cancel)
+        lst = rest.list_objects(apis, info, ns, field_selector=field_selector)
+        items = lst.get("items") or []
+        if predicate(items[0] if items else None):
+            return True
+
+        remaining = max(1, int(end - time.time()))
+        query = {
+            "fieldSelector": field_selector,
+            "resourceVersion": (lst.get("metadata") or {}).get("resourceVersion"),
+            "timeoutSeconds": remaining,
+        }
+        events = rest.watch_objects(apis, info, ns, query, timeout=remaining + 5, cancel=cancel)
+        try:
+            for event in events:
+                etype = event.get("type")
+                if etype == "BOOKMARK":
+                    continue
+                obj = None if etype == "DELETED" else event.get("object")
+                if predicate(obj):
+                    return True
+                if time.time() >= end:
+                    break
+        except ApiException as e:
+            if e.status == 410:
+                # resourceVersion устарел — заново list и watch
                 continue
-            data = obj.to_dict()
-            matches = [m.value for m in expr.find(data)]
-            ok = False
-
-            # FIX: Исправлено использование переменной 'm' в генераторах
-            if op == "equals":
-                ok = any(str(x) == str(value) for x in matches)
-            elif op == "notEquals":
-                ok = any(str(x) != str(value) for x in matches)
-            elif op == "contains":
-                ok = any(str(value) in str(x) for x in matches)
-            elif op == "greaterThan":
-                ok = any(float(x) > float(value) for x in matches)
-            elif op == "lessThan":
-                ok = any(float(x) < float(value) for x in matches)
-            else:
-                raise ValueError(f"Unsupported op {op}")
-            if ok:
-                return
-            time.sleep(interval)
-        raise TimeoutError("waitFor Custom timed out")
+            raise
+        finally:
+            events.close()
+    return False
+
 
-    raise ValueError(f"Unsupported waitFor condition '{condition}'")
\ No newline at end of file
+def _poll_until(get_obj, predicate, end: float, interval: int, cancel: Optional[CancelToken] = None) -> bool:
+    delay = max(1, interval)
+    max_delay = max(delay, MAX_POLL_INTERVAL)
+    while time.time() < end:
+        cancelling.check(cancel)
+        if predicate(get_obj()):
+            return True
+        cancelling.sleep(cancel, min(delay, end - time.time()))
+        delay = min(delay * 2, max_delay)
+    return False
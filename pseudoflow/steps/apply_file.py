@@ -1,7 +1,6 @@
-import asyncio
 import yaml
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import apply_manifest_docs
+from pseudoflow.kube import aio
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -10,5 +9,7 @@ async def handle(step: dict, ctx: FlowContext) -> None:
         raise ValueError("applyFile.path required")
     with open(path, "r") as f:
         docs = list(yaml.safe_load_all(f.read()))
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, apply_manifest_docs, ctx.apis, docs, ctx.namespace)
+    limit = step.get("maxConcurrency")
+    await aio.apply_manifest_docs(
+        ctx.apis, docs, ctx.namespace, int(limit) if limit else None, step.get("skipUnchanged"),
+    )
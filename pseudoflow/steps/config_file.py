@@ -1,7 +1,7 @@
-import asyncio
-
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import run_pod_and_get_logs, select_nodes
+from pseudoflow.agent import host_root, run_on_node
+from pseudoflow.kube import aio
+from pseudoflow.util.fanout import fan_out_nodes
 from pseudoflow.util.shell import sh_quote
 
 
@@ -15,24 +15,24 @@ async def handle(step: dict, ctx: FlowContext) -> None:
     if not path:
         raise ValueError("configFile.path required")
 
-    nodes = select_nodes(ctx.apis, selector)
-    loop = asyncio.get_event_loop()
+    nodes = await aio.select_nodes(ctx.apis, selector)
+    target = host_root() + path
 
-    for node in nodes:
-        cmd = (
-            f'install -D -m {mode} /dev/stdin "/host{path}" '
-            f'&& chown {owner} "/host{path}"'
-        )
-        payload = f"echo -n {sh_quote(content)} | /bin/sh -lc {sh_quote(cmd)}"
+    cmd = (
+        f'install -D -m {mode} /dev/stdin "{target}" '
+        f'&& chown {owner} "{target}"'
+    )
+    payload = f"echo -n {sh_quote(content)} | /bin/sh -lc {sh_quote(cmd)}"
 
-        await loop.run_in_executor(
-            None,
-            run_pod_and_get_logs,
+    async def run_on(node: str) -> str:
+        return await run_on_node(
             ctx.apis,
             ctx.namespace or ctx.operator_ns,
             payload,
-            {"kubernetes.io/hostname": node},
+            node,
             True,
             [{"hostPath": "/", "mountPath": "/host"}],
             600,
         )
+
+    await fan_out_nodes(step, ctx.vars, nodes, run_on)
@@ -1,7 +1,6 @@
-import asyncio
 import yaml
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import delete_target
+from pseudoflow.kube import aio
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -12,7 +11,6 @@ async def handle(step: dict, ctx: FlowContext) -> None:
     with open(path, "r") as f:
         docs = list(yaml.safe_load_all(f.read()))
 
-    loop = asyncio.get_event_loop()
     for doc in docs:
         if not doc:
             continue
@@ -22,4 +20,4 @@ async def handle(step: dict, ctx: FlowContext) -> None:
             "name": doc.get("metadata", {}).get("name"),
             "namespace": doc.get("metadata", {}).get("namespace", ctx.namespace),
         }
-        await loop.run_in_executor(None, delete_target, ctx.apis, target, ctx.namespace)
+        await aio.delete_target(ctx.apis, target, ctx.namespace)
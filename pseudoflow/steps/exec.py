@@ -1,7 +1,6 @@
-import asyncio
-
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import run_pod_and_get_logs
+from pseudoflow.kube import aio
+from pseudoflow.util import capture
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -10,20 +9,8 @@ async def handle(step: dict, ctx: FlowContext) -> None:
         raise ValueError("exec.cmd required")
 
     tout = int(step.get("timeoutSeconds", 600))
+    output = capture.from_step(step)
 
-    loop = asyncio.get_event_loop()
-    out = await loop.run_in_executor(
-        None,
-        run_pod_and_get_logs,
-        ctx.apis,
-        ctx.namespace or ctx.operator_ns,
-        cmd,
-        None,
-        False,
-        None,
-        tout,
-    )
+    out = await aio.run_in_runner(ctx.apis, ctx.namespace or ctx.operator_ns, cmd, tout, output)
 
-    var = step.get("var")
-    if var:
-        ctx.vars[var] = out
+    capture.store(ctx.vars, step.get("var"), output, out)
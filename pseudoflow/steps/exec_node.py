@@ -1,8 +1,10 @@
-import asyncio
 import json
 
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import run_pod_and_get_logs, select_nodes
+from pseudoflow.agent import run_on_node
+from pseudoflow.kube import aio
+from pseudoflow.util import capture
+from pseudoflow.util.fanout import fan_out_nodes
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -12,10 +14,9 @@ async def handle(step: dict, ctx: FlowContext) -> None:
 
     selector = step.get("nodeSelector") or {}
     run_on = step.get("runOn", "any")  # any|first|all
-    var_per = step.get("varPerNode")
     timeout = int(step.get("timeoutSeconds", 600))
 
-    nodes = select_nodes(ctx.apis, selector)
+    nodes = await aio.select_nodes(ctx.apis, selector)
     if not nodes:
         return
 
@@ -26,22 +27,40 @@ async def handle(step: dict, ctx: FlowContext) -> None:
     else:
         targets = nodes
 
-    loop = asyncio.get_event_loop()
-    outputs = {}
-
-    for node in targets:
-        out = await loop.run_in_executor(
-            None,
-            run_pod_and_get_logs,
-            ctx.apis,
-            ctx.namespace or ctx.operator_ns,
-            cmd,
-            {"kubernetes.io/hostname": node},
-            True,
-            None,
-            timeout,
-        )
-        outputs[node] = out
-
-    if var_per:
-        ctx.vars[var_per] = json.dumps(outputs)
+    # вывод каждой ноды ограничен отдельно; полный вывод (spillToFile) — в <varPerNode>_files,
+    # коды выхода — в <varPerNode>_exit_codes, ноды с обрезанным выводом — в <varPerNode>_truncated
+    files = {}
+    exit_codes = {}
+    truncated = []
+
+    async def _run_one(node: str) -> str:
+        output = capture.from_step(step)
+        try:
+            return await run_on_node(
+                ctx.apis,
+                ctx.namespace or ctx.operator_ns,
+                cmd,
+                node,
+                True,
+                None,
+                timeout,
+                output,
+            )
+        finally:
+            if output.path:
+                files[node] = output.path
+            if output.exit_code is not None:
+                exit_codes[node] = output.exit_code
+            if output.truncated:
+                truncated.append(node)
+
+    try:
+        await fan_out_nodes(step, ctx.vars, targets, _run_one)
+    finally:
+        var_name = step.get("varPerNode")
+        if var_name and files:
+            ctx.vars[f"{var_name}_files"] = json.dumps(files)
+        if var_name and exit_codes:
+            ctx.vars[f"{var_name}_exit_codes"] = json.dumps(exit_codes)
+        if var_name and truncated:
+            ctx.vars[f"{var_name}_truncated"] = json.dumps(sorted(truncated))
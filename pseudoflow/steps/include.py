@@ -1,9 +1,8 @@
-import asyncio
 import requests
 import yaml
 
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import apply_manifest_docs
+from pseudoflow.kube import aio
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -22,5 +21,7 @@ async def handle(step: dict, ctx: FlowContext) -> None:
             manifests = f.read()
 
     docs = list(yaml.safe_load_all(manifests))
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, apply_manifest_docs, ctx.apis, docs, ctx.namespace)
\ No newline at end of file
+    limit = step.get("maxConcurrency")
+    await aio.apply_manifest_docs(
+        ctx.apis, docs, ctx.namespace, int(limit) if limit else None, step.get("skipUnchanged"),
+    )
\ No newline at end of file
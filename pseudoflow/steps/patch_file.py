@@ -1,7 +1,7 @@
-import asyncio
-
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import run_pod_and_get_logs, select_nodes
+from pseudoflow.agent import host_root, run_on_node
+from pseudoflow.kube import aio
+from pseudoflow.util.fanout import fan_out_nodes
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -14,25 +14,25 @@ async def handle(step: dict, ctx: FlowContext) -> None:
     if not path or not pattern:
         raise ValueError("patchFile.path and pattern required")
 
-    nodes = select_nodes(ctx.apis, selector)
-    loop = asyncio.get_event_loop()
+    nodes = await aio.select_nodes(ctx.apis, selector)
+    target = host_root() + path
 
-    for node in nodes:
-        sh = (
-            f'if [ ! -f "/host{path}" ] && ' + ("true" if create else "false") +
-            f'; then install -D -m 0644 /dev/null "/host{path}"; fi; '
-            f'if [ -f "/host{path}" ]; then '
-            f'sed -r -i "s/{pattern}/{replace}/g" "/host{path}"; fi;'
-        )
+    sh = (
+        f'if [ ! -f "{target}" ] && ' + ("true" if create else "false") +
+        f'; then install -D -m 0644 /dev/null "{target}"; fi; '
+        f'if [ -f "{target}" ]; then '
+        f'sed -r -i "s/{pattern}/{replace}/g" "{target}"; fi;'
+    )
 
-        await loop.run_in_executor(
-            None,
-            run_pod_and_get_logs,
+    async def run_on(node: str) -> str:
+        return await run_on_node(
             ctx.apis,
             ctx.namespace or ctx.operator_ns,
             sh,
-            {"kubernetes.io/hostname": node},
+            node,
             True,
             [{"hostPath": "/", "mountPath": "/host"}],
             600,
         )
+
+    await fan_out_nodes(step, ctx.vars, nodes, run_on)
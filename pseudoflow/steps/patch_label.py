@@ -1,13 +1,16 @@
-import asyncio
 import json
+import logging
 
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import patch_labels
+from pseudoflow.kube import aio
+
+logger = logging.getLogger("pseudoflow.step.patchLabel")
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
     target = step.get("target") or {}
     kind = target.get("kind")
+    api_version = target.get("apiVersion")
     ns = target.get("namespace", ctx.namespace)
     from_var = step.get("fromVar")
 
@@ -20,6 +23,17 @@ async def handle(step: dict, ctx: FlowContext) -> None:
     raw = ctx.vars[from_var]
     mapping = json.loads(raw) if isinstance(raw, str) else raw
 
-    loop = asyncio.get_event_loop()
-    for name, add_labels in mapping.items():
-        await loop.run_in_executor(None, patch_labels, ctx.apis, kind, ns, name, add_labels, [])
+    names = list(mapping)
+    current = await aio.get_resource_labels(ctx.apis, kind, ns, api_version, names=names)
+    summary = await aio.patch_labels_bulk(
+        ctx.apis,
+        kind,
+        ns,
+        {name: (add_labels, []) for name, add_labels in mapping.items()},
+        current,
+        api_version,
+        step.get("maxConcurrency"),
+    )
+    logger.info("[patchLabel] %s: patched=%s unchanged=%s", kind, summary["patched"], summary["unchanged"])
+    if step.get("summaryVar"):
+        ctx.vars[step["summaryVar"]] = json.dumps(summary)
@@ -1,7 +1,6 @@
-import asyncio
-
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import run_pod_and_get_logs
+from pseudoflow.agent import run_on_node
+from pseudoflow.util import capture
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -10,11 +9,9 @@ async def handle(step: dict, ctx: FlowContext) -> None:
         raise ValueError("script.code required")
 
     tout = int(step.get("timeoutSeconds", 600))
+    output = capture.from_step(step)
 
-    loop = asyncio.get_event_loop()
-    out = await loop.run_in_executor(
-        None,
-        run_pod_and_get_logs,
+    out = await run_on_node(
         ctx.apis,
         ctx.namespace or ctx.operator_ns,
         code,
@@ -22,8 +19,7 @@ async def handle(step: dict, ctx: FlowContext) -> None:
         False,
         None,
         tout,
+        output,
     )
 
-    var = step.get("var")
-    if var:
-        ctx.vars[var] = out
+    capture.store(ctx.vars, step.get("var"), output, out)
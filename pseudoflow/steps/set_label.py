@@ -1,13 +1,17 @@
-import asyncio
+import json
+import logging
 
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import list_resources_by_selector, patch_labels
+from pseudoflow.kube import aio
+
+logger = logging.getLogger("pseudoflow.step.setLabel")
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
     target = step.get("target") or {}
     labels = step.get("labels", {}) or {}
     kind = target.get("kind")
+    api_version = target.get("apiVersion")
     ns = target.get("namespace", ctx.namespace)
 
     if not kind:
@@ -15,13 +19,18 @@ async def handle(step: dict, ctx: FlowContext) -> None:
 
     selector = target.get("selector")
     if selector:
-        names = list_resources_by_selector(ctx.apis, kind, ns, selector)
+        current = await aio.get_resource_labels(ctx.apis, kind, ns, api_version, selector=selector)
+        names = list(current)
     else:
         name = target.get("name")
         if not name:
             raise ValueError("setLabel requires target.name or target.selector")
         names = [name]
+        current = await aio.get_resource_labels(ctx.apis, kind, ns, api_version, names=names)
 
-    loop = asyncio.get_event_loop()
-    for name in names:
-        await loop.run_in_executor(None, patch_labels, ctx.apis, kind, ns, name, labels, [])
+    summary = await aio.patch_labels_bulk(
+        ctx.apis, kind, ns, {n: (labels, []) for n in names}, current, api_version, step.get("maxConcurrency"),
+    )
+    logger.info("[setLabel] %s: patched=%s unchanged=%s", kind, summary["patched"], summary["unchanged"])
+    if step.get("summaryVar"):
+        ctx.vars[step["summaryVar"]] = json.dumps(summary)
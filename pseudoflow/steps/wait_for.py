@@ -1,6 +1,9 @@
 import asyncio
+import time
+
 from pseudoflow.engine.context import FlowContext
-from pseudoflow.kube import wait_for_resource_condition
+from pseudoflow.kube import aio
+from pseudoflow.util import metrics
 
 
 async def handle(step: dict, ctx: FlowContext) -> None:
@@ -11,18 +14,29 @@ async def handle(step: dict, ctx: FlowContext) -> None:
     jp = step.get("jsonPath")
     op = step.get("op")
     val = step.get("value")
+    mode = step.get("mode", "watch")  # watch|poll
 
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(
-        None,
-        wait_for_resource_condition,
-        ctx.apis,
-        res,
-        cond,
-        tout,
-        interval,
-        ctx.namespace,
-        jp,
-        op,
-        val,
-    )
+    started = time.monotonic()
+    result = "error"
+    try:
+        await aio.wait_for_resource_condition(
+            ctx.apis,
+            res,
+            cond,
+            tout,
+            interval,
+            ctx.namespace,
+            jp,
+            op,
+            val,
+            mode,
+        )
+        result = "met"
+    except TimeoutError:
+        result = "timeout"
+        raise
+    except asyncio.CancelledError:
+        result = "cancelled"
+        raise
+    finally:
+        metrics.WAIT_DURATION.observe(time.monotonic() - started, kind=res.get("kind", ""), result=result)
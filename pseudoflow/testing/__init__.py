@@ -0,0 +1,3 @@
+from .fake_api import FakeKubeApi
+
+__all__ = ["FakeKubeApi"]
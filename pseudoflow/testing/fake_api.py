@@ -0,0 +1,860 @@
+"""
+In-process fake Kubernetes API server для тестов и бенчмарков без кластера.
+
+Поднимает aiohttp-сервер в отдельном потоке (со своим event loop) и отвечает на те
+эндпоинты, которыми пользуется оператор: discovery (/api, /apis, /apis/<g>/<v>),
+CRUD любых ресурсов core/apps/rbac/CRD (create/get/list/update/patch/delete,
+labelSelector, fieldSelector metadata.name), watch с resourceVersion, server-side apply
+и managedFields (Apply/Update, переход полей между менеджерами, записи /status отдельно),
+поды с переходами фаз Pending → Running → Succeeded/Failed и логами (follow=true),
+Deployment/StatefulSet/DaemonSet, становящиеся готовыми через pod_start_seconds после
+изменения spec. pods/exec (websocket, пул раннеров) не реализован.
+
+    with FakeKubeApi(latency=0.002) as api:
+        api.add_nodes(500, {"role": "worker"})
+        apis = api.apis()
+        await FlowEngine(apis, "default").run_flow(...)
+        print(api.calls_total)
+"""
+import asyncio
+import copy
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+from urllib.parse import unquote
+
+import yaml
+from aiohttp import web
+from kubernetes import client
+
+from pseudoflow.kube.aio import AsyncKubeClient
+from pseudoflow.kube.client import InstrumentedApiClient, request_labels
+from pseudoflow.kube.selectors import match_labels, parse_label_selector
+
+logger = logging.getLogger("pseudoflow.testing.fake_api")
+
+# Сколько последних событий хранить для watch с resourceVersion; старее — 410 Gone
+HISTORY_SIZE = 20000
+
+# (apiVersion, plural) -> (kind, namespaced)
+BUILTIN_RESOURCES: Dict[Tuple[str, str], Tuple[str, bool]] = {
+    ("v1", "namespaces"): ("Namespace", False),
+    ("v1", "nodes"): ("Node", False),
+    ("v1", "pods"): ("Pod", True),
+    ("v1", "services"): ("Service", True),
+    ("v1", "configmaps"): ("ConfigMap", True),
+    ("v1", "secrets"): ("Secret", True),
+    ("v1", "serviceaccounts"): ("ServiceAccount", True),
+    ("v1", "events"): ("Event", True),
+    ("v1", "persistentvolumeclaims"): ("PersistentVolumeClaim", True),
+    ("apps/v1", "deployments"): ("Deployment", True),
+    ("apps/v1", "daemonsets"): ("DaemonSet", True),
+    ("apps/v1", "statefulsets"): ("StatefulSet", True),
+    ("apps/v1", "replicasets"): ("ReplicaSet", True),
+    ("batch/v1", "jobs"): ("Job", True),
+    ("rbac.authorization.k8s.io/v1", "roles"): ("Role", True),
+    ("rbac.authorization.k8s.io/v1", "rolebindings"): ("RoleBinding", True),
+    ("rbac.authorization.k8s.io/v1", "clusterroles"): ("ClusterRole", False),
+    ("rbac.authorization.k8s.io/v1", "clusterrolebindings"): ("ClusterRoleBinding", False),
+    ("apiextensions.k8s.io/v1", "customresourcedefinitions"): ("CustomResourceDefinition", False),
+    ("ops.example.com/v1alpha1", "pseudoflows"): ("PseudoFlow", True),
+}
+
+Latency = Union[float, Callable[[str, str], float]]
+# pod -> (логи, код выхода)
+PodOutput = Callable[[Dict[str, Any]], Tuple[str, int]]
+
+Key = Tuple[str, str, str, str]  # apiVersion, plural, namespace ("" для кластерных), name
+
+
+class _Watcher:
+    __slots__ = ("api_version", "plural", "namespace", "name", "labels", "queue", "loop")
+
+    def __init__(self, api_version, plural, namespace, name, labels, queue, loop):
+        self.api_version = api_version
+        self.plural = plural
+        self.namespace = namespace
+        self.name = name
+        self.labels = labels
+        self.queue = queue
+        self.loop = loop
+
+    def matches(self, key: Key, obj: Dict[str, Any]) -> bool:
+        gv, plural, ns, name = key
+        if gv != self.api_version or plural != self.plural:
+            return False
+        if self.namespace is not None and ns != self.namespace:
+            return False
+        if self.name is not None and name != self.name:
+            return False
+        return match_labels(self.labels, (obj.get("metadata") or {}).get("labels"))
+
+
+def _manager(request: web.Request) -> str:
+    """fieldManager запроса; без него apiserver берёт имя клиента из User-Agent."""
+    agent = request.headers.get("User-Agent", "")
+    return request.query.get("fieldManager") or agent.split("/")[0] or "unknown"
+
+
+def _status(code: int, reason: str, message: str) -> web.Response:
+    body = {"kind": "Status", "apiVersion": "v1", "metadata": {}, "status": "Failure",
+            "message": message, "reason": reason, "code": code}
+    return web.json_response(body, status=code)
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7386 JSON merge patch (strategic merge patch упрощён до него же: списки заменяются)."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    out = dict(target) if isinstance(target, dict) else {}
+    for k, v in patch.items():
+        if v is None:
+            out.pop(k, None)
+        else:
+            out[k] = merge_patch(out.get(k), v)
+    return out
+
+
+def _json_patch(target: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(target)
+    for op in ops:
+        parts = [p.replace("~1", "/").replace("~0", "~") for p in op["path"].split("/")[1:]]
+        parent = doc
+        for p in parts[:-1]:
+            parent = parent[int(p)] if isinstance(parent, list) else parent.setdefault(p, {})
+        last = parts[-1]
+        if op["op"] in ("add", "replace"):
+            if isinstance(parent, list):
+                if last == "-":
+                    parent.append(op["value"])
+                elif op["op"] == "add":
+                    parent.insert(int(last), op["value"])
+                else:
+                    parent[int(last)] = op["value"]
+            else:
+                parent[last] = op["value"]
+        elif op["op"] == "remove":
+            if isinstance(parent, list):
+                del parent[int(last)]
+            else:
+                parent.pop(last, None)
+        else:
+            raise ValueError(f"unsupported json patch op '{op['op']}'")
+    return doc
+
+
+# --- managedFields (fieldsV1): вложенные map — по ключам, списки и скаляры — листьями ---
+
+
+def _fields(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        return {}
+    return {f"f:{k}": _fields(v) for k, v in value.items() if v is not None}
+
+
+def _view(obj: Optional[Dict[str, Any]], subresource: Optional[str]) -> Dict[str, Any]:
+    """Поля, за которыми следит managedFields: status для /status, иначе всё, кроме status и служебной metadata."""
+    obj = obj or {}
+    if subresource == "status":
+        return {"status": obj["status"]} if obj.get("status") is not None else {}
+    out = {k: v for k, v in obj.items() if k not in ("apiVersion", "kind", "metadata", "status")}
+    meta = {k: v for k, v in (obj.get("metadata") or {}).items() if k in ("labels", "annotations") and v}
+    if meta:
+        out["metadata"] = meta
+    return out
+
+
+def _changed(old: Any, new: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for k, v in new.items():
+        prev = old.get(k) if isinstance(old, dict) else None
+        if isinstance(prev, dict) and isinstance(v, dict):
+            sub = _changed(prev, v)
+            if sub:
+                out[f"f:{k}"] = sub
+        elif prev != v and v is not None:
+            out[f"f:{k}"] = _fields(v)
+    return out
+
+
+def _subtract(fields: Dict[str, Any], taken: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for k, sub in fields.items():
+        if k not in taken:
+            out[k] = sub
+        elif sub and taken[k]:
+            rest = _subtract(sub, taken[k])
+            if rest:
+                out[k] = rest
+    return out
+
+
+def _prune(fields: Dict[str, Any], value: Any) -> Dict[str, Any]:
+    """Убирает из fieldsV1 поля, которых больше нет в объекте."""
+    out = {}
+    for k, sub in fields.items():
+        name = k[2:]
+        if not isinstance(value, dict) or value.get(name) is None:
+            continue
+        if not sub:
+            out[k] = sub
+            continue
+        rest = _prune(sub, value[name])
+        if rest:
+            out[k] = rest
+    return out
+
+
+def _merge_fields(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(a)
+    for k, v in b.items():
+        out[k] = (_merge_fields(out[k], v) if out[k] and v else {}) if k in out else v
+    return out
+
+
+class FakeKubeApi:
+    """
+    latency — задержка на каждый запрос в секундах или функция (verb, resource) -> секунды.
+    pod_start_seconds / pod_run_seconds — сколько под проводит в Pending / Running.
+    pod_output(pod) -> (логи, код выхода) — результат «исполнения» пода.
+    """
+
+    def __init__(
+            self,
+            latency: Latency = 0.0,
+            pod_start_seconds: float = 0.05,
+            pod_run_seconds: float = 0.05,
+            pod_output: Optional[PodOutput] = None,
+    ):
+        self.latency = latency
+        self.pod_start_seconds = pod_start_seconds
+        self.pod_run_seconds = pod_run_seconds
+        self.pod_output: PodOutput = pod_output or (lambda pod: ("", 0))
+        self.resources: Dict[Tuple[str, str], Tuple[str, bool]] = dict(BUILTIN_RESOURCES)
+        # custom resources: есть ли subresource status (как в CRD; без него generation растёт и от status)
+        self.custom_resources: Dict[Tuple[str, str], bool] = {("ops.example.com/v1alpha1", "pseudoflows"): True}
+        self.objects: Dict[Key, Dict[str, Any]] = {}
+        self.logs: Dict[Key, str] = {}
+        self.calls: Counter = Counter()
+        self._rv = itertools.count(1)
+        self._last_rv = 0
+        self._history: Deque[Tuple[int, str, Key, Dict[str, Any]]] = deque(maxlen=HISTORY_SIZE)
+        self._watchers: List[_Watcher] = []
+        # фоновые переходы подов и rollout; отменяются при остановке
+        self._tasks: set = set()
+        self._lock = threading.RLock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._stopping = False
+        # обрабатываемые запросы (задачи цикла сервера): при остановке отменяются
+        self._requests: set = set()
+        self.url = ""
+
+    # --- жизненный цикл ---
+
+    def start(self) -> "FakeKubeApi":
+        self._thread = threading.Thread(target=self._serve, name="fake-kube-api", daemon=True)
+        self._thread.start()
+        if not self._started.wait(10):
+            raise RuntimeError("fake API server did not start")
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop = None
+
+    async def _shutdown(self) -> None:
+        # открытые watch (informer и т.п.) и запросы, ещё читающие тело, иначе держат
+        # cleanup до своего таймаута; пришедшие во время остановки получают 503
+        with self._lock:
+            self._stopping = True
+            for w in self._watchers:
+                w.queue.put_nowait(None)
+        for task in list(self._tasks) + list(self._requests):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._requests, return_exceptions=True)
+        await self._runner.cleanup()
+
+    def __enter__(self) -> "FakeKubeApi":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _serve(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        # отмена обработчика при обрыве соединения: watch не висят до своего таймаута
+        # lingering_time=0: недочитанное тело отменённого при остановке запроса не дочитывается
+        self._runner = web.AppRunner(app, handler_cancellation=True, access_log=None, lingering_time=0)
+        loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        self._loop = loop
+        self._started.set()
+        loop.run_forever()
+        loop.close()
+
+    # --- клиенты ---
+
+    def apis(self, async_client: bool = False, pool_size: int = 64) -> Dict[str, Any]:
+        """Набор клиентов в формате get_k8s_api_clients, направленный на этот сервер."""
+        configuration = client.Configuration()
+        configuration.host = self.url
+        configuration.connection_pool_maxsize = pool_size
+        # как у get_k8s_api_clients: вызовы попадают в метрики и спаны
+        api_client = InstrumentedApiClient(configuration)
+        apis: Dict[str, Any] = {
+            "core": client.CoreV1Api(api_client),
+            "apps": client.AppsV1Api(api_client),
+            "rbac": client.RbacAuthorizationV1Api(api_client),
+            "custom": client.CustomObjectsApi(api_client),
+            "dyn": api_client,
+            # отдельные кэши discovery и informer на каждый сервер
+            "cluster": self.url,
+        }
+        if async_client:
+            apis["aio"] = AsyncKubeClient(self.url, pool_size=pool_size)
+        return apis
+
+    # --- наполнение и проверка состояния (из любого потока) ---
+
+    @property
+    def calls_total(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+    def create(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        api_version = obj["apiVersion"]
+        plural = self._plural(api_version, obj["kind"])
+        _, namespaced = self.resources[(api_version, plural)]
+        ns = (obj.get("metadata") or {}).get("namespace", "default") if namespaced else ""
+        return self._create(api_version, plural, ns, copy.deepcopy(obj))
+
+    def get(self, api_version: str, kind: str, name: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        plural = self._plural(api_version, kind)
+        _, namespaced = self.resources[(api_version, plural)]
+        with self._lock:
+            obj = self.objects.get((api_version, plural, (namespace or "default") if namespaced else "", name))
+            return copy.deepcopy(obj) if obj is not None else None
+
+    def list(self, api_version: str, kind: str, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        plural = self._plural(api_version, kind)
+        with self._lock:
+            return [copy.deepcopy(o) for (gv, p, ns, _), o in self.objects.items()
+                    if gv == api_version and p == plural and (namespace is None or ns == namespace)]
+
+    def add_nodes(self, count: int, labels: Optional[Dict[str, str]] = None, prefix: str = "node") -> List[str]:
+        names = []
+        for i in range(count):
+            name = f"{prefix}-{i}"
+            self.create({
+                "apiVersion": "v1", "kind": "Node",
+                "metadata": {"name": name, "labels": {"kubernetes.io/hostname": name, **(labels or {})}},
+                "status": {"conditions": [{"type": "Ready", "status": "True"}]},
+            })
+            names.append(name)
+        return names
+
+    def _plural(self, api_version: str, kind: str) -> str:
+        for (gv, plural), (k, _) in self.resources.items():
+            if gv == api_version and k == kind:
+                return plural
+        raise KeyError(f"unknown kind {api_version}/{kind}")
+
+    # --- хранилище ---
+
+    def _emit(self, etype: str, key: Key, obj: Dict[str, Any]) -> None:
+        event = {"type": etype, "object": obj}
+        rv = int(obj["metadata"]["resourceVersion"])
+        self._history.append((rv, etype, key, obj))
+        for w in self._watchers:
+            if w.matches(key, obj):
+                w.loop.call_soon_threadsafe(w.queue.put_nowait, event)
+
+    def _stamp(self, obj: Dict[str, Any]) -> None:
+        rv = next(self._rv)
+        self._last_rv = rv
+        obj["metadata"]["resourceVersion"] = str(rv)
+
+    def _create(
+            self, api_version: str, plural: str, ns: str, obj: Dict[str, Any],
+            manager: str = "fake-kube-api", applied: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        kind, namespaced = self.resources[(api_version, plural)]
+        meta = obj.setdefault("metadata", {})
+        if not meta.get("name") and meta.get("generateName"):
+            meta["name"] = meta["generateName"] + uuid.uuid4().hex[:5]
+        name = meta.get("name")
+        if not name:
+            raise web.HTTPBadRequest(text="metadata.name is required")
+        key = (api_version, plural, ns, name)
+        with self._lock:
+            if key in self.objects:
+                raise _Conflict(f'{plural} "{name}" already exists')
+            obj["apiVersion"] = api_version
+            obj["kind"] = kind
+            if namespaced:
+                meta["namespace"] = ns
+            meta.setdefault("uid", str(uuid.uuid4()))
+            meta.setdefault("creationTimestamp", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+            meta["generation"] = 1
+            self._manage(obj, None, manager, None, applied)
+            if plural == "pods":
+                obj.setdefault("status", {})["phase"] = "Pending"
+            self._stamp(obj)
+            self.objects[key] = obj
+            self._emit("ADDED", key, copy.deepcopy(obj))
+            if plural == "customresourcedefinitions":
+                self._register_crd(obj)
+            out = copy.deepcopy(obj)
+        if plural == "pods" and self._loop is not None:
+            self._spawn(lambda: self._run_pod(key))
+        self._schedule_rollout(key, 1)
+        return out
+
+    def _update(
+            self, key: Key, obj: Dict[str, Any], subresource: Optional[str] = None,
+            manager: str = "fake-kube-api", applied: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        subresource="status" — запись через /status: меняется только status, generation не растёт.
+        applied — тело server-side apply (операция Apply в managedFields), иначе Update.
+        """
+        with self._lock:
+            old = self.objects[key]
+            status_sub = self.custom_resources.get(key[:2])
+            if subresource == "status":
+                obj = dict(copy.deepcopy(old), status=obj.get("status"))
+            elif status_sub:
+                # основной endpoint ресурса с /status не меняет status
+                obj.pop("status", None)
+                if "status" in old:
+                    obj["status"] = copy.deepcopy(old["status"])
+            meta = obj.setdefault("metadata", {})
+            for field in ("uid", "creationTimestamp", "namespace", "name"):
+                if field in old["metadata"]:
+                    meta[field] = old["metadata"][field]
+            obj["apiVersion"], obj["kind"] = old["apiVersion"], old["kind"]
+            generation = old["metadata"].get("generation", 1)
+            if subresource == "status":
+                pass
+            elif status_sub is False:
+                # CRD без subresource status: generation растёт от любого изменения вне metadata
+                if {k: v for k, v in obj.items() if k != "metadata"} != {k: v for k, v in old.items() if k != "metadata"}:
+                    generation += 1
+            elif obj.get("spec") != old.get("spec"):
+                generation += 1
+            meta["generation"] = generation
+            self._manage(obj, old, manager, subresource, applied)
+            self._stamp(obj)
+            self.objects[key] = obj
+            self._emit("MODIFIED", key, copy.deepcopy(obj))
+            if key[1] == "customresourcedefinitions":
+                self._register_crd(obj)
+            if generation != old["metadata"].get("generation", 1):
+                self._schedule_rollout(key, generation)
+            return copy.deepcopy(obj)
+
+    def _manage(
+            self, obj: Dict[str, Any], old: Optional[Dict[str, Any]], manager: str,
+            subresource: Optional[str], applied: Optional[Dict[str, Any]],
+    ) -> None:
+        """
+        managedFields как у apiserver: Apply заменяет набор полей менеджера, Update добавляет
+        изменённые поля; поля, взятые одним менеджером, уходят из наборов остальных.
+        Записи /status ведутся отдельно (subresource) и основные наборы не трогают.
+        """
+        view = _view(obj, subresource)
+        if applied is not None:
+            operation, owned = "Apply", _fields(_view(applied, subresource))
+        else:
+            operation, owned = "Update", _changed(_view(old, subresource), view)
+        entries = []
+        mine = None
+        for entry in ((old or {}).get("metadata") or {}).get("managedFields") or []:
+            if entry.get("subresource") != subresource:
+                entries.append(entry)
+            elif entry.get("manager") == manager and entry.get("operation") == operation:
+                mine = entry
+            else:
+                rest = _prune(_subtract(entry.get("fieldsV1") or {}, owned), view)
+                if rest:
+                    entries.append(dict(entry, fieldsV1=rest))
+        if mine is not None and operation == "Update":
+            owned = _merge_fields(_prune(mine.get("fieldsV1") or {}, view), owned)
+        if owned:
+            entry = {
+                "manager": manager,
+                "operation": operation,
+                "apiVersion": obj.get("apiVersion"),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "fieldsType": "FieldsV1",
+                "fieldsV1": owned,
+            }
+            if subresource:
+                entry["subresource"] = subresource
+            entries.append(entry)
+        # записи не меняются на месте: новые наборы — новые dict, остальные можно делить со старым объектом
+        obj["metadata"]["managedFields"] = entries
+
+    def _delete(self, key: Key) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            obj = self.objects.pop(key, None)
+            if obj is None:
+                return None
+            self.logs.pop(key, None)
+            obj = copy.deepcopy(obj)
+            self._stamp(obj)
+            self._emit("DELETED", key, obj)
+            return obj
+
+    def _register_crd(self, crd: Dict[str, Any]) -> None:
+        spec = crd.get("spec") or {}
+        names = spec.get("names") or {}
+        for v in spec.get("versions") or []:
+            if v.get("served", True):
+                gv = f"{spec.get('group')}/{v['name']}"
+                self.resources[(gv, names.get("plural"))] = (names.get("kind"), spec.get("scope") == "Namespaced")
+                self.custom_resources[(gv, names.get("plural"))] = (v.get("subresources") or {}).get("status") is not None
+
+    def _schedule_rollout(self, key: Key, generation: int) -> None:
+        if key[0] == "apps/v1" and key[1] in _WORKLOADS and self._loop is not None:
+            self._spawn(lambda: self._rollout(key, generation))
+
+    def _spawn(self, make_coro) -> None:
+        def start():
+            task = self._loop.create_task(make_coro())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        self._loop.call_soon_threadsafe(start)
+
+    async def _rollout(self, key: Key, generation: int) -> None:
+        # «контроллер»: через pod_start_seconds все реплики готовы, если spec с тех пор не менялся
+        await asyncio.sleep(self.pod_start_seconds)
+        with self._lock:
+            obj = copy.deepcopy(self.objects.get(key))
+            if obj is None or obj["metadata"].get("generation") != generation:
+                return
+            replicas = (obj.get("spec") or {}).get("replicas", 1)
+            if key[1] == "daemonsets":
+                replicas = max(1, sum(1 for k in self.objects if k[1] == "nodes"))
+                obj["status"] = {"desiredNumberScheduled": replicas, "numberReady": replicas,
+                                 "updatedNumberScheduled": replicas, "numberAvailable": replicas}
+            else:
+                obj["status"] = {"replicas": replicas, "readyReplicas": replicas, "availableReplicas": replicas,
+                                 "updatedReplicas": replicas}
+                if key[1] == "deployments":
+                    obj["status"]["conditions"] = [{"type": "Available", "status": "True"}]
+            obj["status"]["observedGeneration"] = generation
+            self._update(key, obj, "status", manager="kube-controller-manager")
+
+    async def _run_pod(self, key: Key) -> None:
+        await asyncio.sleep(self.pod_start_seconds)
+        with self._lock:
+            pod = copy.deepcopy(self.objects.get(key))
+        if pod is None:
+            return
+        pod["status"] = {"phase": "Running", "startTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        with self._lock:
+            if key not in self.objects:
+                return
+            self._update(key, pod, "status", manager="kubelet")
+        await asyncio.sleep(self.pod_run_seconds)
+        logs, code = self.pod_output(pod)
+        with self._lock:
+            pod = copy.deepcopy(self.objects.get(key))
+            if pod is None:
+                return
+            self.logs[key] = logs
+            pod["status"]["phase"] = "Succeeded" if code == 0 else "Failed"
+            pod["status"]["containerStatuses"] = [
+                {"name": "runner", "state": {"terminated": {"exitCode": code}}},
+            ]
+            self._update(key, pod, "status", manager="kubelet")
+
+    # --- HTTP ---
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        if self._stopping:
+            return _status(503, "ServiceUnavailable", "fake API server is stopping")
+        task = asyncio.current_task()
+        self._requests.add(task)
+        try:
+            return await self._serve_request(request)
+        finally:
+            self._requests.discard(task)
+
+    async def _serve_request(self, request: web.Request) -> web.StreamResponse:
+        verb, resource = request_labels(request.method, str(request.rel_url))
+        with self._lock:
+            self.calls[(verb, resource)] += 1
+        delay = self.latency(verb, resource) if callable(self.latency) else self.latency
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            return await self._route(request)
+        except _Conflict as e:
+            return _status(409, "AlreadyExists", str(e))
+        except KeyError as e:
+            return _status(404, "NotFound", f"{e.args[0] if e.args else 'not found'}")
+        except (ValueError, yaml.YAMLError) as e:
+            return _status(400, "BadRequest", str(e))
+
+    async def _route(self, request: web.Request) -> web.StreamResponse:
+        segments = [unquote(s) for s in request.path.split("/") if s]
+        if segments == ["api"]:
+            return web.json_response({"kind": "APIVersions", "versions": ["v1"]})
+        if segments == ["apis"]:
+            return web.json_response(self._group_list())
+        if segments == ["version"]:
+            return web.json_response({"major": "1", "minor": "30", "gitVersion": "v1.30.0-fake"})
+        if segments[:1] == ["api"] and len(segments) >= 2:
+            api_version, rest = segments[1], segments[2:]
+        elif segments[:1] == ["apis"] and len(segments) >= 3:
+            api_version, rest = f"{segments[1]}/{segments[2]}", segments[3:]
+        else:
+            return _status(404, "NotFound", f"unknown path {request.path}")
+        if not rest:
+            return web.json_response(self._resource_list(api_version))
+
+        ns: Optional[str] = None
+        if rest[0] == "namespaces" and len(rest) >= 3 and (api_version, rest[2]) in self.resources:
+            ns, rest = rest[1], rest[2:]
+        plural = rest[0]
+        if (api_version, plural) not in self.resources:
+            return _status(404, "NotFound", f"the server could not find the requested resource ({plural})")
+        name = rest[1] if len(rest) > 1 else None
+        sub = rest[2] if len(rest) > 2 else None
+        _, namespaced = self.resources[(api_version, plural)]
+        scope = (ns or "") if namespaced else ""
+
+        if name is None:
+            if request.method == "GET":
+                if request.query.get("watch", "").lower() in ("true", "1"):
+                    return await self._watch(request, api_version, plural, ns if namespaced else None)
+                return web.json_response(self._list(request, api_version, plural, ns if namespaced else None))
+            if request.method == "POST":
+                body = await self._body(request)
+                return web.json_response(self._create(api_version, plural, scope, body, _manager(request)), status=201)
+            if request.method == "DELETE":
+                return web.json_response(self._delete_collection(request, api_version, plural, ns))
+            return _status(405, "MethodNotAllowed", request.method)
+
+        key = (api_version, plural, scope, name)
+        if sub == "log" and plural == "pods":
+            return await self._pod_log(request, key)
+        if sub is not None and sub != "status":
+            return _status(404, "NotFound", f"unknown subresource {plural}/{sub}")
+        if sub == "status" and self.custom_resources.get((api_version, plural)) is False:
+            return _status(404, "NotFound", f"the server could not find the requested resource ({plural}/status)")
+        if request.method == "GET":
+            with self._lock:
+                if key not in self.objects:
+                    raise KeyError(f'{plural} "{name}" not found')
+                return web.json_response(self.objects[key])
+        if request.method == "PUT":
+            body = await self._body(request)
+            with self._lock:
+                if key not in self.objects:
+                    raise KeyError(f'{plural} "{name}" not found')
+                return web.json_response(self._update(key, body, sub, _manager(request)))
+        if request.method == "PATCH":
+            return web.json_response(await self._patch(request, key, sub))
+        if sub is not None:
+            return _status(405, "MethodNotAllowed", request.method)
+        if request.method == "DELETE":
+            obj = self._delete(key)
+            if obj is None:
+                raise KeyError(f'{plural} "{name}" not found')
+            return web.json_response({"kind": "Status", "apiVersion": "v1", "status": "Success",
+                                      "details": {"name": name, "kind": plural}})
+        return _status(405, "MethodNotAllowed", request.method)
+
+    async def _body(self, request: web.Request) -> Any:
+        text = await request.text()
+        if not text:
+            return {}
+        try:
+            return json.loads(text)
+        except ValueError:
+            return yaml.safe_load(text)
+
+    async def _patch(self, request: web.Request, key: Key, sub: Optional[str] = None) -> Dict[str, Any]:
+        content_type = request.headers.get("Content-Type", "")
+        body = await self._body(request)
+        manager = _manager(request)
+        with self._lock:
+            current = self.objects.get(key)
+            if "apply-patch" in content_type:
+                # server-side apply: нет объекта — создать, есть — слить
+                if current is None:
+                    gv, plural, ns, name = key
+                    body.setdefault("metadata", {})["name"] = name
+                    return self._create(gv, plural, ns, copy.deepcopy(body), manager, body)
+                return self._update(key, merge_patch(copy.deepcopy(current), body), sub, manager, body)
+            if current is None:
+                raise KeyError(f'{key[1]} "{key[3]}" not found')
+            if "json-patch" in content_type:
+                return self._update(key, _json_patch(current, body), sub, manager)
+            return self._update(key, merge_patch(copy.deepcopy(current), body), sub, manager)
+
+    def _filter(self, request: web.Request, api_version: str, plural: str, ns: Optional[str]):
+        labels = parse_label_selector(request.query.get("labelSelector"))
+        name = None
+        for part in (request.query.get("fieldSelector") or "").split(","):
+            field, _, value = part.partition("=")
+            if field.strip() == "metadata.name":
+                name = value.strip().lstrip("=")
+            elif field.strip() == "metadata.namespace":
+                ns = value.strip().lstrip("=")
+        return labels, name, ns
+
+    def _list(self, request: web.Request, api_version: str, plural: str, ns: Optional[str]) -> Dict[str, Any]:
+        labels, name, ns = self._filter(request, api_version, plural, ns)
+        kind, _ = self.resources[(api_version, plural)]
+        with self._lock:
+            items = [
+                o for (gv, p, o_ns, o_name), o in self.objects.items()
+                if gv == api_version and p == plural
+                and (ns is None or o_ns == ns) and (name is None or o_name == name)
+                and match_labels(labels, (o.get("metadata") or {}).get("labels"))
+            ]
+            return {
+                "kind": f"{kind}List",
+                "apiVersion": api_version,
+                "metadata": {"resourceVersion": str(self._last_rv)},
+                "items": copy.deepcopy(items),
+            }
+
+    def _delete_collection(self, request: web.Request, api_version: str, plural: str, ns: Optional[str]):
+        lst = self._list(request, api_version, plural, ns)
+        _, namespaced = self.resources[(api_version, plural)]
+        for o in lst["items"]:
+            meta = o["metadata"]
+            self._delete((api_version, plural, meta.get("namespace", "") if namespaced else "", meta["name"]))
+        return lst
+
+    async def _watch(self, request: web.Request, api_version: str, plural: str, ns: Optional[str]) -> web.StreamResponse:
+        labels, name, ns = self._filter(request, api_version, plural, ns)
+        timeout = float(request.query.get("timeoutSeconds") or 1800)
+        since = request.query.get("resourceVersion")
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        watcher = _Watcher(api_version, plural, ns, name, labels, queue, loop)
+        with self._lock:
+            if since and since != "0":
+                oldest = self._history[0][0] if self._history else self._last_rv + 1
+                if int(since) < oldest - 1 and int(since) < self._last_rv:
+                    return _status(410, "Expired", f"too old resource version: {since}")
+                for rv, etype, key, obj in self._history:
+                    if rv > int(since) and watcher.matches(key, obj):
+                        queue.put_nowait({"type": etype, "object": obj})
+            else:
+                for key, obj in self.objects.items():
+                    if watcher.matches(key, obj):
+                        queue.put_nowait({"type": "ADDED", "object": copy.deepcopy(obj)})
+            self._watchers.append(watcher)
+            if self._stopping:
+                queue.put_nowait(None)
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await resp.prepare(request)
+        end = loop.time() + timeout
+        try:
+            while True:
+                remaining = end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    break
+                await resp.write(json.dumps(event).encode() + b"\n")
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            with self._lock:
+                self._watchers.remove(watcher)
+        return resp
+
+    async def _pod_log(self, request: web.Request, key: Key) -> web.StreamResponse:
+        follow = request.query.get("follow", "").lower() in ("true", "1")
+        while True:
+            with self._lock:
+                pod = self.objects.get(key)
+                if pod is None:
+                    raise KeyError(f'pods "{key[3]}" not found')
+                phase = (pod.get("status") or {}).get("phase")
+                logs = self.logs.get(key, "")
+            if not follow or phase in ("Succeeded", "Failed") or self._stopping:
+                break
+            await asyncio.sleep(0.01)
+        return web.Response(text=logs, content_type="text/plain")
+
+    def _group_list(self) -> Dict[str, Any]:
+        groups: Dict[str, List[str]] = {}
+        for gv, _ in self.resources:
+            if "/" in gv:
+                group, version = gv.split("/", 1)
+                groups.setdefault(group, [])
+                if version not in groups[group]:
+                    groups[group].append(version)
+        return {
+            "kind": "APIGroupList",
+            "apiVersion": "v1",
+            "groups": [
+                {
+                    "name": g,
+                    "versions": [{"groupVersion": f"{g}/{v}", "version": v} for v in versions],
+                    "preferredVersion": {"groupVersion": f"{g}/{versions[0]}", "version": versions[0]},
+                }
+                for g, versions in groups.items()
+            ],
+        }
+
+    def _resource_list(self, api_version: str) -> Dict[str, Any]:
+        resources = []
+        for (gv, plural), (kind, namespaced) in self.resources.items():
+            if gv != api_version:
+                continue
+            verbs = ["create", "delete", "deletecollection", "get", "list", "patch", "update", "watch"]
+            resources.append({"name": plural, "singularName": kind.lower(), "namespaced": namespaced,
+                              "kind": kind, "verbs": verbs})
+            if plural == "pods":
+                resources.append({"name": "pods/log", "namespaced": True, "kind": "Pod", "verbs": ["get"]})
+            if self.custom_resources.get((gv, plural)):
+                resources.append({"name": f"{plural}/status", "namespaced": namespaced, "kind": kind,
+                                  "verbs": ["get", "patch", "update"]})
+        if not resources:
+            raise KeyError(f"unknown group version {api_version}")
+        return {"kind": "APIResourceList", "apiVersion": "v1", "groupVersion": api_version, "resources": resources}
+
+
+_WORKLOADS = ("deployments", "statefulsets", "daemonsets")
+
+
+class _Conflict(Exception):
+    pass
@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger("pseudoflow.util.cancel")
+
+T = TypeVar("T")
+
+
+class OperationCancelled(RuntimeError):
+    pass
+
+
+class CancelToken:
+    """
+    Отмена для блокирующих помощников в потоках executor: отмена корутины
+    не останавливает поток, поэтому помощник проверяет токен между ожиданиями,
+    а on_cancel-колбэки прерывают уже идущие чтения (watch, логи, exec).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception as e:
+                logger.debug("cancel callback failed: %s", e)
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled(self.reason or "cancelled")
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep, прерываемый отменой."""
+        if self._event.wait(max(0.0, seconds)):
+            self.check()
+
+    def on_cancel(self, cb: Callable[[], None]) -> Callable[[], None]:
+        """Регистрирует колбэк (сразу вызывает, если уже отменено); возвращает функцию снятия."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return lambda: self._discard(cb)
+        cb()
+        return lambda: None
+
+    def _discard(self, cb: Callable[[], None]) -> None:
+        with self._lock:
+            if cb in self._callbacks:
+                self._callbacks.remove(cb)
+
+
+def check(cancel: Optional[CancelToken]) -> None:
+    if cancel is not None:
+        cancel.check()
+
+
+def sleep(cancel: Optional[CancelToken], seconds: float) -> None:
+    if cancel is not None:
+        cancel.sleep(seconds)
+    else:
+        time.sleep(max(0.0, seconds))
+
+
+def on_cancel(cancel: Optional[CancelToken], cb: Callable[[], None]) -> Callable[[], None]:
+    return cancel.on_cancel(cb) if cancel is not None else (lambda: None)
+
+
+def guard(cancel: Optional[CancelToken], iterable: Iterable[T]) -> Iterator[T]:
+    """
+    Итерация по потоку ответа, прерываемому отменой: ошибка чтения или обрыв
+    после on_cancel-колбэка превращаются в OperationCancelled.
+    """
+    if cancel is None:
+        yield from iterable
+        return
+    try:
+        for item in iterable:
+            cancel.check()
+            yield item
+    except OperationCancelled:
+        raise
+    except Exception:
+        cancel.check()
+        raise
+    cancel.check()
@@ -0,0 +1,241 @@
+"""
+Ограниченный захват вывода команд (exec, script, execNode и поды исполнения).
+
+Вывод читается потоком. По умолчанию он хранится целиком; с maxOutputBytes в памяти
+остаются только начало и конец (по половине лимита), середина отбрасывается с пометкой,
+а в переменную <var>_truncated пишется true. spillToFile пишет полный вывод
+во временный файл, путь к которому кладётся в переменную <var>_file.
+outputFormat: lines — JSON-список строк, json — JSON-документ или JSON lines
+(строки разбираются по мере поступления, результат — список значений).
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, MutableMapping, Optional, Tuple, Union
+
+logger = logging.getLogger("pseudoflow.util.capture")
+
+# Сколько байт вывода одной команды держать в памяти (maxOutputBytes шага переопределяет); 0 — без ограничения
+MAX_OUTPUT_BYTES = int(os.getenv("PSEUDOFLOW_MAX_OUTPUT_BYTES", "0"))
+# Каталог для spillToFile и сколько секунд хранить файлы вывода
+SPILL_DIR = os.getenv("PSEUDOFLOW_SPILL_DIR", tempfile.gettempdir())
+SPILL_TTL = float(os.getenv("PSEUDOFLOW_SPILL_TTL", "86400"))
+
+SPILL_PREFIX = "pseudoflow-output-"
+FORMATS = ("text", "lines", "json")
+
+
+class OutputCapture:
+    """
+    Приёмник потока вывода: write() по мере чтения, close() в конце, value() — значение переменной.
+    Память — не больше max_bytes на сырой вывод (и столько же на строки для lines/json).
+    """
+
+    def __init__(self, max_bytes: int = MAX_OUTPUT_BYTES, spill: bool = False, fmt: Optional[str] = None):
+        fmt = fmt or "text"
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown outputFormat '{fmt}' ({'|'.join(FORMATS)})")
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.total = 0
+        self.dropped = 0
+        self.path: Optional[str] = None
+        # код выхода команды, если бэкенд его знает; ненулевой код не ошибка шага (как у пода)
+        self.exit_code: Optional[int] = None
+        limited = max_bytes > 0
+        self._head_limit = max_bytes // 2 if limited else None
+        self._tail_limit = max_bytes - max_bytes // 2 if limited else None
+        self._head = bytearray()
+        self._tail = bytearray()
+        # строки для lines/json: начало, хвост (размер, значение), незаконченная строка
+        self._head_records: List[Any] = []
+        self._head_used = 0
+        self._tail_records: Deque[Tuple[int, Any]] = deque()
+        self._tail_used = 0
+        self._records_dropped = 0
+        self._head_full = False
+        self._partial = bytearray()
+        self._oversized = False
+        # json: все строки до сих пор разобрались как JSON lines
+        self._ndjson = True
+        self._file = None
+        self._closed = False
+        if spill:
+            _sweep_spill_dir()
+            fd, self.path = tempfile.mkstemp(prefix=SPILL_PREFIX, suffix=".log", dir=SPILL_DIR)
+            self._file = os.fdopen(fd, "wb")
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0
+
+    def write(self, data: Union[bytes, str]) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            return
+        self.total += len(data)
+        if self._file is not None:
+            self._file.write(data)
+        self._keep(data)
+        if self.fmt != "text":
+            self._split(data)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self.fmt != "text" and (self._partial or self._oversized):
+            self._record(bytes(self._partial))
+            self._partial = bytearray()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.truncated:
+            logger.warning("Command output truncated to maxOutputBytes=%s: kept %s of %s bytes%s", self.max_bytes,
+                           self.total - self.dropped, self.total,
+                           f", full output in {self.path}" if self.path else " (spillToFile keeps it all)")
+
+    def text(self) -> str:
+        """Сырой вывод (начало и конец, если он длиннее max_bytes)."""
+        head = self._head.decode("utf-8", errors="replace")
+        if not self.truncated:
+            return head + self._tail.decode("utf-8", errors="replace")
+        return (f"{head}\n... [{self.dropped} bytes truncated] ...\n"
+                f"{self._tail.decode('utf-8', errors='replace')}")
+
+    def value(self) -> str:
+        if self.fmt == "text":
+            return self.text()
+        tail = [item for _, item in self._tail_records]
+        if self.fmt == "lines":
+            marker = [f"... [{self._records_dropped} lines truncated] ..."] if self._records_dropped else []
+            return json.dumps(self._head_records + marker + tail)
+        records = self._head_records + tail
+        if self._ndjson and len(records) + self._records_dropped > 1:
+            return json.dumps(records)
+        if self._ndjson and records:
+            return json.dumps(records[0])
+        if self.truncated:
+            raise ValueError(f"output of {self.total} bytes exceeds maxOutputBytes={self.max_bytes}, "
+                             f"cannot parse it as a JSON document")
+        try:
+            return json.dumps(json.loads(self.text()))
+        except ValueError as e:
+            raise ValueError(f"output is not JSON: {e}") from None
+
+    # --- internals ---
+
+    def _keep(self, data: bytes) -> None:
+        if self._head_limit is None:
+            self._head += data
+            return
+        room = self._head_limit - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail += data
+            excess = len(self._tail) - self._tail_limit
+            if excess > 0:
+                del self._tail[:excess]
+                self.dropped += excess
+
+    def _split(self, data: bytes) -> None:
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            if self._oversized:
+                self._record(b"")
+            else:
+                self._partial += data[start:end]
+                self._record(bytes(self._partial))
+            self._partial = bytearray()
+            start = end + 1
+        if not self._oversized:
+            self._partial += data[start:]
+            if self.max_bytes > 0 and len(self._partial) > self.max_bytes:
+                # одна строка длиннее всего бюджета — не держим её в памяти
+                self._partial = bytearray()
+                self._oversized = True
+
+    def _record(self, line: bytes) -> None:
+        if self._oversized:
+            self._oversized = False
+            self._ndjson = False
+            self._records_dropped += 1
+            return
+        line = line.rstrip(b"\r")
+        if self.fmt == "json":
+            if not line.strip():
+                return
+            if not self._ndjson:
+                return
+            try:
+                item: Any = json.loads(line)
+            except ValueError:
+                # не JSON lines: значение разбирается целиком в value()
+                self._ndjson = False
+                return
+        else:
+            item = line.decode("utf-8", errors="replace")
+        size = len(line) + 1
+        if self._head_limit is None or (not self._head_full and self._head_used + size <= self._head_limit):
+            self._head_records.append(item)
+            self._head_used += size
+            return
+        self._head_full = True
+        self._tail_records.append((size, item))
+        self._tail_used += size
+        while self._tail_used > self._tail_limit and self._tail_records:
+            dropped, _ = self._tail_records.popleft()
+            self._tail_used -= dropped
+            self._records_dropped += 1
+
+
+def _sweep_spill_dir() -> None:
+    """Удаляет файлы вывода старше SPILL_TTL: переменные на них ссылаются только пока поток жив."""
+    cutoff = time.time() - SPILL_TTL
+    try:
+        entries = list(os.scandir(SPILL_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.name.startswith(SPILL_PREFIX):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def from_step(step: Dict[str, Any]) -> OutputCapture:
+    """OutputCapture по параметрам шага: maxOutputBytes, spillToFile, outputFormat."""
+    limit = step.get("maxOutputBytes")
+    return OutputCapture(
+        max_bytes=MAX_OUTPUT_BYTES if limit is None else int(limit),
+        spill=bool(step.get("spillToFile", False)),
+        fmt=step.get("outputFormat"),
+    )
+
+
+def store(vars_map: MutableMapping[str, Any], var: Optional[str], capture: OutputCapture, value: str) -> None:
+    """
+    Значение в var, путь к полному выводу (spillToFile) — в <var>_file, код выхода — в <var>_exit_code.
+    При заданном лимите <var>_truncated — true/false: обрезано ли значение.
+    """
+    if not var:
+        return
+    vars_map[var] = value
+    if capture.max_bytes > 0:
+        vars_map[f"{var}_truncated"] = "true" if capture.truncated else "false"
+    if capture.path:
+        vars_map[f"{var}_file"] = capture.path
+    if capture.exit_code is not None:
+        vars_map[f"{var}_exit_code"] = str(capture.exit_code)
@@ -0,0 +1,179 @@
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Tuple
+
+from jsonpath_ng import parse as jp_parse
+
+logger = logging.getLogger("pseudoflow.util.conditions")
+
+# Сколько скомпилированных выражений держать в LRU
+CACHE_SIZE = 512
+
+OPS = ("equals", "notEquals", "contains", "greaterThan", "lessThan")
+
+Predicate = Callable[[Any], bool]
+PathFn = Callable[[Any], List[Any]]
+
+# Простые пути ($.status.conditions[0].type, spec.items[*].name) обходятся без грамматики jsonpath_ng
+_SIMPLE_PATH_RE = re.compile(r"^\$?(?:\.?[A-Za-z_][A-Za-z0-9_\-]*|\[-?\d+\]|\[\*\])+$")
+_SEGMENT_RE = re.compile(r"\.?([A-Za-z_][A-Za-z0-9_\-]*)|\[(-?\d+)\]|\[(\*)\]")
+# Имя поля в snake_case (status.ready_replicas) — как в to_dict() моделей kubernetes-клиента
+_SNAKE_FIELD_RE = re.compile(r"(?<![^.$@])([a-z][a-z0-9]*(?:_[a-z0-9]+)+)")
+
+
+def _simple_path(expr: str) -> Optional[Tuple[Tuple[str, Any], ...]]:
+    s = expr.strip()
+    if s.startswith("$"):
+        s = s[1:]
+    if not s or not _SIMPLE_PATH_RE.match(s):
+        return None
+    segments = []
+    for m in _SEGMENT_RE.finditer(s):
+        name, index, _ = m.groups()
+        if name is not None:
+            segments.append(("field", name))
+        elif index is not None:
+            segments.append(("index", int(index)))
+        else:
+            segments.append(("all", None))
+    return tuple(segments)
+
+
+def _walk(segments: Tuple[Tuple[str, Any], ...], obj: Any) -> List[Any]:
+    current = [obj]
+    for kind, arg in segments:
+        nxt = []
+        for item in current:
+            if kind == "field":
+                if isinstance(item, dict) and arg in item:
+                    nxt.append(item[arg])
+            elif kind == "index":
+                if isinstance(item, list) and -len(item) <= arg < len(item):
+                    nxt.append(item[arg])
+            elif isinstance(item, list):
+                nxt.extend(item)
+        if not nxt:
+            return nxt
+        current = nxt
+    return current
+
+
+def camel_path(expr: str) -> str:
+    """status.ready_replicas -> status.readyReplicas (поля в snake_case переводятся в camelCase)."""
+    return _SNAKE_FIELD_RE.sub(lambda m: re.sub(r"_([a-z0-9])", lambda c: c.group(1).upper(), m.group(1)), expr)
+
+
+def _compile_path(expr: str) -> PathFn:
+    segments = _simple_path(expr)
+    if segments is not None:
+        return lambda obj: _walk(segments, obj)
+    parsed = jp_parse(expr)
+    return lambda obj: [m.value for m in parsed.find(obj)]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_path(expr: str) -> PathFn:
+    """
+    JSONPath → функция obj -> [значения]; obj — сырой JSON ответа API (camelCase).
+    Пути в snake_case (раньше условия вычислялись по to_dict() моделей клиента)
+    при отсутствии совпадений повторяются в camelCase, с предупреждением.
+    """
+    path = _compile_path(expr)
+    legacy = camel_path(expr)
+    if legacy == expr:
+        return path
+    fallback = _compile_path(legacy)
+    warned = [False]
+
+    def with_fallback(obj) -> List[Any]:
+        found = path(obj)
+        if found:
+            return found
+        found = fallback(obj)
+        if found and not warned[0]:
+            warned[0] = True
+            logger.warning("jsonPath '%s' is snake_case; API objects are camelCase, use '%s'", expr, legacy)
+        return found
+
+    return with_fallback
+
+
+def _number(x: Any) -> Optional[float]:
+    if isinstance(x, bool):
+        return None
+    if isinstance(x, (int, float)):
+        return float(x)
+    try:
+        f = float(x)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) else f
+
+
+def _text(x: Any) -> str:
+    # JSON true/false сравниваются как "true"/"false", а не "True"/"False"
+    if isinstance(x, bool):
+        return "true" if x else "false"
+    return str(x)
+
+
+def compile_comparator(op: str, value: Any) -> Predicate:
+    """Сравнение одного найденного значения с value; value приводится к строке/числу один раз."""
+    if op not in OPS:
+        raise ValueError(f"Unsupported op {op}")
+    text = _text(value)
+    lowered = text.lower()
+    number = _number(value)
+    boolean = isinstance(value, bool)
+
+    def equal(x) -> bool:
+        # true/True/"True" равны: API отдаёт bool, а status.conditions[*].status — строку "True"
+        if boolean or isinstance(x, bool):
+            return _text(x).lower() == lowered
+        if number is not None and isinstance(x, (int, float)):
+            return float(x) == number
+        return str(x) == text
+
+    if op == "equals":
+        return equal
+    if op == "notEquals":
+        return lambda x: not equal(x)
+    if op == "contains":
+        return lambda x: text in _text(x)
+
+    if number is None:
+        return lambda x: False
+
+    def ordered(x) -> bool:
+        n = _number(x)
+        if n is None:
+            return False
+        return n > number if op == "greaterThan" else n < number
+
+    return ordered
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile(json_path: Optional[str], op: str, value: Any, _vtype: type) -> Predicate:
+    # _vtype в ключе кэша: 1, 1.0 и True равны как ключи dict, но сравниваются по-разному
+    path = compile_path(json_path) if json_path else (lambda obj: [obj])
+    cmp = compile_comparator(op, value)
+
+    def predicate(obj) -> bool:
+        if obj is None:
+            return False
+        return any(cmp(m) for m in path(obj))
+
+    return predicate
+
+
+def compile_condition(json_path: Optional[str], op: str = "equals", value: Any = "") -> Predicate:
+    """
+    Предикат obj -> bool для if/when/waitFor: истина, если хоть одно значение по json_path
+    удовлетворяет op/value. Без json_path сравнивается сам объект. Кэшируется по тексту условия.
+    """
+    if isinstance(value, (dict, list)):
+        return _compile.__wrapped__(json_path, op, value, type(value))
+    return _compile(json_path, op, value, type(value))
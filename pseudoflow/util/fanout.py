@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Сколько нод обрабатывать одновременно в execNode/configFile/patchFile по умолчанию
+NODE_CONCURRENCY = int(os.getenv("PSEUDOFLOW_NODE_CONCURRENCY", "10"))
+
+
+class FanOutError(RuntimeError):
+    def __init__(self, results: Dict[str, Any], errors: Dict[str, str], total: int):
+        self.results = results
+        self.errors = errors
+        details = "; ".join(f"{k}: {v}" for k, v in errors.items())
+        super().__init__(f"{len(errors)}/{total} failed: {details}")
+
+
+def fan_out_options(step: Dict[str, Any]) -> Tuple[int, bool, Optional[int]]:
+    """
+    (maxConcurrency, failFast, tolerateFailures) из шага.
+    tolerateFailures: число допустимых ошибок, true — любое количество.
+    """
+    limit = max(1, int(step.get("maxConcurrency") or NODE_CONCURRENCY))
+    fail_fast = bool(step.get("failFast", True))
+    tolerate = step.get("tolerateFailures", 0)
+    if tolerate is True:
+        tolerate = None
+    elif tolerate is False:
+        tolerate = 0
+    else:
+        tolerate = int(tolerate)
+    return limit, fail_fast, tolerate
+
+
+async def fan_out(
+        keys: List[str],
+        fn: Callable[[str], Awaitable[Any]],
+        max_concurrency: int = NODE_CONCURRENCY,
+        fail_fast: bool = True,
+        tolerate: Optional[int] = 0,
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Выполняет fn(key) для всех keys, не более max_concurrency одновременно.
+    Возвращает (results, errors) в порядке keys. Если ошибок больше tolerate
+    (None — без ограничения): при fail_fast оставшиеся задачи отменяются сразу,
+    иначе — после завершения всех; в обоих случаях поднимается FanOutError.
+    """
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    aborted = asyncio.Event()
+
+    def exceeded() -> bool:
+        return tolerate is not None and len(errors) > tolerate
+
+    async def run_one(key: str) -> None:
+        async with sem:
+            if aborted.is_set():
+                return
+            try:
+                results[key] = await fn(key)
+            except Exception as e:
+                errors[key] = str(e) or type(e).__name__
+                if fail_fast and exceeded():
+                    aborted.set()
+
+    tasks = [asyncio.create_task(run_one(k)) for k in keys]
+    try:
+        if fail_fast:
+            pending = set(tasks)
+            while pending and not aborted.is_set():
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in pending:
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    except asyncio.CancelledError:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    ordered_results = {k: results[k] for k in keys if k in results}
+    ordered_errors = {k: errors[k] for k in keys if k in errors}
+    if exceeded():
+        raise FanOutError(ordered_results, ordered_errors, len(keys))
+    return ordered_results, ordered_errors
+
+
+async def fan_out_nodes(
+        step: Dict[str, Any],
+        vars: Dict[str, Any],
+        nodes: List[str],
+        fn: Callable[[str], Awaitable[Any]],
+) -> Dict[str, Any]:
+    """
+    fan_out по нодам с параметрами шага (maxConcurrency, failFast, tolerateFailures).
+    varPerNode = {node: output}, ошибки нод — в <varPerNode>_errors (в т.ч. при FanOutError).
+    """
+    limit, fail_fast, tolerate = fan_out_options(step)
+    var_name = step.get("varPerNode")
+
+    def store(results: Dict[str, Any], errors: Dict[str, str]) -> None:
+        if var_name:
+            vars[var_name] = json.dumps(results)
+            vars[f"{var_name}_errors"] = json.dumps(errors)
+
+    try:
+        results, errors = await fan_out(nodes, fn, limit, fail_fast, tolerate)
+    except FanOutError as e:
+        store(e.results, e.errors)
+        raise
+    store(results, errors)
+    return results
@@ -0,0 +1,216 @@
+import logging
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("pseudoflow.util.metrics")
+
+# Порт /metrics (Prometheus text format); 0 — не поднимать сервер
+METRICS_PORT = int(os.getenv("PSEUDOFLOW_METRICS_PORT", "9090"))
+METRICS_ADDR = os.getenv("PSEUDOFLOW_METRICS_ADDR", "0.0.0.0")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._labels(k)} {_number(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (счётчики по корзинам, сумма, количество)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    out.append(f"{self.name}_bucket{self._labels(key, ('le', _number(bound)))} {cumulative}")
+                out.append(f"{self.name}_bucket{self._labels(key, ('le', '+Inf'))} {count}")
+                out.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+                out.append(f"{self.name}_count{self._labels(key)} {count}")
+        return out
+
+
+_registry: Dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _registry_lock:
+        if metric.name in _registry:
+            raise ValueError(f"metric {metric.name} already registered")
+        _registry[metric.name] = metric
+    return metric
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+RUNS_TOTAL = _register(Counter(
+    "pseudoflow_runs_total", "Completed flow runs by result.", ("flow", "status")))
+STEP_DURATION = _register(Histogram(
+    "pseudoflow_step_duration_seconds", "Step duration; control steps include their nested steps.",
+    ("flow", "step_type")))
+ACTIVE_FLOWS = _register(Gauge(
+    "pseudoflow_active_flows", "Flows currently executing."))
+QUEUED_FLOWS = _register(Gauge(
+    "pseudoflow_queued_flows", "Flows waiting for a scheduler slot."))
+API_REQUEST_DURATION = _register(Histogram(
+    "pseudoflow_api_request_duration_seconds",
+    "Kubernetes API call latency (time to response headers for streams).", ("verb", "resource")))
+POD_START_DURATION = _register(Histogram(
+    "pseudoflow_runner_pod_start_seconds", "Execution pod creation to container start."))
+WAIT_DURATION = _register(Histogram(
+    "pseudoflow_wait_condition_seconds", "waitFor time until the condition was met or the step gave up.",
+    ("kind", "result")))
+EXECUTOR_QUEUED = _register(Gauge(
+    "pseudoflow_executor_queued", "Blocking calls waiting for an executor thread.", ("workload",)))
+EXECUTOR_WAIT = _register(Histogram(
+    "pseudoflow_executor_wait_seconds", "Time a blocking call waited for an executor thread.", ("workload",)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logger.debug("metrics: " + fmt, *args)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int = METRICS_PORT, addr: str = METRICS_ADDR) -> Optional[ThreadingHTTPServer]:
+    """Поднимает /metrics в фоновом потоке (один раз на процесс); port=0 — выключено."""
+    global _server
+    if port <= 0:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), _Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="pseudoflow-metrics", daemon=True).start()
+            logger.info("Serving metrics on http://%s:%s/metrics", addr, port)
+        return _server
+
+
+def stop_http_server() -> None:
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
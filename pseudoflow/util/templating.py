@@ -1,5 +1,5 @@
 import re
-from typing import Dict
+from typing import Dict, List, Optional, Tuple, Union
 
 _VAR_RE = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
 
@@ -10,3 +10,36 @@ def render_str(s: str, vars_map: Dict[str, str]) -> str:
         return str(vars_map.get(key, m.group(0)))
 
     return _VAR_RE.sub(repl, s)
+
+
+class Template:
+    """
+    Строка, заранее разбитая на литералы и имена переменных:
+    render() склеивает сегменты без повторного прохода регулярным выражением.
+    """
+
+    __slots__ = ("source", "segments")
+
+    def __init__(self, source: str):
+        self.source = source
+        segments: List[Tuple[str, Optional[str]]] = []
+        pos = 0
+        for m in _VAR_RE.finditer(source):
+            segments.append((source[pos:m.start()], m.group(1)))
+            pos = m.end()
+        if pos < len(source):
+            segments.append((source[pos:], None))
+        self.segments: Tuple[Tuple[str, Optional[str]], ...] = tuple(segments)
+
+    def render(self, vars_map: Dict[str, str]) -> str:
+        out = []
+        for literal, key in self.segments:
+            out.append(literal)
+            if key is not None:
+                out.append(str(vars_map[key]) if key in vars_map else "${" + key + "}")
+        return "".join(out)
+
+
+def compile_str(s: str) -> Union[str, Template]:
+    """Строка без ${...} остаётся как есть, иначе — Template."""
+    return Template(s) if "${" in s and _VAR_RE.search(s) else s
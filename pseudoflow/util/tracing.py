@@ -0,0 +1,313 @@
+"""
+Трассировка исполнения потока: спаны run_flow → шаг → итерация/ветка → обработчик →
+помощники pseudoflow.kube → вызовы API. Родитель берётся из contextvars, поэтому
+вложенность сохраняется в задачах asyncio и в потоках executor (см. executors.py).
+
+Законченные спаны пишутся по одному на строку в OTLP/JSON (ExportTraceServiceRequest),
+файл читается otel-collector (otlpjsonfile) или конвертируется в flame chart без коллектора:
+
+    python -m pseudoflow.util.tracing spans.jsonl [--trace-id ID] > run.json
+
+run.json (Chrome trace event format) открывается в ui.perfetto.dev, chrome://tracing или speedscope.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger("pseudoflow.util.tracing")
+
+# Куда писать спаны: пусто — трассировка выключена, "-" — stdout, иначе путь к JSON-lines файлу
+TRACE_FILE = os.getenv("PSEUDOFLOW_TRACE_FILE", "")
+SERVICE_NAME = os.getenv("PSEUDOFLOW_TRACE_SERVICE", "pseudoflow-operator")
+# Длина строковых атрибутов (отрендеренные цели шагов могут быть большими)
+MAX_ATTRIBUTE_LENGTH = 512
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent", "name", "start_ns", "end_ns", "attributes", "events",
+                 "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent = parent
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = {k: v for k, v in attributes.items() if v is not None}
+        self.events: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        for k, v in attributes.items():
+            if v is not None:
+                self.attributes[k] = v
+
+    def event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time": time.time_ns(), "attributes": attributes})
+
+    def to_otlp(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _attributes(self.attributes),
+            "events": [
+                {"timeUnixNano": str(e["time"]), "name": e["name"], "attributes": _attributes(e["attributes"])}
+                for e in self.events
+            ],
+            "status": {"code": 2, "message": self.error} if self.error is not None else {"code": 1},
+        }
+        if self.parent is not None:
+            out["parentSpanId"] = self.parent.span_id
+        return out
+
+
+def _value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    if not isinstance(v, str):
+        v = json.dumps(v, default=str, separators=(",", ":"))
+    return {"stringValue": v[:MAX_ATTRIBUTE_LENGTH]}
+
+
+def _attributes(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _value(v)} for k, v in attrs.items()]
+
+
+class _Exporter:
+    def __init__(self, target: str):
+        self.target = target
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: Span) -> None:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": "pseudoflow"}, "spans": [span.to_otlp()]}],
+            }],
+        }, separators=(",", ":"))
+        with self._lock:
+            try:
+                if self.target == "-":
+                    sys.stdout.write(line + "\n")
+                    sys.stdout.flush()
+                    return
+                if self._file is None:
+                    self._file = open(self.target, "a", encoding="utf-8")
+                self._file.write(line + "\n")
+                self._file.flush()
+            except OSError as e:
+                logger.warning("Failed to export span to %s: %s", self.target, e)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("pseudoflow_span", default=None)
+_exporter: Optional[_Exporter] = _Exporter(TRACE_FILE) if TRACE_FILE else None
+_counter_lock = threading.Lock()
+
+
+def configure(target: Optional[str]) -> None:
+    """Включает экспорт в target ("-" — stdout) или выключает трассировку (None/"")."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.close()
+    _exporter = _Exporter(target) if target else None
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Дочерний спан текущего; при выключенной трассировке — None без накладных расходов."""
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+    s = Span(name, _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = str(e) or type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        exporter.export(s)
+
+
+def record(name: str, start_ns: int, error: Optional[str] = None, count: Optional[str] = None, **attributes: Any) -> None:
+    """
+    Уже завершившийся дочерний спан (вызов API и т.п.), начавшийся в start_ns.
+    count — атрибут-счётчик, увеличиваемый у всех предков (например, k8s.api_calls).
+    """
+    exporter = _exporter
+    parent = _current.get()
+    if exporter is None or parent is None:
+        return
+    s = Span(name, parent, attributes)
+    s.start_ns = start_ns
+    s.end_ns = time.time_ns()
+    s.error = error
+    if count:
+        with _counter_lock:
+            p: Optional[Span] = parent
+            while p is not None:
+                p.attributes[count] = p.attributes.get(count, 0) + 1
+                p = p.parent
+    exporter.export(s)
+
+
+def add_event(name: str, **attributes: Any) -> None:
+    s = _current.get()
+    if s is not None:
+        s.event(name, **attributes)
+
+
+def set_attributes(**attributes: Any) -> None:
+    s = _current.get()
+    if s is not None:
+        s.set(**attributes)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Декоратор: вызов функции (обычной или корутины) — спан name."""
+
+    def decorate(fn: F) -> F:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _exporter is None:
+                    return await fn(*args, **kwargs)
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def _attr_value(v: Dict[str, Any]) -> Any:
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in v:
+            return v[key]
+    return int(v["intValue"]) if "intValue" in v else None
+
+
+def read_spans(lines) -> List[Dict[str, Any]]:
+    """Спаны из OTLP/JSON-lines в плоском виде: id, parent, name, start/end (нс), attributes, events."""
+    spans = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        for rs in json.loads(line).get("resourceSpans", []):
+            for ss in rs.get("scopeSpans", []):
+                for sp in ss.get("spans", []):
+                    spans.append({
+                        "trace": sp["traceId"],
+                        "id": sp["spanId"],
+                        "parent": sp.get("parentSpanId"),
+                        "name": sp["name"],
+                        "start": int(sp["startTimeUnixNano"]),
+                        "end": int(sp["endTimeUnixNano"]),
+                        "attributes": {a["key"]: _attr_value(a["value"]) for a in sp.get("attributes", [])},
+                        "events": [(int(e["timeUnixNano"]), e["name"]) for e in sp.get("events", [])],
+                        "error": (sp.get("status") or {}).get("message") if (sp.get("status") or {}).get("code") == 2 else None,
+                    })
+    return spans
+
+
+def to_chrome_trace(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Chrome trace event format: вложенные спаны — на дорожке родителя, перекрывающиеся
+    соседи (итерации с parallelism, ветки parallel, DAG) — на отдельных дорожках.
+    """
+    lane_of: Dict[str, int] = {}
+    # дорожка -> стек (конец, id) открытых на ней спанов
+    lanes: List[List[Any]] = []
+    events: List[Dict[str, Any]] = []
+    origin = min((s["start"] for s in spans), default=0)
+    for s in sorted(spans, key=lambda s: (s["start"], -s["end"])):
+        for stack in lanes:
+            while stack and stack[-1][0] <= s["start"]:
+                stack.pop()
+        lane = lane_of.get(s["parent"]) if s["parent"] else None
+        if lane is None or (lanes[lane] and lanes[lane][-1][1] != s["parent"]):
+            lane = next((i for i, stack in enumerate(lanes) if not stack), None)
+            if lane is None:
+                lanes.append([])
+                lane = len(lanes) - 1
+        lanes[lane].append((s["end"], s["id"]))
+        lane_of[s["id"]] = lane
+        args = dict(s["attributes"])
+        if s["error"]:
+            args["error"] = s["error"]
+        events.append({
+            "name": s["name"], "cat": s["name"].split(" ", 1)[0], "ph": "X", "pid": 1, "tid": lane,
+            "ts": (s["start"] - origin) / 1000, "dur": (s["end"] - s["start"]) / 1000, "args": args,
+        })
+        for ts, name in s["events"]:
+            events.append({"name": name, "ph": "i", "s": "t", "pid": 1, "tid": lane, "ts": (ts - origin) / 1000})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert PseudoFlow OTLP JSON-lines spans to a Chrome trace")
+    parser.add_argument("file", help="JSON-lines file written with PSEUDOFLOW_TRACE_FILE")
+    parser.add_argument("--trace-id", help="only this trace (default: the last one in the file)")
+    args = parser.parse_args(argv)
+
+    with open(args.file, encoding="utf-8") as f:
+        spans = read_spans(f)
+    if not spans:
+        raise SystemExit("no spans found")
+    trace_id = args.trace_id or spans[-1]["trace"]
+    json.dump(to_chrome_trace([s for s in spans if s["trace"] == trace_id]), sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from pseudoflow.kube.informer import stop_node_informers
+from pseudoflow.testing import FakeKubeApi
+
+
+@pytest.fixture
+def api():
+    with FakeKubeApi() as fake:
+        try:
+            yield fake
+        finally:
+            # informer смотрит на этот сервер: останавливается до него
+            stop_node_informers()
+
+
+@pytest.fixture(params=[False, True], ids=["executor", "aiohttp"])
+def apis(request, api):
+    """Оба режима клиента: вызовы через api executor и async-native (PSEUDOFLOW_ASYNC_CLIENT)."""
+    return api.apis(async_client=request.param)
+
+
+@pytest.fixture
+def run(apis):
+    """run(coro) в новом цикле; сессия aiohttp закрывается в том же цикле."""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                if "aio" in apis:
+                    await apis["aio"].close()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,152 @@
+import asyncio
+import shutil
+import ssl
+import subprocess
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from pseudoflow.agent.client import AgentClient, AgentCommandError
+from pseudoflow.agent.server import build_app, ssl_context
+from pseudoflow.util.capture import OutputCapture
+
+TOKEN = "s3cret"
+
+
+async def _serve(ssl_ctx=None):
+    runner = web.AppRunner(build_app(TOKEN))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=ssl_ctx)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+def _client(port, **kwargs):
+    client = AgentClient(None, port=port, token=kwargs.pop("token", TOKEN), **kwargs)
+    # адреса агентов обычно приходят из LIST подов DaemonSet
+    client._addresses = {"node-1": "127.0.0.1"}
+    client._listed_at = time.monotonic()
+    return client
+
+
+def _run(coro_fn, ssl_ctx=None):
+    async def main():
+        runner, port = await _serve(ssl_ctx)
+        try:
+            return await coro_fn(port)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+
+def test_build_app_requires_token():
+    with pytest.raises(ValueError):
+        build_app("")
+
+
+@pytest.mark.parametrize("auth", [None, "Bearer wrong", f"Basic {TOKEN}"])
+def test_exec_rejects_bad_token(auth, tmp_path):
+    marker = tmp_path / "ran"
+
+    async def check(port):
+        headers = {"Authorization": auth} if auth else {}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"http://127.0.0.1:{port}/v1/exec",
+                                    json={"command": f"touch {marker}"}, headers=headers) as resp:
+                return resp.status
+
+    assert _run(check) == 401
+    assert not marker.exists()
+
+
+def test_exec_streams_output_and_exit_code():
+    async def check(port):
+        client = _client(port, plaintext=True)
+        capture = OutputCapture()
+        try:
+            ok = await client.run("node-1", "echo hello; echo oops >&2", timeout=10)
+            failed = await client.run("node-1", "echo partial; exit 3", timeout=10, capture=capture)
+        finally:
+            await client.close()
+        return ok, failed, capture.exit_code
+
+    ok, failed, code = _run(check)
+    assert ok == "hello\noops\n"
+    # ненулевой код не ошибка: вывод возвращается, код — в capture
+    assert failed == "partial\n"
+    assert code == 3
+
+
+def test_exec_timeout_is_an_error():
+    async def check(port):
+        client = _client(port, plaintext=True)
+        try:
+            with pytest.raises(AgentCommandError, match="timed out"):
+                await client.run("node-1", "echo started; sleep 5", timeout=0.5)
+        finally:
+            await client.close()
+
+    _run(check)
+
+
+def test_client_refuses_plaintext_and_empty_token():
+    async def check(port):
+        for client in (_client(port), _client(port, token="", plaintext=True)):
+            with pytest.raises(RuntimeError, match="required"):
+                await client.run("node-1", "true", timeout=10)
+
+    _run(check)
+
+
+@pytest.fixture(scope="module")
+def certs(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    d = tmp_path_factory.mktemp("tls")
+
+    def sh(*args):
+        subprocess.run(["openssl", *args], cwd=d, check=True, capture_output=True)
+
+    (d / "agent.ext").write_text("subjectAltName=DNS:pseudoflow-agent\nextendedKeyUsage=serverAuth\n")
+    (d / "client.ext").write_text("extendedKeyUsage=clientAuth\n")
+    sh("req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=test-ca",
+       "-keyout", "ca.key", "-out", "ca.crt")
+    for name in ("agent", "client"):
+        sh("req", "-newkey", "rsa:2048", "-nodes", "-subj", f"/CN={name}", "-keyout", f"{name}.key", "-out", f"{name}.csr")
+        sh("x509", "-req", "-in", f"{name}.csr", "-CA", "ca.crt", "-CAkey", "ca.key", "-CAcreateserial",
+           "-days", "1", "-out", f"{name}.crt", "-extfile", f"{name}.ext")
+    return d
+
+
+def test_mtls(certs):
+    server_ctx = ssl_context(ssl.Purpose.CLIENT_AUTH, str(certs / "agent.crt"), str(certs / "agent.key"),
+                             str(certs / "ca.crt"))
+    client_ctx = ssl_context(ssl.Purpose.SERVER_AUTH, str(certs / "client.crt"), str(certs / "client.key"),
+                             str(certs / "ca.crt"))
+
+    async def check(port):
+        client = _client(port, ssl_ctx=client_ctx)
+        try:
+            assert await client.run("node-1", "echo over tls", timeout=10) == "over tls\n"
+        finally:
+            await client.close()
+
+        # без клиентского сертификата агент рвёт рукопожатие
+        anonymous = ssl.create_default_context(cafile=str(certs / "ca.crt"))
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(aiohttp.ClientError):
+                async with session.post(f"https://127.0.0.1:{port}/v1/exec", json={"command": "true"},
+                                        headers={"Authorization": f"Bearer {TOKEN}"},
+                                        ssl=anonymous, server_hostname="pseudoflow-agent") as resp:
+                    await resp.read()
+        # сертификат агента проверяется по имени из SAN, а не по IP ноды
+        client = _client(port, ssl_ctx=client_ctx, server_name="other-name")
+        try:
+            with pytest.raises(aiohttp.ClientError):
+                await client.run("node-1", "true", timeout=10)
+        finally:
+            await client.close()
+
+    _run(check, server_ctx)
@@ -0,0 +1,57 @@
+from pseudoflow.kube import aio
+from pseudoflow.util.capture import OutputCapture
+
+CONFIG_MAP = {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "settings"}, "data": {"mode": "fast"}}
+
+
+def test_apply_and_get_object(api, apis, run):
+    async def main():
+        await aio.apply_manifest_docs(apis, [CONFIG_MAP], "default")
+        return await aio.get_object(apis, "ConfigMap", "settings", "default")
+
+    obj = run(main())
+    assert obj["data"] == {"mode": "fast"}
+    assert api.get("v1", "ConfigMap", "settings", "default")["data"] == {"mode": "fast"}
+
+
+def test_get_object_missing(apis, run):
+    assert run(aio.get_object(apis, "ConfigMap", "absent", "default")) is None
+
+
+def test_apply_waves_create_namespace_first(api, apis, run):
+    docs = [
+        {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "c", "namespace": "team"}},
+        {"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": "team"}},
+    ]
+    run(aio.apply_manifest_docs(apis, docs, "default"))
+    assert api.get("v1", "Namespace", "team") is not None
+    assert api.get("v1", "ConfigMap", "c", "team") is not None
+
+
+def test_select_nodes_and_labels(api, apis, run):
+    workers = api.add_nodes(3, {"role": "worker"})
+    api.add_nodes(2, {"role": "infra"}, prefix="infra")
+
+    async def main():
+        selected = await aio.select_nodes(apis, {"role": "worker"})
+        labels = await aio.get_resource_labels(apis, "Node", None, names=workers[:2])
+        await aio.patch_labels(apis, "Node", None, workers[0], {"zone": "a"}, ["role"])
+        return selected, labels
+
+    selected, labels = run(main())
+    assert sorted(selected) == workers
+    assert sorted(labels) == workers[:2]
+    assert labels[workers[1]]["role"] == "worker"
+    patched = api.get("v1", "Node", workers[0])["metadata"]["labels"]
+    assert patched["zone"] == "a"
+    assert "role" not in patched
+
+
+def test_pod_output_and_exit_code(api, apis, run):
+    api.pod_output = lambda pod: ("done\n", 3)
+    out = OutputCapture()
+    logs = run(aio.run_pod_and_get_logs(apis, "default", "exit 3", timeout=30, capture=out))
+    # ненулевой код не ошибка: вывод возвращается, код — в capture
+    assert logs == "done\n"
+    assert out.exit_code == 3
+    assert api.list("v1", "Pod", "default") == []
@@ -0,0 +1,77 @@
+import time
+
+from pseudoflow.kube import aio, rest
+
+DOCS = [{"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "c"}, "data": {"a": "1"}}]
+DEPLOYMENT = {
+    "apiVersion": "apps/v1", "kind": "Deployment",
+    "metadata": {"name": "web", "labels": {"app": "web"}},
+    "spec": {
+        "replicas": 2,
+        "selector": {"matchLabels": {"app": "web"}},
+        "template": {"metadata": {"labels": {"app": "web"}},
+                     "spec": {"containers": [{"name": "web", "image": "nginx"}]}},
+    },
+}
+
+
+def _patches(api, resource="configmaps"):
+    return api.calls[("patch", resource)]
+
+
+def test_unchanged_docs_are_skipped(api, apis, run):
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    applied = _patches(api)
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    assert _patches(api) == applied
+
+
+def test_object_changed_since_apply_is_reapplied(api, apis, run):
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    rest.patch_object(apis, rest.resolve(apis, "ConfigMap", "v1"), "c", {"data": {"a": "manual"}}, "default")
+    applied = _patches(api)
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    assert _patches(api) == applied + 1
+    assert api.get("v1", "ConfigMap", "c", "default")["data"] == {"a": "1"}
+    # поле снова наше: следующий apply пропускается
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    assert _patches(api) == applied + 1
+
+
+def test_foreign_fields_do_not_force_reapply(api, apis, run):
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    rest.patch_object(apis, rest.resolve(apis, "ConfigMap", "v1"), "c", {"data": {"b": "other"}}, "default")
+    applied = _patches(api)
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    assert _patches(api) == applied
+
+
+def test_status_update_between_applies_is_skipped(api, apis, run):
+    run(aio.apply_manifest_docs(apis, [DEPLOYMENT], "default"))
+    applied_rv = api.get("apps/v1", "Deployment", "web", "default")["metadata"]["resourceVersion"]
+    deadline = time.monotonic() + 5
+    while not (api.get("apps/v1", "Deployment", "web", "default").get("status") or {}).get("readyReplicas"):
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    live = api.get("apps/v1", "Deployment", "web", "default")
+    # контроллер записал status: resourceVersion уже не тот, что вернул apply
+    assert live["metadata"]["resourceVersion"] != applied_rv
+    applied = _patches(api, "deployments")
+    run(aio.apply_manifest_docs(apis, [DEPLOYMENT], "default"))
+    assert _patches(api, "deployments") == applied
+
+
+def test_skip_survives_operator_restart(api, apis, run):
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    applied = _patches(api)
+    # новый набор клиентов — как новый процесс оператора: состояние берётся из managedFields
+    fresh = api.apis()
+    run(aio.apply_manifest_docs(fresh, DOCS, "default"))
+    assert _patches(api) == applied
+
+
+def test_skip_disabled(api, apis, run):
+    run(aio.apply_manifest_docs(apis, DOCS, "default"))
+    applied = _patches(api)
+    run(aio.apply_manifest_docs(apis, DOCS, "default", skip_unchanged=False))
+    assert _patches(api) == applied + 1
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+import pytest
+
+from pseudoflow.util import capture
+from pseudoflow.util.capture import OutputCapture
+
+
+def _feed(out, *chunks):
+    for chunk in chunks:
+        out.write(chunk)
+    out.close()
+    return out
+
+
+def test_unlimited_by_default():
+    out = _feed(capture.from_step({}), "x" * (4 << 20))
+    assert out.max_bytes == 0
+    assert not out.truncated
+    assert len(out.value()) == 4 << 20
+    vars_map = {}
+    capture.store(vars_map, "out", out, out.value())
+    assert "out_truncated" not in vars_map
+
+
+def test_truncation_keeps_head_and_tail():
+    out = _feed(OutputCapture(max_bytes=10), "0123456789", "abcdefghij")
+    assert out.truncated
+    assert (out.total, out.dropped) == (20, 10)
+    assert out.value() == "01234\n... [10 bytes truncated] ...\nfghij"
+
+    vars_map = {}
+    capture.store(vars_map, "out", out, out.value())
+    assert vars_map["out_truncated"] == "true"
+
+
+def test_limit_not_reached():
+    out = _feed(capture.from_step({"maxOutputBytes": 100}), "short")
+    assert out.value() == "short"
+    vars_map = {"out_truncated": "true"}
+    capture.store(vars_map, "out", out, out.value())
+    # значение предыдущего запуска перезаписывается
+    assert vars_map["out_truncated"] == "false"
+
+
+def test_spill_keeps_full_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(capture, "SPILL_DIR", str(tmp_path))
+    out = _feed(capture.from_step({"maxOutputBytes": 8, "spillToFile": True}), "line one\n", "line two\n")
+    assert out.truncated
+    assert open(out.path).read() == "line one\nline two\n"
+
+    out.exit_code = 2
+    vars_map = {}
+    capture.store(vars_map, "out", out, out.value())
+    assert vars_map["out_file"] == out.path
+    assert vars_map["out_exit_code"] == "2"
+
+
+def test_spill_sweeps_old_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(capture, "SPILL_DIR", str(tmp_path))
+    old = tmp_path / f"{capture.SPILL_PREFIX}old.log"
+    other = tmp_path / "unrelated.log"
+    for f in (old, other):
+        f.write_text("x")
+        os.utime(f, (time.time() - capture.SPILL_TTL - 10,) * 2)
+    _feed(OutputCapture(spill=True), "new")
+    assert not old.exists()
+    assert other.exists()
+
+
+def test_lines_format_across_chunks():
+    out = _feed(OutputCapture(fmt="lines"), "alpha\nbe", "ta\r\ngamma")
+    assert json.loads(out.value()) == ["alpha", "beta", "gamma"]
+
+
+def test_lines_format_truncation():
+    out = _feed(OutputCapture(max_bytes=12, fmt="lines"), "".join(f"l{i}\n" for i in range(10)))
+    assert json.loads(out.value()) == ["l0", "l1", "... [6 lines truncated] ...", "l8", "l9"]
+
+
+def test_json_document():
+    out = _feed(OutputCapture(fmt="json"), '{"items":', ' [1, 2]\n', '}')
+    assert json.loads(out.value()) == {"items": [1, 2]}
+
+
+@pytest.mark.parametrize("data, expected", [
+    ('{"a": 1}\n{"a": 2}\n\n{"a": 3}', [{"a": 1}, {"a": 2}, {"a": 3}]),
+    ('{"a": 1}\n', {"a": 1}),
+    ("[1, 2]", [1, 2]),
+])
+def test_json_lines(data, expected):
+    assert json.loads(_feed(OutputCapture(fmt="json"), data).value()) == expected
+
+
+def test_json_errors():
+    with pytest.raises(ValueError, match="not JSON"):
+        _feed(OutputCapture(fmt="json"), "{broken").value()
+    with pytest.raises(ValueError, match="cannot parse it as a JSON document"):
+        _feed(OutputCapture(max_bytes=8, fmt="json"), '{"items": [1, 2, 3, 4]}').value()
+
+
+def test_oversized_line_is_not_buffered():
+    out = _feed(OutputCapture(max_bytes=8, fmt="lines"), "ok\n", "y" * 100, "y" * 100, "\nend\n")
+    assert len(out._partial) == 0
+    assert json.loads(out.value()) == ["ok", "... [1 lines truncated] ...", "end"]
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="unknown outputFormat"):
+        OutputCapture(fmt="yaml")
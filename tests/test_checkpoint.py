@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+import pytest
+
+from pseudoflow.engine.checkpoint import Checkpoint, patch_flow_status
+from pseudoflow.engine.runner import FlowEngine
+
+FLOW_API = "ops.example.com/v1alpha1"
+STEPS = [
+    {"type": "template", "var": "a", "template": "one"},
+    {"type": "apply", "manifests": "apiVersion: v1\nkind: ConfigMap\nmetadata: {name: out}\ndata: {a: '${a}'}\n"},
+]
+
+
+@pytest.fixture
+def flow(api):
+    return api.create({
+        "apiVersion": FLOW_API, "kind": "PseudoFlow",
+        "metadata": {"name": "upgrade", "namespace": "default"},
+        "spec": {"steps": STEPS},
+    })
+
+
+def _status(api):
+    return api.get(FLOW_API, "PseudoFlow", "upgrade", "default")
+
+
+def test_status_patch_keeps_generation(api, flow):
+    apis = api.apis()
+    assert asyncio.run(patch_flow_status(apis, "upgrade", "default", {"phase": "Running"}))
+    obj = _status(api)
+    assert obj["status"]["phase"] == "Running"
+    assert obj["metadata"]["generation"] == flow["metadata"]["generation"]
+    assert api.calls[("patch", "pseudoflows/status")] == 1
+
+
+def test_checkpoint_resumes_completed_steps(api, flow):
+    apis = api.apis()
+    generation = flow["metadata"]["generation"]
+
+    async def first_run():
+        cp = Checkpoint(apis, "upgrade", "default", generation, interval=0)
+        cp.resume(None, ["template", "apply"], {})
+        await cp.step_done(0, "template", {"a": "one"})
+        await cp.close()
+
+    asyncio.run(first_run())
+    obj = _status(api)
+    # запись чекпоинта идёт в /status и не меняет generation: после рестарта он совпадает
+    assert obj["metadata"]["generation"] == generation
+
+    resumed = Checkpoint(apis, "upgrade", "default", generation)
+    vars_map = {}
+    assert resumed.resume(obj["status"], ["template", "apply"], vars_map) == {0}
+    assert vars_map == {"a": "one"}
+
+
+def test_checkpoint_of_other_generation_is_ignored(api, flow):
+    apis = api.apis()
+    status = {"checkpoint": {"generation": 1, "steps": [{"path": "steps[0]", "type": "template", "status": "Succeeded"}]}}
+    assert Checkpoint(apis, "upgrade", "default", 2).resume(status, ["template", "apply"], {}) == set()
+
+
+def test_engine_skips_checkpointed_steps(api, flow):
+    apis = api.apis()
+    generation = flow["metadata"]["generation"]
+    status = {"checkpoint": {
+        "generation": generation,
+        "steps": [{"path": "steps[0]", "type": "template", "status": "Succeeded"}],
+        "vars": {"a": "restored"},
+    }}
+
+    async def main():
+        return await FlowEngine(apis, "default").run_flow("upgrade", "default", {"steps": STEPS}, generation, status)
+
+    result = asyncio.run(main())
+    assert (result.steps_resumed, result.steps_ok) == (1, 1)
+    # переменная первого шага восстановлена из чекпоинта, а не вычислена заново
+    assert api.get("v1", "ConfigMap", "out", "default")["data"] == {"a": "restored"}
+
+
+def test_writes_are_throttled_and_flushed_on_abort(api):
+    apis = api.apis()
+    steps = [
+        {"type": "template", "var": "a", "template": "one"},
+        {"type": "template", "var": "b", "template": "two"},
+        {"type": "sleep", "seconds": 30},
+    ]
+    # свой поток: план кэшируется по (namespace, name, generation)
+    flow = api.create({
+        "apiVersion": FLOW_API, "kind": "PseudoFlow",
+        "metadata": {"name": "aborted", "namespace": "default"},
+        "spec": {"steps": steps},
+    })
+    generation = flow["metadata"]["generation"]
+
+    async def main():
+        task = asyncio.ensure_future(
+            FlowEngine(apis, "default").run_flow("aborted", "default", {"steps": steps}, generation))
+        await asyncio.sleep(0.3)
+        # первый шаг записан сразу, второй ждёт интервала (5 с) — его дописывает отмена
+        assert api.calls[("patch", "pseudoflows/status")] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert api.calls[("patch", "pseudoflows/status")] == 2
+    cp = api.get(FLOW_API, "PseudoFlow", "aborted", "default")["status"]["checkpoint"]
+    assert [s["path"] for s in cp["steps"]] == ["steps[0]", "steps[1]"]
+    assert cp["vars"] == {"a": "one", "b": "two"}
+
+
+def test_only_changed_vars_are_written(api, flow, monkeypatch):
+    apis = api.apis()
+    bodies = []
+    cp = Checkpoint(apis, "upgrade", "default", flow["metadata"]["generation"], interval=0)
+    write = cp._write
+
+    async def record(body):
+        bodies.append(body["vars"])
+        await write(body)
+
+    monkeypatch.setattr(cp, "_write", record)
+    big = "x" * 1000
+
+    async def main():
+        vars_map = {"spec": "s"}
+        cp.resume(None, ["a", "b", "c", "d"], vars_map)
+        vars_map["big"] = big
+        await cp.step_done(0, "a", vars_map)
+        vars_map["small"] = "1"
+        await cp.step_done(1, "b", vars_map)
+        vars_map["big"] = "y"
+        vars_map["spec"] = "s2"
+        await cp.step_done(2, "c", vars_map)
+        del vars_map["small"]
+        vars_map["spec"] = "s"
+        await cp.step_done(3, "d", vars_map)
+
+    asyncio.run(main())
+    assert bodies == [{"big": big}, {"small": "1"}, {"big": "y", "spec": "s2"}, {"small": None, "spec": None}]
+    assert _status(api)["status"]["checkpoint"]["vars"] == {"big": "y"}
+    assert cp._size == len(json.dumps({"big": "y"}))
+
+
+def test_vars_size_limit_freezes_checkpoint(api, flow):
+    cp = Checkpoint(api.apis(), "upgrade", "default", flow["metadata"]["generation"], interval=0, max_bytes=100)
+
+    async def main():
+        vars_map = {}
+        cp.resume(None, ["a", "b"], vars_map)
+        vars_map["v"] = "x" * 10
+        await cp.step_done(0, "a", vars_map)
+        vars_map["v"] = "x" * 200
+        await cp.step_done(1, "b", vars_map)
+
+    asyncio.run(main())
+    saved = _status(api)["status"]["checkpoint"]
+    assert [s["path"] for s in saved["steps"]] == ["steps[0]"]
+    assert saved["vars"] == {"v": "x" * 10}
+
+
+def test_vars_of_other_generation_are_cleared(api, flow):
+    apis = api.apis()
+    asyncio.run(patch_flow_status(apis, "upgrade", "default", {"checkpoint": {
+        "generation": 1, "steps": [{"path": "steps[0]", "type": "template", "status": "Succeeded"}],
+        "vars": {"old": "value"},
+    }}))
+    status = _status(api)["status"]
+
+    async def main():
+        cp = Checkpoint(apis, "upgrade", "default", 2, interval=0)
+        vars_map = {}
+        assert cp.resume(status, ["template"], vars_map) == set()
+        vars_map["new"] = "1"
+        await cp.step_done(0, "template", vars_map)
+
+    asyncio.run(main())
+    assert _status(api)["status"]["checkpoint"]["vars"] == {"new": "1"}
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from pseudoflow.engine.plan import compile_steps
+from pseudoflow.engine.runner import _eval_condition
+from pseudoflow.util.conditions import compile_comparator, compile_condition
+
+DEPLOY = {
+    "status": {
+        "replicas": 3,
+        "readyReplicas": 3,
+        "paused": False,
+        "conditions": [
+            {"type": "Available", "status": "True"},
+            {"type": "Progressing", "status": "False"},
+        ],
+    },
+}
+
+
+@pytest.mark.parametrize("op, value, x, expected", [
+    ("equals", "Ready", "Ready", True),
+    ("equals", "Ready", "ready", False),
+    ("equals", "3.0", 3, True),
+    ("equals", "3", 3, True),
+    ("equals", 3, 4, False),
+    ("equals", True, "True", True),
+    ("equals", True, "true", True),
+    ("equals", True, True, True),
+    ("equals", "True", True, True),
+    ("equals", "false", False, True),
+    ("equals", False, "True", False),
+    ("equals", 1, True, False),
+    ("notEquals", True, "True", False),
+    ("notEquals", "a", "b", True),
+    ("contains", "unn", "Running", True),
+    ("contains", "true", True, True),
+    ("contains", "x", "Running", False),
+    ("greaterThan", 2, "3", True),
+    ("greaterThan", "2.5", 2, False),
+    ("greaterThan", 2, "n/a", False),
+    ("greaterThan", 2, True, False),
+    ("lessThan", "10", 9.5, True),
+    ("lessThan", "abc", 1, False),
+])
+def test_comparator(op, value, x, expected):
+    assert compile_comparator(op, value)(x) is expected
+
+
+def test_comparator_rejects_unknown_op():
+    with pytest.raises(ValueError, match="Unsupported op"):
+        compile_comparator("eq", "x")
+
+
+@pytest.mark.parametrize("path, op, value, expected", [
+    ("status.conditions[0].status", "equals", True, True),
+    ("status.conditions[1].status", "equals", True, False),
+    ("status.conditions[*].type", "equals", "Progressing", True),
+    ("$.status.readyReplicas", "equals", "3", True),
+    ("status.paused", "equals", "false", True),
+    ("status.replicas", "greaterThan", 2, True),
+    ("status.missing", "notEquals", "x", False),
+    # грамматика jsonpath_ng, не простой путь
+    ("$..type", "equals", "Available", True),
+    # snake_case старых условий повторяется в camelCase
+    ("status.ready_replicas", "equals", 3, True),
+])
+def test_condition(path, op, value, expected):
+    assert compile_condition(path, op, value)(DEPLOY) is expected
+
+
+def test_condition_without_path_compares_object():
+    assert compile_condition(None, "contains", "abc")("xabcx")
+    assert not compile_condition(None, "equals", "x")(None)
+
+
+def test_condition_cache_keeps_value_types_apart():
+    assert compile_condition("v", "equals", 1) is compile_condition("v", "equals", 1)
+    assert compile_condition("v", "equals", True)({"v": "true"})
+    assert not compile_condition("v", "equals", 1)({"v": "true"})
+
+
+@pytest.mark.parametrize("step", [
+    {"type": "if", "condition": {"jsonPath": "x", "op": "eq"}, "then": []},
+    {"type": "when", "condition": {"jsonPath": "x", "op": "gt"}, "steps": []},
+    {"type": "waitFor", "condition": "custom", "jsonPath": "x", "op": "in"},
+])
+def test_plan_rejects_unknown_op_with_step_path(step):
+    steps = [{"type": "log", "message": "first"}, {"type": "loop", "forEach": [1], "steps": [step]}]
+    with pytest.raises(ValueError, match=r"^steps\[1\]\.steps\[0\]: .* op '\w+' is not supported"):
+        compile_steps(steps)
+
+
+def test_templated_op_is_checked_at_runtime(api):
+    api.create({"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "cm", "namespace": "default"},
+                "data": {"ready": "yes"}})
+    compile_steps([{"type": "if", "condition": {"op": "${op}"}, "then": []}])
+    resource = {"apiVersion": "v1", "kind": "ConfigMap", "name": "cm"}
+
+    def check(op):
+        cond = {"resource": resource, "jsonPath": "data.ready", "op": op, "value": "yes"}
+        return asyncio.run(_eval_condition(api.apis(), cond, "default"))
+
+    assert check("equals") is True
+    # как до компиляции условий: неизвестный op — ложное условие, а не исключение
+    assert check("eq") is False
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from pseudoflow.engine import dispatcher
+from pseudoflow.engine.plan import compile_steps
+from pseudoflow.engine.runner import FlowEngine
+
+
+@pytest.fixture
+def events(monkeypatch):
+    """log записывает сообщения; `fail ...` падает, `delay` задерживает шаг."""
+    seen = []
+
+    async def log(step, ctx):
+        await asyncio.sleep(float(step.get("delay", 0)))
+        seen.append(step["message"])
+        if step["message"].startswith("fail"):
+            raise RuntimeError(step["message"])
+
+    monkeypatch.setitem(dispatcher._HANDLERS, "log", log)
+    return seen
+
+
+def _log(message, **kw):
+    return {"type": "log", "message": message, **kw}
+
+
+def _on_error(*messages, **kw):
+    return {"type": "onError", "steps": [_log(m) for m in messages], **kw}
+
+
+def _run(api, steps, **options):
+    spec = {"steps": steps, "options": options}
+    return asyncio.run(FlowEngine(api.apis(), "default").run_flow("flow", "default", spec))
+
+
+def test_dependencies_order_steps(api, events):
+    result = _run(api, [
+        _log("a", id="a", delay=0.05),
+        _log("b", id="b", dependsOn=[]),
+        _log("c", id="c", dependsOn=["a", "b"]),
+        _log("d", id="d", dependsOn=["b"]),
+        _log("e"),
+    ])
+    # b и d не ждут a; c ждёт обе зависимости; e без dependsOn идёт после предыдущего шага (d)
+    assert events == ["b", "d", "e", "a", "c"]
+    assert result.steps_ok == 5
+    assert result.critical_path[0] == ["a", "c"]
+
+
+def test_max_parallel_steps_limits_leaf_steps(api, events, monkeypatch):
+    active = []
+    peak = []
+
+    async def log(step, ctx):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.02)
+        active.pop()
+
+    monkeypatch.setitem(dispatcher._HANDLERS, "log", log)
+    _run(api, [_log(str(i), id=str(i), dependsOn=[]) for i in range(6)], maxParallelSteps=2)
+    assert max(peak) == 2
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([_log("a", id="a", dependsOn=["b"]), _log("b", id="b", dependsOn=["a"])], "cycle between steps: .*a.*b"),
+    ([_log("a", id="a", dependsOn=["a"])], r"cycle between steps: a -> a"),
+    ([_log("a", id="a", dependsOn=["zzz"])], "unknown id"),
+    ([_log("a", id="a"), _log("b", id="a", dependsOn=[])], "duplicate step id"),
+])
+def test_invalid_graph_fails_before_run(api, events, steps, message):
+    with pytest.raises(ValueError, match=message):
+        compile_steps(steps)
+    with pytest.raises(ValueError, match=message):
+        _run(api, steps)
+    assert events == []
+
+
+def test_failure_without_handler_cancels_running_steps(api, events):
+    with pytest.raises(RuntimeError, match="fail a"):
+        _run(api, [
+            _log("fail a", id="a", dependsOn=[]),
+            _log("slow", id="slow", dependsOn=[], delay=1),
+            _log("after", id="after", dependsOn=["a"]),
+        ])
+    assert events == ["fail a"]
+
+
+def test_sequential_on_error_handles_previous_step(api, events):
+    result = _run(api, [_log("fail a"), _on_error("handled ${__last_error__}"), _log("next")])
+    assert events == ["fail a", "handled fail a", "next"]
+    assert (result.steps_ok, result.steps_fail) == (2, 1)
+
+
+def test_sequential_on_error_is_skipped_without_error(api, events):
+    _run(api, [_log("a"), _on_error("handled"), _log("next")])
+    assert events == ["a", "next"]
+
+
+def test_dag_on_error_handles_its_dependency(api, events):
+    result = _run(api, [
+        _log("fail a", id="a", dependsOn=[]),
+        _log("b", id="b", dependsOn=[], delay=0.05),
+        _on_error("handled ${__last_error__}", id="recover", dependsOn=["a"]),
+        _log("c", id="c", dependsOn=["recover", "b"]),
+    ])
+    # ошибка a не отменила b, onError получил её, c ждал и onError, и b
+    assert events == ["fail a", "handled fail a", "b", "c"]
+    assert (result.steps_ok, result.steps_fail) == (3, 1)
+
+
+def test_dag_failure_propagates_to_dependents(api, events):
+    with pytest.raises(RuntimeError, match="fail a"):
+        _run(api, [
+            _log("fail a", id="a", dependsOn=[]),
+            _on_error("handled", id="recover", dependsOn=["a"]),
+            _log("b", id="b", dependsOn=["a"]),
+            _log("c", id="c", dependsOn=["b"]),
+            _log("other", id="other", dependsOn=[]),
+        ])
+    # b и c не запускались; onError и независимые шаги отработали, но ошибка b не обработана
+    assert sorted(events) == ["fail a", "handled", "other"]
+
+
+def test_dag_on_error_handles_propagated_failure(api, events):
+    _run(api, [
+        _log("fail a", id="a", dependsOn=[]),
+        _log("b", id="b", dependsOn=["a"]),
+        _on_error("handled ${__last_error__}", id="recover", dependsOn=["b"]),
+    ])
+    assert events == ["fail a", "handled fail a"]
+
+
+def test_dag_on_error_is_skipped_without_error(api, events):
+    _run(api, [
+        _log("a", id="a", dependsOn=[]),
+        _on_error("handled", id="recover", dependsOn=["a"]),
+        _log("b", id="b", dependsOn=["recover"]),
+    ])
+    assert events == ["a", "b"]
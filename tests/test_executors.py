@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from pseudoflow.kube.executors import WorkloadExecutor
+
+
+def test_run_counts_completed():
+    ex = WorkloadExecutor("test", 2)
+    try:
+        assert asyncio.run(ex.run(lambda a, b: a + b, 2, 3)) == 5
+        stats = ex.stats()
+        assert (stats["queued"], stats["active"], stats["completed"]) == (0, 0, 1)
+    finally:
+        ex.shutdown()
+
+
+def test_cancelled_queued_task_leaves_queue():
+    ex = WorkloadExecutor("test", 1)
+
+    async def main():
+        busy = asyncio.ensure_future(ex.run(time.sleep, 0.2))
+        queued = asyncio.ensure_future(ex.run(time.sleep, 0.2))
+        await asyncio.sleep(0.05)
+        assert ex.stats()["queued"] == 1
+        queued.cancel()
+        await busy
+        await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(main())
+        stats = ex.stats()
+        # отменённая до старта задача не выполнялась и не висит в очереди
+        assert (stats["queued"], stats["active"], stats["completed"]) == (0, 0, 1)
+    finally:
+        ex.shutdown()
+
+
+def test_run_cancellable_cancels_token():
+    ex = WorkloadExecutor("test", 1)
+    seen = []
+
+    def wait(cancel):
+        seen.append(cancel)
+        cancel.sleep(5)
+
+    async def main():
+        task = asyncio.ensure_future(ex.run_cancellable(wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    try:
+        started = time.monotonic()
+        asyncio.run(main())
+        assert seen and seen[0].cancelled
+        assert time.monotonic() - started < 2
+    finally:
+        ex.shutdown()
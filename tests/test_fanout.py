@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+from pseudoflow.agent import backend
+from pseudoflow.engine.context import FlowContext, Scope
+from pseudoflow.steps import exec_node
+from pseudoflow.util.fanout import FanOutError, fan_out, fan_out_nodes, fan_out_options
+
+NODES = [f"n{i}" for i in range(6)]
+
+
+def _worker(fail=(), delay=0.01):
+    """fn(key) для fan_out: запоминает старты и пик одновременности, падает на ключах из fail."""
+    state = {"started": [], "active": 0, "peak": 0}
+
+    async def fn(key):
+        state["started"].append(key)
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(delay)
+            if key in fail:
+                raise RuntimeError(f"{key} broken")
+            return key.upper()
+        finally:
+            state["active"] -= 1
+
+    return fn, state
+
+
+@pytest.mark.parametrize("step, expected", [
+    ({}, (10, True, 0)),
+    ({"maxConcurrency": 3, "failFast": False, "tolerateFailures": 2}, (3, False, 2)),
+    ({"tolerateFailures": True}, (10, True, None)),
+    ({"tolerateFailures": False, "maxConcurrency": 0}, (10, True, 0)),
+])
+def test_options(step, expected):
+    assert fan_out_options(step) == expected
+
+
+def test_results_in_key_order_within_concurrency():
+    fn, state = _worker()
+    results, errors = asyncio.run(fan_out(NODES, fn, max_concurrency=2))
+    assert list(results) == NODES and results["n3"] == "N3"
+    assert errors == {}
+    assert state["peak"] == 2
+
+
+def test_fail_fast_cancels_remaining():
+    fn, state = _worker(fail={"n0"})
+    with pytest.raises(FanOutError, match=r"^1/6 failed: n0: n0 broken") as e:
+        asyncio.run(fan_out(NODES, fn, max_concurrency=2))
+    # n1 уже шла вместе с n0; остальные ноды не стартовали
+    assert state["started"] == ["n0", "n1"]
+    assert e.value.errors == {"n0": "n0 broken"}
+
+
+def test_without_fail_fast_all_nodes_run():
+    fn, state = _worker(fail={"n0", "n4"})
+    with pytest.raises(FanOutError, match="2/6 failed") as e:
+        asyncio.run(fan_out(NODES, fn, max_concurrency=2, fail_fast=False))
+    assert sorted(state["started"]) == NODES
+    assert list(e.value.results) == ["n1", "n2", "n3", "n5"]
+
+
+def test_tolerated_failures_are_returned():
+    fn, _ = _worker(fail={"n1", "n2"})
+    results, errors = asyncio.run(fan_out(NODES, fn, tolerate=2))
+    assert list(errors) == ["n1", "n2"]
+    assert len(results) == 4
+    with pytest.raises(FanOutError):
+        asyncio.run(fan_out(NODES, fn, tolerate=1))
+    assert len(asyncio.run(fan_out(NODES, fn, tolerate=None))[1]) == 2
+
+
+def test_cancellation_reaches_running_keys():
+    fn, state = _worker(delay=10)
+
+    async def main():
+        task = asyncio.ensure_future(fan_out(NODES, fn, max_concurrency=3))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert state["active"] == 0
+    assert len(state["started"]) == 3
+
+
+def test_fan_out_nodes_stores_vars_on_failure():
+    fn, _ = _worker(fail={"n2"})
+    vars_map = {}
+    with pytest.raises(FanOutError):
+        asyncio.run(fan_out_nodes({"varPerNode": "out", "failFast": False}, vars_map, NODES, fn))
+    assert json.loads(vars_map["out_errors"]) == {"n2": "n2 broken"}
+    assert "n2" not in json.loads(vars_map["out"]) and len(json.loads(vars_map["out"])) == 5
+
+
+def test_exec_node_on_all_nodes(api, monkeypatch):
+    # local: команда выполняется в процессе теста; ненулевой код выхода — не ошибка ноды
+    monkeypatch.setattr(backend, "NODE_BACKEND", "local")
+    api.add_nodes(3, labels={"role": "worker"})
+    ctx = FlowContext(apis=api.apis(), operator_ns="default", namespace="default", vars=Scope())
+    step = {"cmd": "echo hi; exit 3", "runOn": "all", "nodeSelector": {"role": "worker"},
+            "varPerNode": "out", "maxConcurrency": 2}
+    asyncio.run(exec_node.handle(step, ctx))
+    out = json.loads(ctx.vars["out"])
+    assert len(out) == 3 and set(out.values()) == {"hi\n"}
+    assert set(json.loads(ctx.vars["out_exit_codes"]).values()) == {3}
+    assert json.loads(ctx.vars["out_errors"]) == {}
@@ -0,0 +1,128 @@
+import asyncio
+import re
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from pseudoflow.engine.runner import FlowEngine
+from pseudoflow.util import metrics
+from pseudoflow.util.metrics import Counter, Gauge, Histogram
+
+# строка сэмпла text format 0.0.4: name{label="value",...} number
+_SAMPLE_RE = re.compile(
+    r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"(?:,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*\})?'
+    r' (?:[-+]?[0-9.]+(?:e[-+]?[0-9]+)?|[+-]Inf|NaN)$'
+)
+
+
+def test_counter_and_gauge():
+    c = Counter("t_calls_total", "Calls.", ("verb",))
+    c.inc(verb="get")
+    c.inc(2, verb="get")
+    c.inc(0.5, verb="list")
+    assert c.value(verb="get") == 3
+    assert c.render() == [
+        "# HELP t_calls_total Calls.",
+        "# TYPE t_calls_total counter",
+        't_calls_total{verb="get"} 3',
+        't_calls_total{verb="list"} 0.5',
+    ]
+    g = Gauge("t_active", "Active.")
+    g.inc()
+    g.inc()
+    g.dec()
+    assert g.render()[1:] == ["# TYPE t_active gauge", "t_active 1"]
+    g.set(7)
+    assert g.samples() == ["t_active 7"]
+
+
+def test_label_values_are_escaped():
+    c = Counter("t_escaped_total", "Escaping.", ("flow",))
+    c.inc(flow='ns/a "b"\\c\nd')
+    sample = c.samples()[0]
+    assert sample == 't_escaped_total{flow="ns/a \\"b\\"\\\\c\\nd"} 1'
+    assert _SAMPLE_RE.match(sample)
+
+
+def test_labels_must_match():
+    c = Counter("t_labels_total", "Labels.", ("a", "b"))
+    with pytest.raises(ValueError, match="expected labels"):
+        c.inc(a="1")
+    with pytest.raises(ValueError, match="expected labels"):
+        c.inc(a="1", b="2", c="3")
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "Durations.", ("kind",), buckets=(1, 0.1, 5))
+    for value in (0.05, 0.1, 0.7, 3, 100):
+        h.observe(value, kind="x")
+    assert h.count(kind="x") == 5
+    assert h.samples() == [
+        't_seconds_bucket{kind="x",le="0.1"} 2',
+        't_seconds_bucket{kind="x",le="1"} 3',
+        't_seconds_bucket{kind="x",le="5"} 4',
+        't_seconds_bucket{kind="x",le="+Inf"} 5',
+        't_seconds_sum{kind="x"} 103.85',
+        't_seconds_count{kind="x"} 5',
+    ]
+
+
+def _parse(text):
+    """{name: type} и проверка формата: HELP/TYPE перед сэмплами, каждая строка — валидный сэмпл."""
+    types = {}
+    current = None
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            current = line.split(" ")[2]
+            assert current not in types, f"duplicate metric {current}"
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name == current
+            types[name] = kind
+        else:
+            assert _SAMPLE_RE.match(line), line
+            name = re.match(r"[^{ ]+", line).group(0)
+            family = re.sub(r"_(bucket|sum|count)$", "", name) if types.get(current) == "histogram" else name
+            assert family == current, line
+    return types
+
+
+def test_flow_run_is_exposed(api):
+    spec = {"steps": [{"type": "log", "message": "hi"}, {"type": "sleep", "seconds": 0}]}
+    before = metrics.RUNS_TOTAL.value(flow="default/metrics", status="Succeeded")
+    asyncio.run(FlowEngine(api.apis(), "default").run_flow("metrics", "default", spec))
+    assert metrics.RUNS_TOTAL.value(flow="default/metrics", status="Succeeded") == before + 1
+    assert metrics.STEP_DURATION.count(flow="default/metrics", step_type="log") >= 1
+
+    text = metrics.render()
+    types = _parse(text)
+    assert types["pseudoflow_runs_total"] == "counter"
+    assert types["pseudoflow_step_duration_seconds"] == "histogram"
+    assert types["pseudoflow_active_flows"] == "gauge"
+    assert 'pseudoflow_step_duration_seconds_bucket{flow="default/metrics",step_type="sleep",le="+Inf"}' in text
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_http_endpoint():
+    assert metrics.start_http_server(0) is None
+    port = _free_port()
+    server = metrics.start_http_server(port, "127.0.0.1")
+    try:
+        # повторный вызов возвращает уже запущенный сервер
+        assert metrics.start_http_server(port, "127.0.0.1") is server
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics?x=1", timeout=5) as resp:
+            assert resp.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+            _parse(resp.read().decode())
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5)
+        assert e.value.code == 404
+    finally:
+        metrics.stop_http_server()
@@ -0,0 +1,86 @@
+import pytest
+
+from pseudoflow.engine import plan as plan_mod
+from pseudoflow.engine.plan import compile_steps, compile_value, get_plan, render_value
+from pseudoflow.util.templating import Template, compile_str, render_str
+
+
+@pytest.mark.parametrize("source", [
+    "plain",
+    "${a}",
+    "x-${a}-${b}-y",
+    "${missing} and ${a}",
+    "$a {a} ${1bad} ${a",
+    "",
+])
+def test_template_matches_render_str(source):
+    vars_map = {"a": "A", "b": 2}
+    compiled = compile_str(source)
+    rendered = compiled.render(vars_map) if isinstance(compiled, Template) else compiled
+    assert rendered == render_str(source, vars_map)
+
+
+def test_compile_str_keeps_plain_strings():
+    assert compile_str("no vars, ${ not a var") == "no vars, ${ not a var"
+    assert isinstance(compile_str("${a}"), Template)
+
+
+def test_rendered_values_are_not_rendered_again():
+    assert Template("${a}").render({"a": "${b}", "b": "nested"}) == "${b}"
+
+
+def test_render_value_returns_fresh_containers():
+    node = compile_value({"name": "${n}", "items": ["${n}", 1, True, None], "nested": {"k": "v"}})
+    first = render_value(node, {"n": "x"})
+    assert first == {"name": "x", "items": ["x", 1, True, None], "nested": {"k": "v"}}
+    # обработчик шага может менять параметры: план от этого не меняется
+    first["items"].append("mutated")
+    first["nested"]["k"] = "mutated"
+    assert render_value(node, {"n": "y"}) == {"name": "y", "items": ["y", 1, True, None], "nested": {"k": "v"}}
+
+
+def test_compile_steps_paths_and_children():
+    steps = [
+        {"type": "log", "message": "${a}"},
+        {"type": "loop", "forEach": ["1"], "steps": [{"type": "log", "message": "in loop"}]},
+        {"type": "parallel", "steps": [[{"type": "log", "message": "g0"}], [{"type": "sleep"}, {"type": "log"}]]},
+        {"type": "if", "condition": {}, "then": [{"type": "log"}], "else": []},
+    ]
+    compiled = compile_steps(steps)
+    assert [s.path for s in compiled] == ["steps[0]", "steps[1]", "steps[2]", "steps[3]"]
+    assert compiled[1].child("steps")[0].path == "steps[1].steps[0]"
+    assert [s.path for s in compiled[2].child("steps")[1]] == ["steps[2].steps[1][0]", "steps[2].steps[1][1]"]
+    assert compiled[3].child("then")[0].path == "steps[3].then[0]"
+    assert compiled[3].child("else") == ()
+    # вложенные шаги не входят в параметры шага
+    assert compiled[1].render({}) == {"type": "loop", "forEach": ["1"]}
+    assert compiled[0].render({"a": "hi"}) == {"type": "log", "message": "hi"}
+
+
+def test_step_type_is_required():
+    with pytest.raises(ValueError, match="step.type is required"):
+        compile_steps([{"message": "no type"}])
+
+
+def test_plan_cache(monkeypatch):
+    monkeypatch.setattr(plan_mod, "PLAN_CACHE_SIZE", 2)
+    monkeypatch.setattr(plan_mod, "_plans", type(plan_mod._plans)())
+    steps = [{"type": "log", "message": "${a}"}]
+
+    first = get_plan(("ns", "flow", 1), steps)
+    # spec неизменен в пределах generation: тот же план без повторной компиляции
+    assert get_plan(("ns", "flow", 1), [{"type": "sleep"}]) is first
+    assert get_plan(("ns", "flow", 2), steps) is not first
+    assert get_plan(None, steps) is not get_plan(None, steps)
+
+    get_plan(("ns", "flow", 1), steps)
+    get_plan(("ns", "other", 1), steps)
+    # вытесняется давно не использованный (generation 2), а не недавно прочитанный
+    assert list(plan_mod._plans) == [("ns", "flow", 1), ("ns", "other", 1)]
+
+
+def test_invalid_plan_is_not_cached(monkeypatch):
+    monkeypatch.setattr(plan_mod, "_plans", type(plan_mod._plans)())
+    with pytest.raises(ValueError):
+        get_plan(("ns", "bad", 1), [{"type": "log", "id": "a", "dependsOn": ["a"]}])
+    assert plan_mod._plans == {}
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from kubernetes.client import ApiException
+
+from pseudoflow.kube import runner_pool
+from pseudoflow.kube.runner_pool import PoolClosed, RunnerPool
+from pseudoflow.testing import FakeKubeApi
+
+
+@pytest.fixture
+def api():
+    # поды пула «работают» дольше теста
+    with FakeKubeApi(pod_run_seconds=60) as fake:
+        yield fake
+
+
+def _running(api):
+    return sorted(p["metadata"]["name"] for p in api.list("v1", "Pod", "default"))
+
+
+def _fake_exec(calls, fail=False):
+    def exec_(runner, command, end, cancel=None, capture=None):
+        calls.append(runner.name)
+        if fail:
+            raise RuntimeError("exec stream broken")
+        return command
+
+    return exec_
+
+
+def test_runner_is_reused_and_recycled(api, monkeypatch):
+    pool = RunnerPool(api.apis(), "default", size=1, max_uses=2)
+    calls = []
+    monkeypatch.setattr(pool, "_exec", _fake_exec(calls))
+    try:
+        assert [pool.run(f"echo {i}", timeout=10) for i in range(3)] == ["echo 0", "echo 1", "echo 2"]
+        # два раза в первом поде, затем он пересоздан
+        assert calls[0] == calls[1] != calls[2]
+        assert calls[0] not in _running(api)
+    finally:
+        pool.close()
+    assert _running(api) == []
+
+
+def test_failed_exec_recycles_runner(api, monkeypatch):
+    pool = RunnerPool(api.apis(), "default", size=1)
+    calls = []
+    monkeypatch.setattr(pool, "_exec", _fake_exec(calls, fail=True))
+    try:
+        with pytest.raises(RuntimeError, match="exec stream broken"):
+            pool.run("true", timeout=10)
+        assert calls[0] not in _running(api)
+    finally:
+        pool.close()
+
+
+def test_create_error_fails_waiting_command_with_backoff(api, monkeypatch):
+    pool = RunnerPool(api.apis(), "default", size=2)
+    attempts = []
+
+    def forbidden(**kwargs):
+        attempts.append(kwargs)
+        raise ApiException(status=403, reason="Forbidden")
+
+    monkeypatch.setattr(pool._core, "create_namespaced_pod", forbidden)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="cannot start runner pods") as exc:
+        pool.run("true", timeout=30)
+    assert isinstance(exc.value.__cause__, ApiException)
+    assert time.monotonic() - started < 5
+    # до конца backoff новых попыток создания нет: ошибка возвращается сразу
+    with pytest.raises(RuntimeError, match="cannot start runner pods"):
+        pool.run("true", timeout=30)
+    assert len(attempts) == 1
+    pool.close()
+
+
+def test_idle_pools_are_reaped(api, monkeypatch):
+    monkeypatch.setattr(runner_pool, "POOL_SIZE", 1)
+    monkeypatch.setattr(runner_pool, "IDLE_SECONDS", 0)
+    apis = api.apis()
+    pool = runner_pool.get_runner_pool(apis, "default")
+    monkeypatch.setattr(pool, "_exec", _fake_exec([]))
+    try:
+        pool.run("true", timeout=10)
+        assert runner_pool.reap_idle_pools(60) == 0
+        assert runner_pool.reap_idle_pools(0) == 1
+        assert _running(api) == []
+        with pytest.raises(PoolClosed):
+            pool.run("true", timeout=10)
+        assert runner_pool._pools == {}
+    finally:
+        runner_pool.close_runner_pools()
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from pseudoflow.engine.scheduler import FlowScheduler, parse_weights
+
+
+def _admission_order(scheduler, flows):
+    """
+    Один поток держит единственный слот, пока остальные (key, namespace, priority)
+    встают в очередь в заданном порядке; возвращает порядок допуска.
+    """
+    order = []
+
+    async def run(key, namespace, priority, queued_at):
+        async with scheduler.slot(key, namespace, priority, lambda: _note(queued_at, key)) as queued:
+            assert queued
+            order.append(key)
+            await asyncio.sleep(0)
+
+    async def main():
+        queued = []
+        async with scheduler.slot("blocker", "other") as was_queued:
+            assert not was_queued
+            tasks = []
+            for flow in flows:
+                tasks.append(asyncio.ensure_future(run(*flow, queued)))
+                await asyncio.sleep(0)
+            assert scheduler.stats()["queued"] == len(flows)
+        await asyncio.gather(*tasks)
+        assert sorted(queued) == sorted(key for key, _, _ in flows)
+
+    asyncio.run(main())
+    return order
+
+
+async def _note(queued, key):
+    queued.append(key)
+
+
+def test_unlimited_admits_immediately():
+    scheduler = FlowScheduler(max_active=0)
+
+    async def main():
+        async with scheduler.slot("a", "ns") as q1, scheduler.slot("b", "ns") as q2:
+            assert (q1, q2) == (False, False)
+            assert scheduler.stats()["active"] == 2
+
+    asyncio.run(main())
+    assert scheduler.stats()["active"] == 0
+
+
+def test_priority_first_then_fifo():
+    order = _admission_order(FlowScheduler(max_active=1), [
+        ("low-1", "ns", 0),
+        ("high-1", "ns", 10),
+        ("low-2", "ns", 0),
+        ("high-2", "ns", 10),
+        ("mid", "ns", 5),
+    ])
+    assert order == ["high-1", "high-2", "mid", "low-1", "low-2"]
+
+
+def test_namespaces_share_slots_fairly():
+    # a поставил в очередь много потоков раньше b — b не ждёт их все
+    flows = [(f"a{i}", "a", 0) for i in range(6)] + [("b0", "b", 0), ("b1", "b", 0)]
+    order = _admission_order(FlowScheduler(max_active=1), flows)
+    assert order == ["a0", "b0", "a1", "b1", "a2", "a3", "a4", "a5"]
+
+
+def test_namespace_weights():
+    flows = [(f"a{i}", "a", 0) for i in range(8)] + [(f"b{i}", "b", 0) for i in range(8)]
+    order = _admission_order(FlowScheduler(max_active=1, weights={"a": 3}), flows)
+    first = [key[0] for key in order[:8]]
+    assert first.count("a") == 6 and first.count("b") == 2
+    # внутри namespace — FIFO
+    assert [k for k in order if k[0] == "a"] == [f"a{i}" for i in range(8)]
+
+
+def test_cancelled_waiter_leaves_queue_without_slot():
+    scheduler = FlowScheduler(max_active=1)
+
+    async def wait_slot(key):
+        async with scheduler.slot(key, "ns"):
+            await asyncio.sleep(0)
+
+    async def main():
+        async with scheduler.slot("holder", "ns"):
+            cancelled = asyncio.ensure_future(wait_slot("cancelled"))
+            waiting = asyncio.ensure_future(wait_slot("waiting"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            assert scheduler.stats()["queued_by_namespace"] == {"ns": 1}
+        await waiting
+        return scheduler.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["active"], stats["queued"], stats["admitted"]) == (0, 0, 2)
+
+
+def test_parse_weights():
+    assert parse_weights("team-a=3, team-b=0.5;team-c=1") == {"team-a": 3.0, "team-b": 0.5, "team-c": 1.0}
+    assert parse_weights("") == {}
+    with pytest.raises(ValueError, match="expected ns=weight"):
+        parse_weights("team-a")
+    with pytest.raises(ValueError, match="positive"):
+        parse_weights("team-a=0")